@@ -1,7 +1,9 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from werkzeug.exceptions import RequestEntityTooLarge
 from datetime import datetime, timedelta
+import hmac
 import os
 from dotenv import load_dotenv
 
@@ -10,44 +12,89 @@ from models.database import init_db, get_db_connection
 from services.ai_chatbot import AIchatbot
 from services.recommendation_engine import RecommendationEngine
 from services.doubt_resolver import DoubtResolver
+from services.doubt_queue import DoubtQueue
 from services.deadline_tracker import DeadlineTracker
 from services.voice_service import VoiceService
-from routes.auth_routes import auth_bp
-from routes.chatbot_routes import chatbot_bp
-from routes.student_routes import student_bp
-from routes.project_routes import project_bp
+from services.voice_jobs import VoiceJobQueue
+from services.cache import cache_stats
+from services.rate_limiter import rate_limit, get_rate_limiter
+from services import metrics
+from routes.http_utils import conditional, compress_response, roles_required
+from routes.json_provider import FastJSONProvider
 
 # Load environment variables
 load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
 app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your-secret-key-change-in-production')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
 
 # Initialize extensions
-CORS(app, origins=[
+CORS_ORIGINS = [
     "http://localhost:3000",
     "https://frontend-azkl3as6m-ash142k4s-projects.vercel.app",
     "https://*.vercel.app"
-])
+]
+CORS(app, origins=CORS_ORIGINS)
 jwt = JWTManager(app)
+app.after_request(compress_response)
 
-# Initialize database
-init_db()
+# `python app.py` makes this file the main script, which worker processes of the
+# spawn-method pools (password hashing, transcription) run again as __mp_main__.
+# They need only their own service module: the database, the services, their
+# threads and the blueprints are set up in processes that serve requests.
+SERVING = __name__ != '__mp_main__'
 
-# Initialize AI services
-ai_chatbot = AIchatbot()
-recommendation_engine = RecommendationEngine()
-doubt_resolver = DoubtResolver()
-deadline_tracker = DeadlineTracker()
-voice_service = VoiceService()
+if SERVING:
+    # Initialize database
+    init_db()
+
+    # Initialize AI services
+    ai_chatbot = AIchatbot()
+    recommendation_engine = RecommendationEngine()
+    doubt_resolver = DoubtResolver(model=ai_chatbot.model)
+    doubt_queue = DoubtQueue(doubt_resolver)
+    deadline_tracker = DeadlineTracker()
+    # Under gunicorn each worker starts these after fork (see gunicorn.conf.py);
+    # only the one holding REMINDER_LOCK_FILE sends reminders
+    if not os.getenv('DEFER_BACKGROUND_SERVICES'):
+        deadline_tracker.scheduler.start()
+        doubt_queue.start()
+    voice_service = VoiceService()
+    voice_jobs = VoiceJobQueue(voice_service, chatbot=ai_chatbot)
+
+def runtime_stats():
+    """Statistics of this process's caches, queues, rate limits and reminder scheduler"""
+    return {
+        'caches': cache_stats(),
+        'queues': {
+            'doubts': doubt_queue.stats(),
+            'voice': voice_jobs.stats()
+        },
+        'rate_limits': get_rate_limiter().stats(),
+        'reminders': deadline_tracker.scheduler.stats()
+    }
+
+# Request timings for /metrics, with runtime_stats() sampled alongside
+metrics.instrument_app(app, runtime_stats)
 
 # Register blueprints
-app.register_blueprint(auth_bp, url_prefix='/api/auth')
-app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
-app.register_blueprint(student_bp, url_prefix='/api/student')
-app.register_blueprint(project_bp, url_prefix='/api/projects')
+if SERVING:
+    from routes.auth_routes import auth_bp
+    from routes.chatbot_routes import chatbot_bp
+    from routes.student_routes import student_bp
+    from routes.project_routes import project_bp
+    from routes.calendar_routes import calendar_bp
+    from routes.analytics_routes import analytics_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/api/auth')
+    app.register_blueprint(chatbot_bp, url_prefix='/api/chatbot')
+    app.register_blueprint(student_bp, url_prefix='/api/student')
+    app.register_blueprint(project_bp, url_prefix='/api/projects')
+    app.register_blueprint(calendar_bp, url_prefix='/api/calendar')
+    app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
 
 @app.route('/')
 def health_check():
@@ -56,11 +103,27 @@ def health_check():
         'status': 'healthy',
         'message': 'Topper AI Mentor API is running',
         'version': '1.0.0',
+        **runtime_stats(),
         'timestamp': datetime.utcnow().isoformat()
     })
 
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics, summed over all workers"""
+    token = os.getenv('METRICS_TOKEN')
+    if not token and os.getenv('FLASK_ENV') == 'production':
+        # Route names, error rates and queue depths are not for the public
+        return jsonify({'error': 'Metrics are disabled: METRICS_TOKEN is not set'}), 403
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), f'Bearer {token}'.encode()):
+        return jsonify({'error': 'Invalid metrics token'}), 403
+    
+    metrics.sample(force=True)
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 @app.route('/api/chat', methods=['POST'])
 @jwt_required()
+@rate_limit('chat', per_user='20/minute', per_ip='60/minute')
 def chat_endpoint():
     """Main chat endpoint for AI interactions"""
     try:
@@ -110,8 +173,75 @@ def resolve_doubt():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/doubts', methods=['POST'])
+@jwt_required()
+def submit_doubt():
+    """Queue a doubt for background resolution and return its id immediately"""
+    try:
+        data = request.get_json()
+        user_id = get_jwt_identity()
+        doubt = data.get('doubt', '')
+        
+        if not doubt:
+            return jsonify({'error': 'Doubt is required'}), 400
+        
+        doubt_id = doubt_queue.enqueue(
+            user_id, doubt, data.get('context', ''), data.get('priority', 'medium')
+        )
+        
+        return jsonify({
+            'doubt_id': doubt_id,
+            'status': 'pending',
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/doubts/clusters', methods=['GET'])
+@jwt_required()
+@roles_required('instructor', 'admin')
+def get_doubt_clusters():
+    """Largest groups of near-duplicate doubts, for instructors"""
+    try:
+        from models.database import count_resolved_doubts
+        
+        min_size = request.args.get('min_size', 2, type=int)
+        limit = request.args.get('limit', 20, type=int)
+        
+        return jsonify({
+            'clusters': doubt_resolver.get_duplicate_clusters(min_size, limit),
+            'total_doubts_indexed': count_resolved_doubts(),
+            'timestamp': datetime.utcnow().isoformat()
+        })
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/doubts/<int:doubt_id>', methods=['GET'])
+@jwt_required()
+def get_doubt_status(doubt_id):
+    """Poll a queued doubt; pass ?wait=<seconds> to long-poll until it is resolved"""
+    try:
+        user_id = get_jwt_identity()
+        wait = min(request.args.get('wait', 0, type=float), 30.0)
+        
+        if wait > 0:
+            status = doubt_queue.wait_for_resolution(doubt_id, user_id, timeout=wait)
+        else:
+            status = doubt_queue.get_status(doubt_id, user_id)
+        
+        if not status:
+            return jsonify({'error': 'Doubt not found'}), 404
+        
+        return jsonify(status)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/api/deadlines', methods=['GET', 'POST'])
 @jwt_required()
+@conditional('deadlines')
 def handle_deadlines():
     """Handle deadline tracking"""
     try:
@@ -131,9 +261,40 @@ def handle_deadlines():
                 'category': data.get('category', 'assignment')
             }
             
-            deadline = deadline_tracker.add_deadline(user_id, deadline_data)
+            if not deadline_data['title'] or not deadline_data['due_date']:
+                return jsonify({'error': 'Title and due_date are required'}), 400
+            
+            deadline = deadline_tracker.add_deadline(user_id, **deadline_data)
             return jsonify({'deadline': deadline}), 201
             
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/deadlines/<int:deadline_id>/complete', methods=['POST'])
+@jwt_required()
+def complete_deadline(deadline_id):
+    """Mark a deadline as completed and cancel its reminder"""
+    try:
+        user_id = get_jwt_identity()
+        
+        if not deadline_tracker.mark_completed(deadline_id, user_id):
+            return jsonify({'error': 'Deadline not found'}), 404
+        
+        return jsonify({'success': True})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/deadlines/reminders', methods=['GET'])
+@jwt_required()
+def get_deadline_reminders():
+    """Get reminders the scheduler has fired for upcoming deadlines"""
+    try:
+        user_id = get_jwt_identity()
+        return jsonify({'reminders': deadline_tracker.get_deadline_reminders(user_id)})
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -141,20 +302,92 @@ def handle_deadlines():
 @jwt_required()
 def voice_to_text():
     """Convert voice to text"""
+    audio_path = None
     try:
-        if 'audio' not in request.files:
+        # Read the body as a stream instead of through request.files
+        audio_path, filename = voice_service.receive_upload(request.environ)
+        if audio_path is None:
             return jsonify({'error': 'Audio file is required'}), 400
         
-        audio_file = request.files['audio']
         user_id = get_jwt_identity()
         
-        text = voice_service.convert_speech_to_text(audio_file, user_id)
+        text = voice_service.convert_speech_to_text(audio_path, user_id, filename)
         
         return jsonify({
             'text': text,
             'timestamp': datetime.utcnow().isoformat()
         })
         
+    except RequestEntityTooLarge:
+        max_mb = voice_service.max_audio_bytes // (1024 * 1024)
+        return jsonify({'error': f'Audio file too large (max {max_mb}MB)'}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if audio_path:
+            os.remove(audio_path)
+
+@app.route('/api/voice/jobs', methods=['POST'])
+@jwt_required()
+def submit_voice_job():
+    """Queue a recording for transcription and a chatbot answer; poll the returned job"""
+    audio_path = None
+    try:
+        audio_path, filename = voice_service.receive_upload(request.environ)
+        if audio_path is None:
+            return jsonify({'error': 'Audio file is required'}), 400
+        
+        validation = voice_service.validate_audio_file(audio_path)
+        if not validation['valid']:
+            return jsonify({'error': validation['error']}), 400
+        
+        user_id = get_jwt_identity()
+        job_id = voice_jobs.submit(user_id, audio_path, filename, request.args.get('domain'))
+        if job_id is None:
+            response = jsonify({'error': 'Voice processing is busy, please retry shortly'})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+        
+        # The queue owns the file from here
+        audio_path = None
+        
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'timestamp': datetime.utcnow().isoformat()
+        }), 202
+        
+    except RequestEntityTooLarge:
+        max_mb = voice_service.max_audio_bytes // (1024 * 1024)
+        return jsonify({'error': f'Audio file too large (max {max_mb}MB)'}), 413
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    finally:
+        if audio_path:
+            os.remove(audio_path)
+
+@app.route('/api/voice/jobs/<int:job_id>', methods=['GET'])
+@jwt_required()
+def get_voice_job_status(job_id):
+    """Poll a voice job; pass ?wait=<seconds> to long-poll until it finishes"""
+    try:
+        user_id = get_jwt_identity()
+        wait = min(request.args.get('wait', 0, type=float), 30.0)
+        
+        if wait > 0:
+            status = voice_jobs.wait_for_completion(job_id, user_id, timeout=wait)
+        else:
+            status = voice_jobs.get_status(job_id, user_id)
+        
+        if not status:
+            return jsonify({'error': 'Voice job not found'}), 404
+        
+        return jsonify(status)
+        
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -179,6 +412,22 @@ def get_recommendations():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/recommendations/<int:recommendation_id>/viewed', methods=['POST'])
+@jwt_required()
+def mark_recommendation_viewed(recommendation_id):
+    """Record that a recommendation was opened so the next batch run down-ranks it"""
+    try:
+        from models.database import mark_recommendation_viewed as mark_viewed
+        user_id = get_jwt_identity()
+
+        if not mark_viewed(user_id, recommendation_id):
+            return jsonify({'error': 'Recommendation not found'}), 404
+
+        return jsonify({'success': True})
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @app.errorhandler(404)
 def not_found(error):
     return jsonify({'error': 'Endpoint not found'}), 404
@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+ASGI entry point for Topper AI Mentor
+The chat routes, which spend nearly all their time waiting on Gemini, are
+served by async handlers: a waiting request holds no thread, so one process
+can keep thousands of LLM calls in flight. Every other route is passed to the
+Flask app unchanged. URLs, JSON bodies, JWT checks and rate limits are the
+same as under app.py.
+
+Usage: uvicorn asgi:app --host 0.0.0.0 --port 5000
+   or: gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker asgi:app
+"""
+
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import wraps
+import re
+import time
+
+from flask_jwt_extended import decode_token
+from jwt import ExpiredSignatureError
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse as StarletteJSONResponse
+from starlette.routing import Mount, Route
+
+try:
+    from a2wsgi import WSGIMiddleware
+except ImportError:  # Starlette's own adapter is deprecated but still works
+    from starlette.middleware.wsgi import WSGIMiddleware
+
+from app import app as flask_app, ai_chatbot, recommendation_engine, CORS_ORIGINS
+from models import async_database
+from services.metrics import observe_request
+from services.rate_limiter import check_limits, client_address
+
+
+class JSONResponse(StarletteJSONResponse):
+    """JSON encoded by the Flask app's provider, as jsonify would"""
+
+    def render(self, content) -> bytes:
+        return flask_app.json.dumps(content).encode('utf-8')
+
+
+class AuthError(Exception):
+    def __init__(self, status: int, msg: str):
+        super().__init__(msg)
+        self.status = status
+        self.msg = msg
+
+
+def _jwt_identity(request):
+    """Identity of a valid bearer token, with flask_jwt_extended's error statuses"""
+    header = request.headers.get('Authorization')
+    if not header:
+        raise AuthError(401, 'Missing Authorization Header')
+
+    scheme, _, token = header.partition(' ')
+    if scheme != 'Bearer' or not token:
+        raise AuthError(422, "Bad Authorization header. Expected 'Authorization: Bearer <JWT>'")
+
+    try:
+        with flask_app.app_context():
+            return decode_token(token)[flask_app.config['JWT_IDENTITY_CLAIM']]
+    except ExpiredSignatureError:
+        raise AuthError(401, 'Token has expired')
+    except Exception as e:
+        raise AuthError(422, str(e))
+
+
+def _throttle(request, view_name: str, identity=None):
+    """429 response if the Flask view's rate limits refuse this request, else None"""
+    name, checks = flask_app.view_functions[view_name].rate_limits
+    remote_addr = request.client.host if request.client else None
+    ip = client_address(request.headers.get('X-Forwarded-For'), remote_addr)
+
+    seconds = check_limits(name, checks, ip, str(identity) if identity is not None else None)
+    if seconds is None:
+        return None
+    return JSONResponse({'error': 'Too many requests, please slow down', 'retry_after': seconds},
+                        status_code=429, headers={'Retry-After': str(seconds)})
+
+
+def _timed(view_name: str):
+    """Record request metrics under the Flask view's endpoint name"""
+    def decorator(handler):
+        @wraps(handler)
+        async def wrapper(request):
+            started = time.perf_counter()
+            response = await handler(request)
+            observe_request(view_name, request.method, response.status_code, time.perf_counter() - started)
+            return response
+        return wrapper
+    return decorator
+
+
+@_timed('chat_endpoint')
+async def chat_endpoint(request):
+    """Main chat endpoint for AI interactions"""
+    try:
+        user_id = _jwt_identity(request)
+    except AuthError as e:
+        return JSONResponse({'msg': e.msg}, status_code=e.status)
+
+    limited = _throttle(request, 'chat_endpoint', user_id)
+    if limited:
+        return limited
+
+    try:
+        data = flask_app.json.loads(await request.body())
+        message = data.get('message', '')
+        domain = data.get('domain', 'general')
+
+        if not message:
+            return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+        response = await ai_chatbot.process_message_async(message, user_id, domain)
+        recommendations = await run_in_threadpool(recommendation_engine.get_recommendations, user_id, domain)
+
+        return JSONResponse({
+            'response': response,
+            'recommendations': recommendations,
+            'timestamp': datetime.utcnow().isoformat()
+        })
+
+    except Exception as e:
+        return JSONResponse({'error': str(e)}, status_code=500)
+
+
+@_timed('chatbot.send_message')
+async def send_message(request):
+    """Send a message to the AI chatbot"""
+    try:
+        user_id = _jwt_identity(request)
+    except AuthError as e:
+        return JSONResponse({'msg': e.msg}, status_code=e.status)
+
+    limited = _throttle(request, 'chatbot.send_message', user_id)
+    if limited:
+        return limited
+
+    try:
+        data = flask_app.json.loads(await request.body())
+        message = data.get('message', '')
+        domain = data.get('domain', 'auto')
+
+        if not message:
+            return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+        response = await ai_chatbot.process_message_async(message, user_id, domain)
+
+        return JSONResponse({
+            'success': True,
+            'data': response
+        })
+
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+@_timed('chatbot.test_chatbot')
+async def test_chatbot(request):
+    """Test endpoint for chatbot without authentication (for development)"""
+    limited = _throttle(request, 'chatbot.test_chatbot')
+    if limited:
+        return limited
+
+    try:
+        data = flask_app.json.loads(await request.body())
+        message = data.get('message', '')
+        domain = data.get('domain', 'auto')
+
+        if not message:
+            return JSONResponse({'error': 'Message is required'}, status_code=400)
+
+        # Use a test user ID for development
+        response = await ai_chatbot.process_message_async(message, 1, domain)
+
+        return JSONResponse({
+            'success': True,
+            'data': response,
+            'message': 'Chatbot test response',
+            'api_status': 'Using Gemini API' if ai_chatbot.model else 'Using fallback responses'
+        })
+
+    except Exception as e:
+        return JSONResponse({'success': False, 'error': str(e)}, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    await async_database.close()
+
+
+# Flask-CORS patterns like "https://*.vercel.app" become one origin regex
+_cors_patterns = [re.escape(origin).replace(r'\*', '[^/]*') for origin in CORS_ORIGINS if '*' in origin]
+
+app = Starlette(
+    routes=[
+        Route('/api/chat', chat_endpoint, methods=['POST']),
+        Route('/api/chatbot/message', send_message, methods=['POST']),
+        Route('/api/chatbot/test', test_chatbot, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(flask_app))
+    ],
+    middleware=[
+        Middleware(
+            CORSMiddleware,
+            allow_origins=[origin for origin in CORS_ORIGINS if '*' not in origin],
+            allow_origin_regex='|'.join(_cors_patterns) or None,
+            allow_methods=['*'],
+            allow_headers=['*']
+        )
+    ],
+    lifespan=lifespan
+)
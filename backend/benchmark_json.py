@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Topper AI Mentor JSON responses
+Times jsonify of a chat history payload (long LLM answers, as returned by
+/api/chatbot/history) with Flask's stdlib provider and with FastJSONProvider,
+from dicts and straight from sqlite3.Row results.
+
+Usage: python benchmark_json.py [--items 20 100] [--answer-chars 2000] [--repeat 200]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from routes import json_provider
+from routes.json_provider import FastJSONProvider
+
+ANSWER = ("Gradient descent updates each weight against the slope of the loss. "
+          "Try it on a small linear regression first — e.g. with numpy — and plot the loss per epoch. ")
+
+def history_rows(items, answer_chars):
+    """Rows shaped like get_user_chat_history, from an in-memory table"""
+    conn = sqlite3.connect(':memory:')
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        CREATE TABLE chat_history (message TEXT, response TEXT, domain TEXT,
+                                   confidence_score REAL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)
+    ''')
+    answer = (ANSWER * (answer_chars // len(ANSWER) + 1))[:answer_chars]
+    conn.executemany(
+        'INSERT INTO chat_history (message, response, domain, confidence_score) VALUES (?, ?, ?, ?)',
+        [(f'How does gradient descent work? ({i})', answer, 'data_science', 0.9) for i in range(items)]
+    )
+    return conn.execute('SELECT message, response, domain, confidence_score, created_at FROM chat_history').fetchall()
+
+def benchmark(provider_class, rows, as_dicts, repeat):
+    """Average milliseconds to build the jsonify response, including the dict copies"""
+    app = Flask(__name__)
+    app.json = provider_class(app)
+
+    with app.app_context():
+        started = time.perf_counter()
+        for _ in range(repeat):
+            history = [dict(row) for row in rows] if as_dicts else rows
+            response = app.json.response({'success': True, 'data': {'history': history, 'count': len(history)}})
+        elapsed = time.perf_counter() - started
+
+    return elapsed / repeat * 1000, len(response.get_data())
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark JSON serialization of chat history responses')
+    parser.add_argument('--items', type=int, nargs='+', default=[20, 100], help='history entries per response')
+    parser.add_argument('--answer-chars', type=int, default=2000, help='length of each LLM answer')
+    parser.add_argument('--repeat', type=int, default=200, help='responses per measurement')
+    args = parser.parse_args()
+
+    print("🧾 JSON response benchmark")
+    print(f"   orjson: {'available' if json_provider.orjson else 'not installed (stdlib fallback)'}")
+    print("=" * 60)
+    print(f"{'items':>6} {'KB':>7} {'stdlib+dict':>12} {'fast+dict':>10} {'fast+Row':>9} {'speedup':>8}")
+
+    for items in args.items:
+        rows = history_rows(items, args.answer_chars)
+        baseline, size = benchmark(DefaultJSONProvider, rows, True, args.repeat)
+        fast_dicts, _ = benchmark(FastJSONProvider, rows, True, args.repeat)
+        fast_rows, _ = benchmark(FastJSONProvider, rows, False, args.repeat)
+        print(f"{items:>6} {size / 1024:>7.1f} {baseline:>10.3f}ms {fast_dicts:>8.3f}ms "
+              f"{fast_rows:>7.3f}ms {baseline / fast_dicts:>7.1f}x")
+
+    print("=" * 60)
+    print("Times are per response. 'fast+Row' passes query rows to jsonify uncopied; orjson")
+    print("converts them through a Python callback, so it saves memory rather than time.")
+
+if __name__ == "__main__":
+    main()
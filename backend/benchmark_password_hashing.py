@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Benchmark for Topper AI Mentor password hashing
+Measures login (password check) throughput of the PasswordHasher pool for
+several bcrypt costs and worker counts, and reports logins/sec per core.
+
+Usage: python benchmark_password_hashing.py [--rounds 10 12] [--workers 1 2 4] [--logins 200]
+"""
+
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from services.password_hasher import PasswordHasher, hash_password
+
+def benchmark(rounds, workers, logins, password='correct horse battery staple'):
+    """Verify ``logins`` passwords concurrently; return logins per second"""
+
+    stored_hash = hash_password(password, rounds)
+    hasher = PasswordHasher(rounds=rounds, workers=workers, max_pending=logins, queue_timeout=600)
+
+    # Warm up the worker processes so spawn time is not measured
+    list(ThreadPoolExecutor(max_workers=max(workers, 1)).map(
+        lambda _: hasher.verify(password, stored_hash), range(max(workers, 1))
+    ))
+
+    # Request threads submit logins the way a burst of web requests would
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=32) as request_threads:
+        results = list(request_threads.map(lambda _: hasher.verify(password, stored_hash), range(logins)))
+    elapsed = time.perf_counter() - started
+
+    hasher.shutdown()
+    assert all(results), "password check failed"
+    return logins / elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark login throughput of the password hasher')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12], help='bcrypt cost factors')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='pool sizes (0 = inline in the request threads)')
+    parser.add_argument('--logins', type=int, default=100, help='logins per measurement')
+    args = parser.parse_args()
+
+    cores = os.cpu_count() or 1
+    workers_options = args.workers or sorted({0, 1, min(cores, 2), min(cores, 4)})
+
+    print("🔐 Password hashing benchmark")
+    print(f"   {cores} CPU cores, {args.logins} logins per run")
+    print("=" * 60)
+    print(f"{'rounds':>6} {'workers':>8} {'logins/sec':>12} {'per core':>10}")
+
+    for rounds in args.rounds:
+        for workers in workers_options:
+            rate = benchmark(rounds, workers, args.logins)
+            print(f"{rounds:>6} {workers or 'inline':>8} {rate:>12.1f} {rate / max(workers, 1):>10.1f}")
+
+    print("=" * 60)
+    print("Each +1 in rounds roughly halves throughput; size PASSWORD_HASH_WORKERS to the")
+    print("cores you can spare for logins and pick BCRYPT_ROUNDS for the peak you expect.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Startup budget check for Topper AI Mentor
+Times a cold ``import app`` (app creation, database init and service setup)
+in fresh interpreters and exits with status 1 if the median exceeds the
+budget, or if a dependency that should load on first use (see LAZY_MODULES)
+was imported at startup. Meant for CI, next to the other checks.
+
+Usage: python check_startup_time.py [--budget-ms 1000] [--runs 5] [--module app]
+Budget defaults to STARTUP_BUDGET_MS (1000).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from profile_imports import BACKEND_DIR, import_times
+
+# Heavy packages only some requests need; importing them at startup is a regression
+LAZY_MODULES = ('numpy',)
+
+MARKER = 'STARTUP_TIME '
+
+MEASURE = '''
+import json, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+lazy_loaded = [name for name in {lazy!r} if name in sys.modules]
+print({marker!r} + json.dumps({{"ms": elapsed * 1000, "lazy_loaded": lazy_loaded}}))
+'''
+
+def cold_import(module):
+    """Import time in ms and the LAZY_MODULES loaded, in a new interpreter"""
+    env = dict(os.environ, DEFER_BACKGROUND_SERVICES='1')
+    result = subprocess.run(
+        [sys.executable, '-c', MEASURE.format(module=module, lazy=LAZY_MODULES, marker=MARKER)],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    line = next(line for line in reversed(result.stdout.splitlines()) if line.startswith(MARKER))
+    measured = json.loads(line[len(MARKER):])
+    return measured['ms'], measured['lazy_loaded']
+
+def main():
+    parser = argparse.ArgumentParser(description='Fail if a cold import of the app exceeds the startup budget')
+    parser.add_argument('--budget-ms', type=float, default=float(os.getenv('STARTUP_BUDGET_MS', 1000)),
+                        help='maximum median import time')
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters to time')
+    parser.add_argument('--module', default='app', help='module to import (e.g. app, asgi)')
+    args = parser.parse_args()
+
+    print(f"🚀 Startup budget: import {args.module} in at most {args.budget_ms:.0f}ms")
+    print("=" * 60)
+
+    # Not timed: compiles .pyc files and creates the database on a fresh checkout
+    cold_import(args.module)
+
+    timings = []
+    lazy_loaded = set()
+    for run in range(1, args.runs + 1):
+        elapsed, loaded = cold_import(args.module)
+        timings.append(elapsed)
+        lazy_loaded.update(loaded)
+        print(f"   run {run}: {elapsed:.1f}ms")
+
+    median = statistics.median(timings)
+    print("=" * 60)
+    print(f"Median: {median:.1f}ms (budget {args.budget_ms:.0f}ms)")
+
+    failed = False
+    if lazy_loaded:
+        print(f"❌ Imported at startup but expected on first use: {', '.join(sorted(lazy_loaded))}")
+        failed = True
+
+    if median > args.budget_ms:
+        print(f"❌ Over budget by {median - args.budget_ms:.1f}ms. Slowest imports:")
+        times = import_times(args.module)
+        slowest = sorted(times.items(), key=lambda entry: entry[1][1], reverse=True)
+        for name, (_, cumulative_us) in [entry for entry in slowest if entry[0] != args.module][:10]:
+            print(f"   {cumulative_us / 1000:>8.1f}ms  {name}")
+        print("Run profile_imports.py for the full picture.")
+        failed = True
+
+    if failed:
+        sys.exit(1)
+    print("✅ Within budget")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Gunicorn configuration for Topper AI Mentor
+Production entry point: gunicorn -c gunicorn.conf.py app:app
+
+Most request time is spent waiting on Gemini, so the default is a few
+processes (one per available core, at most MAX_DEFAULT_WORKERS) with many
+threads each ("gthread"). Set
+GUNICORN_WORKER_CLASS=gevent (requires the gevent package) for very high
+concurrency of slow LLM calls.
+"""
+
+import glob
+import math
+import multiprocessing
+import os
+import tempfile
+
+
+def available_cores():
+    """CPUs this process may run on, capped by the container's CPU quota
+
+    cpu_count() reports the host's cores inside a container.
+    """
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = multiprocessing.cpu_count()
+
+    # cgroup v2, then v1; a quota of 'max' / -1 means unlimited
+    for quota_file, period_file in (('/sys/fs/cgroup/cpu.max', None),
+                                    ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us', '/sys/fs/cgroup/cpu/cpu.cfs_period_us')):
+        try:
+            with open(quota_file) as f:
+                values = f.read().split()
+            if period_file:
+                with open(period_file) as f:
+                    values.append(f.read().strip())
+            quota, period = int(values[0]), int(values[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        if quota > 0:
+            cores = min(cores, max(1, math.ceil(quota / period)))
+        break
+
+    return cores
+
+
+# Every worker holds its own caches, doubt indexes and password hashing pool,
+# so memory grows with the worker count; more than this must be asked for
+MAX_DEFAULT_WORKERS = 4
+
+cores = available_cores()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', min(cores, MAX_DEFAULT_WORKERS))))
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# Import the app (database migrations, models) once in the master and fork
+# the workers from it. gevent has to patch the stdlib before the app imports
+# it, so it loads the app in each worker instead.
+preload_app = os.getenv('GUNICORN_PRELOAD', '0' if worker_class == 'gevent' else '1') == '1'
+
+# Chat requests can wait on the LLM for a while
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Recycling workers drops their in-process caches, so it is off by default
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('LOG_LEVEL', 'info').lower()
+
+# Settings read by the app when it is imported below
+# Background threads start in each worker after fork (post_worker_init), never in the master
+os.environ.setdefault('DEFER_BACKGROUND_SERVICES', '1')
+# Split the cores between the workers' password hashing pools
+os.environ.setdefault('PASSWORD_HASH_WORKERS', str(max(1, cores // workers)))
+# Deployments (Railway's edge, nginx.conf) put one proxy in front of gunicorn,
+# so the client address is the last X-Forwarded-For entry, not remote_addr
+os.environ.setdefault('RATE_LIMIT_TRUSTED_PROXIES', '1')
+# With several workers, rate limits must be shared to mean anything
+if workers > 1:
+    os.environ.setdefault('RATE_LIMIT_STORAGE', 'sqlite')
+    # ...and so must metrics: each worker writes its own under this directory
+    os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'topper_ai_mentor_metrics'))
+if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+    os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+# Files written there by prometheus_client (per metric type) and by the fallback
+# backend in services/metrics.py
+METRICS_FILE_PATTERNS = ('counter_*.db', 'gauge_*.db', 'histogram_*.db', 'summary_*.db', 'metrics_*.json')
+
+
+def on_starting(server):
+    """Start metrics from zero: files of a previous run would be added to the totals
+
+    Only the files the metrics backends write are removed, in case the
+    directory is shared with anything else.
+    """
+    metrics_dir = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+    if metrics_dir:
+        for pattern in METRICS_FILE_PATTERNS:
+            for path in glob.glob(os.path.join(metrics_dir, pattern)):
+                os.remove(path)
+
+
+def post_worker_init(worker):
+    """Start the worker's background services once the app is loaded in it
+
+    The database is opened per call, and the queues and pools check the pid
+    and start fresh in a new process, so nothing from the master is reused.
+    Every worker starts a reminder scheduler, but only the one holding
+    REMINDER_LOCK_FILE sends reminders; another takes over when it exits.
+    """
+    from app import deadline_tracker, doubt_queue
+    from services import metrics
+
+    deadline_tracker.scheduler.start()
+    doubt_queue.start()
+    metrics.start_flusher()
+    worker.log.info("Worker %s ready", worker.pid)
+
+
+def worker_exit(server, worker):
+    """Drain in-process work before the worker goes away"""
+    try:
+        from app import deadline_tracker, doubt_queue, voice_jobs
+    except Exception:
+        # The app failed to load in this worker; there is nothing to drain
+        return
+
+    from services import metrics
+    from services.password_hasher import get_password_hasher
+    from services.user_preferences import flush_preference_store
+
+    deadline_tracker.scheduler.stop()
+    doubt_queue.shutdown()
+    voice_jobs.shutdown(wait=True)
+    flush_preference_store()
+    get_password_hasher().shutdown()
+    metrics.flush()
+    server.log.info("Worker %s drained", worker.pid)
+
+
+def child_exit(server, worker):
+    """Stop reporting a dead worker's gauges (its counters stay in the totals)"""
+    if os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        from services import metrics
+
+        metrics.mark_process_dead(worker.pid)
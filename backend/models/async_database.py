@@ -0,0 +1,105 @@
+"""Async access to the chat tables for the ASGI app (asgi.py)
+
+With aiosqlite installed, queries go through one shared connection whose
+thread serializes them, so any number of waiting requests costs no threads.
+Without it, the synchronous functions in models.database run in the default
+executor. Writes bump the same version counters in their transaction and fire
+the same write listeners either way; the listeners run in the executor too, as
+they may query the database.
+"""
+
+import asyncio
+from functools import partial
+
+from models import database
+from models.database import _notify_write, _interaction_resources
+
+try:
+    import aiosqlite
+except ImportError:  # fall back to the sync functions in a thread pool
+    aiosqlite = None
+
+_connection = None
+_connection_lock = None
+
+
+async def _get_connection():
+    global _connection, _connection_lock
+
+    if _connection_lock is None:
+        _connection_lock = asyncio.Lock()
+
+    async with _connection_lock:
+        if _connection is None:
+            _connection = await aiosqlite.connect(database.DATABASE_PATH)
+            _connection.row_factory = aiosqlite.Row
+            await _connection.execute('PRAGMA busy_timeout = 5000')
+    return _connection
+
+
+async def close():
+    """Close the shared connection (on application shutdown)"""
+    global _connection
+
+    if _connection is not None:
+        await _connection.close()
+        _connection = None
+
+
+async def _run_sync(func, *args, **kwargs):
+    return await asyncio.get_running_loop().run_in_executor(None, partial(func, *args, **kwargs))
+
+
+async def save_chat_history(user_id, message, response, domain='general', confidence_score=None):
+    """Save chat interaction to history"""
+    if aiosqlite is None:
+        return await _run_sync(database.save_chat_history, user_id, message, response, domain, confidence_score)
+
+    conn = await _get_connection()
+    await conn.execute('''
+        INSERT INTO chat_history (user_id, message, response, domain, confidence_score)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, message, response, domain, confidence_score))
+    await conn.execute(database.BUMP_VERSION_SQL, (user_id, 'chat_history'))
+    await conn.commit()
+
+    await _run_sync(_notify_write, 'chat_history', user_id, domain=domain)
+
+
+async def get_user_chat_history(user_id, limit=50):
+    """Get user's chat history"""
+    if aiosqlite is None:
+        return await _run_sync(database.get_user_chat_history, user_id, limit)
+
+    conn = await _get_connection()
+    async with conn.execute('''
+        SELECT message, response, domain, confidence_score, created_at
+        FROM chat_history
+        WHERE user_id = ?
+        ORDER BY created_at DESC
+        LIMIT ?
+    ''', (user_id, limit)) as cursor:
+        history = await cursor.fetchall()
+
+    return [dict(row) for row in history]
+
+
+async def save_user_interaction(user_id, interaction_type, content_id=None, content_type=None,
+                                rating=None, feedback=None, duration=None):
+    """Save user interaction for ML model training"""
+    if aiosqlite is None:
+        return await _run_sync(database.save_user_interaction, user_id, interaction_type, content_id,
+                               content_type, rating, feedback, duration)
+
+    conn = await _get_connection()
+    await conn.execute('''
+        INSERT INTO user_interactions
+        (user_id, interaction_type, content_id, content_type, rating, feedback, duration)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, interaction_type, content_id, content_type, rating, feedback, duration))
+    await conn.executemany(database.BUMP_VERSION_SQL,
+                           [(user_id, resource) for resource in _interaction_resources(content_id, rating)])
+    await conn.commit()
+
+    await _run_sync(_notify_write, 'user_interactions', user_id, interaction_type=interaction_type,
+                    content_id=content_id, content_type=content_type, rating=rating)
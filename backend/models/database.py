@@ -1,13 +1,81 @@
 import sqlite3
+import functools
+import inspect
+import json
 import os
+import time
 from datetime import datetime
-import bcrypt
 
 DATABASE_PATH = 'topper_ai_mentor.db'
 
+TIMESTAMP_FORMATS = ('%Y-%m-%d %H:%M:%S', '%Y-%m-%d %H:%M', '%Y-%m-%d')
+
+# Callbacks run after rows are written, keyed by table name
+_write_listeners = {}
+
+# Callbacks timing the query functions of this module (see _observed)
+_query_observers = []
+
+# Values of users.role; instructors and admins see cohort-wide views
+USER_ROLES = ('student', 'instructor', 'admin')
+
+# Tables with per-user version counters, which let conditional GETs skip
+# their queries (routes/http_utils.py)
+VERSIONED_TABLES = ('chat_history', 'user_interactions', 'deadlines', 'projects', 'recommendations')
+
+# Counter of user_interactions rows that carry a rating or a content id (the
+# ones that change recommendations), bumped alongside user_interactions
+FEEDBACK_RESOURCE = 'user_feedback'
+
+def _interaction_resources(content_id, rating):
+    if rating is not None or content_id is not None:
+        return ('user_interactions', FEEDBACK_RESOURCE)
+    return ('user_interactions',)
+
+def register_write_listener(table, callback):
+    """Call ``callback(user_id, **details)`` after rows are written to ``table``"""
+    _write_listeners.setdefault(table, []).append(callback)
+
+def register_query_observer(callback):
+    """Call ``callback(function_name, seconds, error)`` after each query function returns or raises"""
+    _query_observers.append(callback)
+
+def _notify_write(table, user_id, **details):
+    for callback in _write_listeners.get(table, []):
+        try:
+            callback(user_id, **details)
+        except Exception as e:
+            print(f"Error in {table} write listener: {e}")
+
+# Bumps the (user_id, resource) counter; run by writers of VERSIONED_TABLES in
+# their own transaction, so the counter changes exactly when the rows do
+BUMP_VERSION_SQL = '''
+    INSERT INTO resource_versions (user_id, resource, version) VALUES (?, ?, 1)
+    ON CONFLICT (user_id, resource) DO UPDATE SET version = version + 1
+'''
+
+def _bump_resource_versions(cursor, resource, user_ids):
+    cursor.executemany(BUMP_VERSION_SQL, [(user_id, resource) for user_id in dict.fromkeys(user_ids)])
+
+def get_resource_versions(user_id, resources):
+    """Current version counter of each resource for a user (0 if never written)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT resource, version FROM resource_versions
+        WHERE user_id = ? AND resource IN (SELECT value FROM json_each(?))
+    ''', (user_id, json.dumps(list(resources))))
+    
+    versions = {row['resource']: row['version'] for row in cursor.fetchall()}
+    conn.close()
+    
+    return {resource: versions.get(resource, 0) for resource in resources}
+
 def get_db_connection():
     """Get database connection"""
-    conn = sqlite3.connect(DATABASE_PATH)
+    # Wait for other processes' write locks instead of failing with "database is locked"
+    conn = sqlite3.connect(DATABASE_PATH, timeout=5)
     conn.row_factory = sqlite3.Row
     return conn
 
@@ -16,6 +84,10 @@ def init_db():
     conn = get_db_connection()
     cursor = conn.cursor()
     
+    # Readers don't block the writer (and vice versa) across gunicorn workers;
+    # the journal mode is stored in the database file, so this is done once
+    cursor.execute('PRAGMA journal_mode=WAL')
+    
     # Users table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
@@ -117,6 +189,22 @@ def init_db():
         )
     ''')
     
+    # One row per (user, catalog item) so batch runs can upsert in place
+    cursor.execute('''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_recommendations_user_item
+        ON recommendations (user_id, domain, topic)
+    ''')
+    
+    # Decayed per-user domain/topic weights (see services/user_preferences.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS user_preferences (
+            user_id INTEGER PRIMARY KEY,
+            weights TEXT NOT NULL,
+            updated_at REAL NOT NULL,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
     # User interactions table (for ML model training)
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS user_interactions (
@@ -168,34 +256,156 @@ def init_db():
         )
     ''')
     
+    # Voice jobs table (background transcription pipeline)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS voice_jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            status TEXT DEFAULT 'queued',
+            filename TEXT,
+            domain TEXT,
+            transcription TEXT,
+            confidence REAL,
+            response TEXT,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    ''')
+    
+    # Transcriptions by audio content hash, evicted least recently used first
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS transcription_cache (
+            content_hash TEXT NOT NULL,
+            backend TEXT NOT NULL,
+            transcription TEXT NOT NULL,
+            confidence REAL,
+            language TEXT,
+            size_bytes INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (content_hash, backend)
+        )
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_transcription_cache_lru
+        ON transcription_cache (last_used)
+    ''')
+    
+    # Per-user change counters for VERSIONED_TABLES, bumped on every write
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS resource_versions (
+            user_id INTEGER NOT NULL,
+            resource TEXT NOT NULL,
+            version INTEGER NOT NULL,
+            PRIMARY KEY (user_id, resource)
+        ) WITHOUT ROWID
+    ''')
+    
+    # Columns added after the initial schema
+    _ensure_column(cursor, 'doubts', 'claimed_at', 'REAL')
+    _ensure_column(cursor, 'deadlines', 'due_ts', 'INTEGER')
+    _ensure_column(cursor, 'voice_queries', 'bytes_in', 'INTEGER')
+    _ensure_column(cursor, 'voice_queries', 'bytes_out', 'INTEGER')
+    _ensure_column(cursor, 'voice_queries', 'time_saved', 'REAL')
+    _backfill_epoch_column(cursor, 'deadlines', 'due_date', 'due_ts')
+    _ensure_column(cursor, 'projects', 'start_ts', 'INTEGER')
+    _ensure_column(cursor, 'projects', 'end_ts', 'INTEGER')
+    _backfill_epoch_column(cursor, 'projects', 'COALESCE(start_date, created_at)', 'start_ts')
+    _backfill_epoch_column(cursor, 'projects', 'end_date', 'end_ts')
+    _ensure_column(cursor, 'users', 'role', "TEXT DEFAULT 'student'")
+    _ensure_column(cursor, 'doubts', 'answered_by', 'INTEGER')
+    _ensure_column(cursor, 'doubts', 'resolution_source', 'TEXT')
+    _ensure_column(cursor, 'doubts', 'confidence', 'REAL')
+    
+    # Deadline range queries seek on the epoch column
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_deadlines_user_due
+        ON deadlines (user_id, due_ts)
+    ''')
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_deadlines_due
+        ON deadlines (due_ts)
+    ''')
+    
+    # Cohort analytics select students by course and year
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_users_cohort
+        ON users (course, year)
+    ''')
+    
+    # Calendar windows seek projects by start and filter on end
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_projects_user_interval
+        ON projects (user_id, start_ts, end_ts)
+    ''')
+    
+    # Queue scans for the async doubt workers
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_doubts_status
+        ON doubts (status, id)
+    ''')
+    
+    # Duplicate clusters group doubts by the doubt whose answer they got
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_doubts_answered_by
+        ON doubts (answered_by)
+    ''')
+    
     conn.commit()
     conn.close()
     print("✅ Database initialized successfully")
 
-def create_user(email, password, first_name, last_name, student_id=None, course=None, year=None):
-    """Create a new user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def parse_timestamp(value):
+    """Convert a free-form date (SQL timestamp, ISO 8601, plain date or epoch) to epoch seconds
+    
+    Naive values are taken as server local time. Returns None when unparseable.
+    """
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    if isinstance(value, datetime):
+        return int(value.timestamp())
     
-    # Hash password
-    password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt())
+    value = str(value).strip()
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return int(datetime.strptime(value, fmt).timestamp())
+        except ValueError:
+            continue
     
     try:
-        cursor.execute('''
-            INSERT INTO users (email, password_hash, first_name, last_name, student_id, course, year)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (email, password_hash, first_name, last_name, student_id, course, year))
-        
-        user_id = cursor.lastrowid
-        conn.commit()
-        return user_id
-    except sqlite3.IntegrityError:
+        return int(datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp())
+    except ValueError:
         return None
-    finally:
-        conn.close()
+
+def _backfill_epoch_column(cursor, table, source_column, epoch_column):
+    """Fill an epoch column from a text column (or expression) for rows written before it existed"""
+    cursor.execute(f'''
+        SELECT id, {source_column} AS value FROM {table}
+        WHERE {epoch_column} IS NULL AND {source_column} IS NOT NULL
+    ''')
+    updates = [(parse_timestamp(row['value']), row['id']) for row in cursor.fetchall()]
+    updates = [update for update in updates if update[0] is not None]
+    
+    if updates:
+        cursor.executemany(f'UPDATE {table} SET {epoch_column} = ? WHERE id = ?', updates)
+    return len(updates)
+
+def _ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    if column not in {row['name'] for row in cursor.fetchall()}:
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+        return True
+    return False
 
 def verify_user(email, password):
     """Verify user credentials"""
+    from services.password_hasher import get_password_hasher
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
@@ -203,10 +413,21 @@ def verify_user(email, password):
     user = cursor.fetchone()
     conn.close()
     
-    if user and bcrypt.checkpw(password.encode('utf-8'), user['password_hash']):
+    if user and get_password_hasher().verify(password, user['password_hash']):
         return user['id']
     return None
 
+def get_password_hash(user_id):
+    """Get the stored password hash of an active user"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT password_hash FROM users WHERE id = ? AND is_active = TRUE', (user_id,))
+    user = cursor.fetchone()
+    conn.close()
+    
+    return user['password_hash'] if user else None
+
 def get_user_by_id(user_id):
     """Get user details by ID"""
     conn = get_db_connection()
@@ -214,7 +435,7 @@ def get_user_by_id(user_id):
     
     cursor.execute('''
         SELECT id, email, first_name, last_name, student_id, course, year, 
-               specialization, learning_preferences, created_at
+               specialization, learning_preferences, role, created_at
         FROM users WHERE id = ? AND is_active = TRUE
     ''', (user_id,))
     
@@ -222,7 +443,12 @@ def get_user_by_id(user_id):
     conn.close()
     
     if user:
-        return dict(user)
+        # Same derived fields as get_user_by_email
+        user_dict = dict(user)
+        user_dict['full_name'] = f"{user_dict['first_name']} {user_dict['last_name']}".strip()
+        user_dict['semester'] = user_dict['year']
+        user_dict['course'] = user_dict['course'] or ''
+        return user_dict
     return None
 
 def save_chat_history(user_id, message, response, domain='general', confidence_score=None):
@@ -234,9 +460,12 @@ def save_chat_history(user_id, message, response, domain='general', confidence_s
         INSERT INTO chat_history (user_id, message, response, domain, confidence_score)
         VALUES (?, ?, ?, ?, ?)
     ''', (user_id, message, response, domain, confidence_score))
+    _bump_resource_versions(cursor, 'chat_history', [user_id])
     
     conn.commit()
     conn.close()
+    
+    _notify_write('chat_history', user_id, domain=domain)
 
 def get_user_chat_history(user_id, limit=50):
     """Get user's chat history"""
@@ -267,9 +496,14 @@ def save_user_interaction(user_id, interaction_type, content_id=None, content_ty
         (user_id, interaction_type, content_id, content_type, rating, feedback, duration)
         VALUES (?, ?, ?, ?, ?, ?, ?)
     ''', (user_id, interaction_type, content_id, content_type, rating, feedback, duration))
+    for resource in _interaction_resources(content_id, rating):
+        _bump_resource_versions(cursor, resource, [user_id])
     
     conn.commit()
     conn.close()
+    
+    _notify_write('user_interactions', user_id, interaction_type=interaction_type,
+                  content_id=content_id, content_type=content_type, rating=rating)
 
 def get_user_by_email(email):
     """Get user by email"""
@@ -313,8 +547,73 @@ def create_user(email, password_hash, full_name, student_id, course='', semester
     conn.commit()
     conn.close()
     
+    _notify_write('users', user_id, fields=('created',))
+
     return user_id
 
+def find_existing_users(emails, student_ids):
+    """Emails and student ids among the given ones that are already registered, in one query"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    # json_each turns each list into a table, so any number of values is one statement
+    cursor.execute('''
+        SELECT email, student_id FROM users
+        WHERE email IN (SELECT value FROM json_each(?))
+           OR student_id IN (SELECT value FROM json_each(?))
+    ''', (json.dumps(list(emails)), json.dumps(list(student_ids))))
+
+    rows = cursor.fetchall()
+    conn.close()
+
+    return {row['email'] for row in rows}, {row['student_id'] for row in rows if row['student_id']}
+
+def create_users_bulk(users):
+    """Insert many users in one transaction; return their ids (None where email or student id was taken)
+
+    ``users`` are dicts with the same fields as ``create_user``. Rows that
+    conflict with an existing user, e.g. one registered since the caller
+    checked, are skipped rather than failing the batch.
+    """
+    if not users:
+        return []
+
+    conn = get_db_connection()
+    cursor = conn.cursor()
+
+    rows = []
+    for user in users:
+        name_parts = user['full_name'].split(' ', 1)
+        rows.append((
+            user['email'], user['password_hash'], name_parts[0],
+            name_parts[1] if len(name_parts) > 1 else '',
+            user['student_id'], user.get('course', ''), user.get('semester', 1),
+            user.get('role', 'student')
+        ))
+
+    cursor.executemany('''
+        INSERT INTO users (email, password_hash, first_name, last_name, student_id, course, year, role)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT DO NOTHING
+    ''', rows)
+
+    # A row is ours if it carries the hash we just generated for it
+    cursor.execute('''
+        SELECT id, email, password_hash FROM users
+        WHERE email IN (SELECT value FROM json_each(?))
+    ''', (json.dumps([user['email'] for user in users]),))
+    inserted = {(row['email'], row['password_hash']): row['id'] for row in cursor.fetchall()}
+
+    conn.commit()
+    conn.close()
+
+    user_ids = [inserted.get((user['email'], user['password_hash'])) for user in users]
+    for user_id in user_ids:
+        if user_id is not None:
+            _notify_write('users', user_id, fields=('created',))
+
+    return user_ids
+
 def update_user(user_id, update_data):
     """Update user information"""
     conn = get_db_connection()
@@ -351,6 +650,9 @@ def update_user(user_id, update_data):
     conn.commit()
     conn.close()
     
+    if success:
+        _notify_write('users', user_id, fields=tuple(update_data))
+    
     return success
 
 def get_user_interactions(user_id, limit=50):
@@ -377,22 +679,337 @@ def get_user_deadlines(user_id, upcoming_only=False):
     cursor = conn.cursor()
     
     query = '''
-        SELECT title, due_date as deadline, status, category, created_at
+        SELECT id, title, description, due_date as deadline, priority, status, category, created_at
         FROM deadlines 
         WHERE user_id = ?
     '''
+    params = [user_id]
     
     if upcoming_only:
-        query += ' AND due_date > datetime("now") AND status != "completed"'
+        query += " AND due_ts > ? AND status != 'completed'"
+        params.append(int(time.time()))
+    
+    query += ' ORDER BY due_ts ASC'
+    
+    cursor.execute(query, params)
+    deadlines = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in deadlines]
+
+def create_deadline(user_id, title, due_date, description=None, priority='medium', category='assignment'):
+    """Create a deadline; ``due_date`` must be parseable by parse_timestamp"""
+    due_ts = parse_timestamp(due_date)
+    if due_ts is None:
+        raise ValueError(f"Invalid due date: {due_date}")
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        INSERT INTO deadlines (user_id, title, description, due_date, due_ts, priority, category)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, title, description, due_date, due_ts, priority, category))
+    
+    deadline_id = cursor.lastrowid
+    _bump_resource_versions(cursor, 'deadlines', [user_id])
+    conn.commit()
+    conn.close()
+    
+    _notify_write('deadlines', user_id, deadline_id=deadline_id, due_ts=due_ts, priority=priority)
+    
+    return {
+        'id': deadline_id,
+        'user_id': user_id,
+        'title': title,
+        'due_date': due_date,
+        'due_ts': due_ts,
+        'priority': priority,
+        'category': category
+    }
+
+def complete_deadline(deadline_id, user_id):
+    """Mark a user's deadline as completed"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE deadlines 
+        SET status = 'completed', updated_at = CURRENT_TIMESTAMP
+        WHERE id = ? AND user_id = ?
+    ''', (deadline_id, user_id))
+    
+    success = cursor.rowcount > 0
+    if success:
+        _bump_resource_versions(cursor, 'deadlines', [user_id])
+    conn.commit()
+    conn.close()
+    
+    if success:
+        _notify_write('deadlines', user_id, deadline_id=deadline_id, status='completed')
+    
+    return success
+
+def get_deadlines_due_before(user_id, end_ts):
+    """Get a user's open deadlines due before an epoch time, soonest first"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT id, title, due_date, due_ts, priority, category, status
+        FROM deadlines 
+        WHERE user_id = ? AND due_ts <= ? AND status != 'completed'
+        ORDER BY due_ts ASC
+    ''', (user_id, end_ts))
+    
+    deadlines = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in deadlines]
+
+# Reminder time of a deadline: its due time minus the lead time (:high, :medium,
+# :low seconds) of its priority
+REMIND_AT_SQL = "due_ts - CASE priority WHEN 'high' THEN :high WHEN 'low' THEN :low ELSE :medium END"
+
+def claim_due_reminders(now_ts, lead_times):
+    """Atomically flag the reminders due at ``now_ts`` as sent and return their deadlines
+    
+    ``lead_times`` maps priority to seconds before the due time. The flag is
+    checked and set in one UPDATE, so each reminder is claimed once however
+    many schedulers run.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        UPDATE deadlines SET reminder_sent = TRUE, updated_at = CURRENT_TIMESTAMP
+        WHERE reminder_sent = FALSE AND status != 'completed'
+          AND due_ts > :now AND due_ts <= :now + :max_lead
+          AND {REMIND_AT_SQL} <= :now
+        RETURNING id, user_id, title, due_date, due_ts, priority, category
+    ''', dict(lead_times, now=now_ts, max_lead=max(lead_times.values())))
+    
+    claimed = cursor.fetchall()
+    _bump_resource_versions(cursor, 'deadlines', [row['user_id'] for row in claimed])
+    conn.commit()
+    conn.close()
     
-    query += ' ORDER BY due_date ASC'
+    return [dict(row) for row in claimed]
+
+def get_next_reminder_ts(now_ts, until_ts, lead_times):
+    """Earliest time an unsent reminder is due, if it is before ``until_ts`` (else None)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        SELECT MIN({REMIND_AT_SQL}) AS remind_at
+        FROM deadlines
+        WHERE reminder_sent = FALSE AND status != 'completed'
+          AND due_ts > :now AND due_ts <= :until + :max_lead
+    ''', dict(lead_times, now=now_ts, until=until_ts, max_lead=max(lead_times.values())))
+    
+    remind_at = cursor.fetchone()['remind_at']
+    conn.close()
+    
+    return remind_at if remind_at is not None and remind_at < until_ts else None
+
+def get_sent_reminders(user_id, now_ts):
+    """A user's open deadlines after ``now_ts`` whose reminder has fired, soonest first"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT id, title, due_date, due_ts, priority, category
+        FROM deadlines
+        WHERE user_id = ? AND due_ts > ? AND reminder_sent = TRUE AND status != 'completed'
+        ORDER BY due_ts ASC
+    ''', (user_id, now_ts))
     
-    cursor.execute(query, (user_id,))
     deadlines = cursor.fetchall()
     conn.close()
     
     return [dict(row) for row in deadlines]
 
+def count_cohort_users(course, year=None):
+    """Get the number of active students in a course (and year)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    query = 'SELECT COUNT(*) AS students FROM users WHERE course = ? AND is_active = TRUE'
+    params = [course]
+    if year is not None:
+        query += ' AND year = ?'
+        params.append(year)
+    
+    cursor.execute(query, params)
+    students = cursor.fetchone()['students']
+    conn.close()
+    
+    return students
+
+def iter_cohort_deadlines(course, year, start_ts, end_ts, batch_size=20000):
+    """Stream batches of (user_id, due_ts, priority_rank) for a cohort's open deadlines
+    
+    ``priority_rank`` is 0 for high, 1 for medium and 2 for low (unknown
+    priorities count as medium). Rows are plain tuples for cheap bulk conversion.
+    """
+    conn = get_db_connection()
+    conn.row_factory = None
+    cursor = conn.cursor()
+    
+    query = '''
+        SELECT d.user_id, d.due_ts,
+               CASE d.priority WHEN 'high' THEN 0 WHEN 'low' THEN 2 ELSE 1 END
+        FROM users u
+        JOIN deadlines d ON d.user_id = u.id
+        WHERE u.course = ? AND u.is_active = TRUE
+          AND d.due_ts >= ? AND d.due_ts < ? AND d.status != 'completed'
+    '''
+    params = [course, start_ts, end_ts]
+    if year is not None:
+        query += ' AND u.year = ?'
+        params.append(year)
+    
+    try:
+        cursor.execute(query, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
+VOICE_JOB_FIELDS = ('status', 'transcription', 'confidence', 'response', 'error')
+
+def create_voice_job(user_id, filename=None, domain=None):
+    """Record a queued voice job and return its id"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        INSERT INTO voice_jobs (user_id, filename, domain)
+        VALUES (?, ?, ?)
+    ''', (user_id, filename, domain))
+    
+    job_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    
+    return job_id
+
+def update_voice_job(job_id, **fields):
+    """Update a voice job's status and results; finished jobs get completed_at"""
+    columns = [column for column in VOICE_JOB_FIELDS if column in fields]
+    assignments = ', '.join(f'{column} = ?' for column in columns)
+    if fields.get('status') in ('completed', 'failed'):
+        assignments += ', completed_at = CURRENT_TIMESTAMP'
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute(f'''
+        UPDATE voice_jobs SET {assignments}, updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', [fields[column] for column in columns] + [job_id])
+    
+    conn.commit()
+    conn.close()
+
+def get_voice_job(job_id):
+    """Get a voice job by ID"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT id, user_id, status, filename, domain, transcription, confidence,
+               response, error, created_at, completed_at
+        FROM voice_jobs WHERE id = ?
+    ''', (job_id,))
+    
+    job = cursor.fetchone()
+    conn.close()
+    
+    return dict(job) if job else None
+
+def fail_stale_voice_jobs(older_than_seconds=600):
+    """Fail unfinished voice jobs whose worker went away (their audio is gone with it)"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE voice_jobs
+        SET status = 'failed', error = 'Interrupted', completed_at = CURRENT_TIMESTAMP
+        WHERE status NOT IN ('completed', 'failed')
+          AND updated_at < datetime('now', ?)
+    ''', (f'-{int(older_than_seconds)} seconds',))
+    
+    failed = cursor.rowcount
+    conn.commit()
+    conn.close()
+    
+    return failed
+
+def get_cached_transcription(content_hash, backend):
+    """Look up a cached transcription and mark it as recently used"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT transcription, confidence, language
+        FROM transcription_cache WHERE content_hash = ? AND backend = ?
+    ''', (content_hash, backend))
+    cached = cursor.fetchone()
+    
+    if cached:
+        cursor.execute('''
+            UPDATE transcription_cache SET last_used = ?
+            WHERE content_hash = ? AND backend = ?
+        ''', (time.time(), content_hash, backend))
+        conn.commit()
+    conn.close()
+    
+    return dict(cached) if cached else None
+
+def save_cached_transcription(content_hashes, backend, transcription, confidence=None, language=None,
+                              max_bytes=50 * 1024 * 1024):
+    """Cache a transcription under one or more content hashes, then evict LRU entries over ``max_bytes``"""
+    size_bytes = len(transcription.encode('utf-8')) + 128
+    now = time.time()
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany('''
+        INSERT INTO transcription_cache
+        (content_hash, backend, transcription, confidence, language, size_bytes, last_used)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (content_hash, backend) DO UPDATE SET
+            transcription = excluded.transcription, confidence = excluded.confidence,
+            language = excluded.language, size_bytes = excluded.size_bytes, last_used = excluded.last_used
+    ''', [(content_hash, backend, transcription, confidence, language, size_bytes, now)
+          for content_hash in content_hashes])
+    
+    cursor.execute('SELECT COALESCE(SUM(size_bytes), 0) AS total FROM transcription_cache')
+    excess = cursor.fetchone()['total'] - max_bytes
+    evicted = 0
+    if excess > 0:
+        # Oldest entries whose running size covers the excess
+        cursor.execute('''
+            DELETE FROM transcription_cache WHERE rowid IN (
+                SELECT rowid FROM (
+                    SELECT rowid, SUM(size_bytes) OVER (ORDER BY last_used, rowid) AS running
+                    FROM transcription_cache
+                ) WHERE running - size_bytes < ?
+            )
+        ''', (excess,))
+        evicted = cursor.rowcount
+    
+    conn.commit()
+    conn.close()
+    
+    return evicted
+
 def get_user_learning_progress(user_id):
     """Get user learning progress"""
     conn = get_db_connection()
@@ -446,19 +1063,453 @@ def get_user_projects(user_id):
 
 def create_project(user_id, title, description=None, deadline=None, project_type='assignment'):
     """Create a new project"""
+    end_ts = parse_timestamp(deadline)
+    if deadline and end_ts is None:
+        raise ValueError(f"Invalid deadline: {deadline}")
+    
     conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute('''
-        INSERT INTO projects (user_id, title, description, project_type, domain, end_date)
-        VALUES (?, ?, ?, ?, ?, ?)
-    ''', (user_id, title, description, project_type, 'general', deadline))
+        INSERT INTO projects (user_id, title, description, project_type, domain, end_date, start_ts, end_ts)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (user_id, title, description, project_type, 'general', deadline, int(time.time()), end_ts))
     
     project_id = cursor.lastrowid
+    _bump_resource_versions(cursor, 'projects', [user_id])
     conn.commit()
     conn.close()
     
+    _notify_write('projects', user_id, project_id=project_id)
+    
     return project_id
 
+def get_calendar_items(user_id, start_ts, end_ts):
+    """Get a user's deadlines and project intervals overlapping [start_ts, end_ts]
+    
+    Deadlines are points at ``due_ts``; projects span ``start_ts``..``end_ts``
+    and stay open-ended while they have no end date. Deadlines seek on
+    (user_id, due_ts), so only rows inside the window are read. Projects seek
+    on (user_id, start_ts) and filter ``end_ts`` in the same index, so every
+    project of the user starting before ``end_ts`` is scanned in the index,
+    but only overlapping ones are fetched from the table.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT 'deadline' AS type, id, title, due_date AS start_date, due_date AS end_date,
+               due_ts AS start_ts, due_ts AS end_ts, status, priority, category
+        FROM deadlines
+        WHERE user_id = ? AND due_ts BETWEEN ? AND ?
+        UNION ALL
+        SELECT 'project' AS type, id, title, start_date, end_date,
+               start_ts, end_ts, status, NULL AS priority, project_type AS category
+        FROM projects
+        WHERE user_id = ? AND start_ts <= ? AND (end_ts IS NULL OR end_ts >= ?)
+        ORDER BY start_ts ASC, type ASC, id ASC
+    ''', (user_id, start_ts, end_ts, user_id, end_ts, start_ts))
+    
+    items = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in items]
+
+def get_active_user_ids():
+    """Get ids of all active users"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT id FROM users WHERE is_active = TRUE ORDER BY id')
+    user_ids = [row['id'] for row in cursor.fetchall()]
+    conn.close()
+    
+    return user_ids
+
+def get_domain_activity(user_ids):
+    """Get chat counts per domain for a batch of users"""
+    if not user_ids:
+        return {}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    placeholders = ', '.join('?' * len(user_ids))
+    cursor.execute(f'''
+        SELECT user_id, domain, COUNT(*) as count
+        FROM chat_history
+        WHERE user_id IN ({placeholders})
+        GROUP BY user_id, domain
+    ''', list(user_ids))
+    
+    activity = {}
+    for row in cursor.fetchall():
+        activity.setdefault(row['user_id'], {})[row['domain']] = row['count']
+    conn.close()
+    
+    return activity
+
+def get_viewed_recommendations(user_ids):
+    """Get (domain, topic) pairs each user has already viewed"""
+    if not user_ids:
+        return {}
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    placeholders = ', '.join('?' * len(user_ids))
+    cursor.execute(f'''
+        SELECT user_id, domain, topic
+        FROM recommendations
+        WHERE is_viewed = TRUE AND user_id IN ({placeholders})
+    ''', list(user_ids))
+    
+    viewed = {}
+    for row in cursor.fetchall():
+        viewed.setdefault(row['user_id'], set()).add((row['domain'], row['topic']))
+    conn.close()
+    
+    return viewed
+
+def bulk_upsert_recommendations(user_ids, rows):
+    """Replace unviewed recommendations for a batch of users in one transaction
+    
+    Viewed rows are kept so the next batch run can still see them; rows for
+    items that are recommended again are updated in place.
+    """
+    if not user_ids:
+        return 0
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    try:
+        placeholders = ', '.join('?' * len(user_ids))
+        cursor.execute(f'''
+            DELETE FROM recommendations
+            WHERE is_viewed = FALSE AND user_id IN ({placeholders})
+        ''', list(user_ids))
+        
+        cursor.executemany('''
+            INSERT INTO recommendations
+            (user_id, topic, domain, recommendation_type, content_url, description, confidence_score)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (user_id, domain, topic) DO UPDATE SET
+                recommendation_type = excluded.recommendation_type,
+                content_url = excluded.content_url,
+                description = excluded.description,
+                confidence_score = excluded.confidence_score,
+                created_at = CURRENT_TIMESTAMP
+        ''', rows)
+        _bump_resource_versions(cursor, 'recommendations', user_ids)
+        
+        conn.commit()
+    finally:
+        conn.close()
+    
+    for user_id in user_ids:
+        _notify_write('recommendations', user_id)
+    
+    return len(rows)
+
+def get_precomputed_recommendations(user_id, domain=None, limit=10):
+    """Get batch-computed recommendations for a user, best first"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    query = '''
+        SELECT id, topic, domain, recommendation_type, content_url, description,
+               confidence_score, is_viewed, created_at
+        FROM recommendations
+        WHERE user_id = ?
+    '''
+    params = [user_id]
+    
+    if domain:
+        query += ' AND domain = ?'
+        params.append(domain)
+    
+    query += ' ORDER BY is_viewed ASC, confidence_score DESC LIMIT ?'
+    params.append(limit)
+    
+    cursor.execute(query, params)
+    recommendations = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in recommendations]
+
+def mark_recommendation_viewed(user_id, recommendation_id):
+    """Mark a recommendation as viewed by its owner"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE recommendations SET is_viewed = TRUE
+        WHERE id = ? AND user_id = ?
+    ''', (recommendation_id, user_id))
+    
+    success = cursor.rowcount > 0
+    if success:
+        _bump_resource_versions(cursor, 'recommendations', [user_id])
+    conn.commit()
+    conn.close()
+    
+    if success:
+        _notify_write('recommendations', user_id, recommendation_id=recommendation_id)
+    
+    return success
+
+def create_doubt(user_id, doubt_text, context=None, domain=None, priority='medium'):
+    """Record a new doubt"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        INSERT INTO doubts (user_id, doubt_text, context, domain, priority)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, doubt_text, context, domain, priority))
+    
+    doubt_id = cursor.lastrowid
+    conn.commit()
+    conn.close()
+    
+    return doubt_id
+
+def save_doubt_resolution(doubt_id, resolution, answered_by=None, source=None, confidence=None):
+    """Store a doubt's resolution and mark it resolved
+    
+    ``answered_by`` is the doubt the answer was generated for (the doubt itself
+    unless a past answer was reused); doubts sharing it form a duplicate cluster.
+    ``source`` ('llm' or 'rules') and ``confidence`` describe how that answer
+    was generated.
+    """
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE doubts
+        SET resolution = ?, answered_by = ?, resolution_source = ?, confidence = ?,
+            status = 'resolved', resolved_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    ''', (resolution, answered_by if answered_by is not None else doubt_id, source, confidence, doubt_id))
+    
+    conn.commit()
+    conn.close()
+
+def get_doubt(doubt_id):
+    """Get a doubt by ID"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT id, user_id, doubt_text, context, resolution, status, domain, priority,
+               answered_by, resolution_source, confidence, created_at, resolved_at
+        FROM doubts WHERE id = ?
+    ''', (doubt_id,))
+    
+    doubt = cursor.fetchone()
+    conn.close()
+    
+    return dict(doubt) if doubt else None
+
+def iter_resolved_doubts(max_id=None, source=None, batch_size=5000):
+    """Stream (id, doubt_text) of resolved doubts in id order, optionally only those answered by ``source``"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    query = "SELECT id, doubt_text FROM doubts WHERE status = 'resolved'"
+    params = []
+    if source is not None:
+        query += ' AND resolution_source = ?'
+        params.append(source)
+    if max_id is not None:
+        query += ' AND id <= ?'
+        params.append(max_id)
+    
+    try:
+        cursor.execute(query + ' ORDER BY id', params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield row['id'], row['doubt_text']
+    finally:
+        conn.close()
+
+def claim_pending_doubts(limit=8):
+    """Atomically move the highest-priority pending doubts to 'processing'
+    
+    Idle queue workers call this every poll interval, so the write lock is
+    only taken once a plain read has seen pending doubts.
+    """
+    conn = get_db_connection()
+    conn.isolation_level = None
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT EXISTS(SELECT 1 FROM doubts WHERE status = 'pending') AS pending")
+    if not cursor.fetchone()['pending']:
+        conn.close()
+        return []
+    
+    try:
+        cursor.execute('BEGIN IMMEDIATE')
+        cursor.execute('''
+            SELECT id, user_id, doubt_text, context, domain, priority
+            FROM doubts
+            WHERE status = 'pending'
+            ORDER BY CASE priority WHEN 'high' THEN 0 WHEN 'medium' THEN 1 ELSE 2 END, id
+            LIMIT ?
+        ''', (limit,))
+        doubts = [dict(row) for row in cursor.fetchall()]
+        
+        if doubts:
+            cursor.executemany(
+                "UPDATE doubts SET status = 'processing', claimed_at = strftime('%s', 'now') WHERE id = ?",
+                [(doubt['id'],) for doubt in doubts]
+            )
+        cursor.execute('COMMIT')
+    except Exception:
+        cursor.execute('ROLLBACK')
+        raise
+    finally:
+        conn.close()
+    
+    return doubts
+
+def requeue_stale_doubts(older_than_seconds=300):
+    """Return doubts stuck in 'processing' (e.g. after a crash) to the queue"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        UPDATE doubts SET status = 'pending', claimed_at = NULL
+        WHERE status = 'processing' AND claimed_at < strftime('%s', 'now') - ?
+    ''', (older_than_seconds,))
+    
+    requeued = cursor.rowcount
+    conn.commit()
+    conn.close()
+    
+    return requeued
+
+def count_pending_doubts():
+    """Get the number of doubts waiting in the queue"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT COUNT(*) as pending FROM doubts WHERE status = 'pending'")
+    pending = cursor.fetchone()['pending']
+    conn.close()
+    
+    return pending
+
+def count_resolved_doubts():
+    """Get the number of resolved doubts"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute("SELECT COUNT(*) as resolved FROM doubts WHERE status = 'resolved'")
+    resolved = cursor.fetchone()['resolved']
+    conn.close()
+    
+    return resolved
+
+def get_doubt_clusters(min_size=2, limit=20):
+    """Largest groups of doubts answered from the same doubt, with that doubt's text"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT c.answered_by AS doubt_id, c.size, d.doubt_text AS doubt, c.last_asked
+        FROM (
+            SELECT answered_by, COUNT(*) AS size, MAX(created_at) AS last_asked
+            FROM doubts
+            WHERE answered_by IS NOT NULL
+            GROUP BY answered_by
+            HAVING COUNT(*) >= ?
+        ) c
+        JOIN doubts d ON d.id = c.answered_by
+        ORDER BY c.size DESC, c.answered_by
+        LIMIT ?
+    ''', (min_size, limit))
+    
+    clusters = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in clusters]
+
+def get_max_doubt_id():
+    """Get the highest doubt id, or 0 when there are none"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT COALESCE(MAX(id), 0) as max_id FROM doubts')
+    max_id = cursor.fetchone()['max_id']
+    conn.close()
+    
+    return max_id
+
+def load_user_preferences():
+    """Load all persisted preference vectors"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.execute('SELECT user_id, weights, updated_at FROM user_preferences')
+    preferences = cursor.fetchall()
+    conn.close()
+    
+    return [dict(row) for row in preferences]
+
+def save_user_preferences(rows):
+    """Upsert (user_id, weights_json, updated_at) preference rows"""
+    if not rows:
+        return
+    
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    
+    cursor.executemany('''
+        INSERT INTO user_preferences (user_id, weights, updated_at)
+        VALUES (?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            weights = excluded.weights,
+            updated_at = excluded.updated_at
+    ''', rows)
+    
+    conn.commit()
+    conn.close()
+
+def _observed(func):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _query_observers:
+            return func(*args, **kwargs)
+        
+        error = None
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            for callback in _query_observers:
+                try:
+                    callback(func.__name__, elapsed, error)
+                except Exception as e:
+                    print(f"Error in query observer: {e}")
+    return wrapper
+
+# Time every public query function. Generators are left alone, since calling
+# one returns before any query runs; so are the helpers that run no query.
+for _name, _func in list(globals().items()):
+    if (inspect.isfunction(_func) and _func.__module__ == __name__ and not _name.startswith('_')
+            and not inspect.isgeneratorfunction(_func)
+            and _name not in ('register_write_listener', 'register_query_observer', 'get_db_connection', 'parse_timestamp')):
+        globals()[_name] = _observed(_func)
+del _name, _func
+
 if __name__ == '__main__':
     init_db()
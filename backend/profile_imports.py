@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Import-time profile for Topper AI Mentor
+Imports a module (the Flask app by default) in a fresh interpreter with
+``python -X importtime`` and lists the slowest imports, by cumulative time
+(the module and everything it pulled in) and by self time.
+
+Usage: python profile_imports.py [--module app] [--top 20] [--prefix services.]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def import_times(module='app'):
+    """{module: (self_us, cumulative_us)} for a cold import of ``module``"""
+    env = dict(os.environ, DEFER_BACKGROUND_SERVICES='1')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        # "import time:   self [us] | cumulative | imported package"
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        times[name] = (int(fields[0]), int(fields[1]))
+    return times
+
+def print_table(title, rows):
+    print(f"\n{title}")
+    print(f"{'self ms':>9} {'cumul ms':>9}  module")
+    for name, (self_us, cumulative_us) in rows:
+        print(f"{self_us / 1000:>9.1f} {cumulative_us / 1000:>9.1f}  {name}")
+
+def main():
+    parser = argparse.ArgumentParser(description='List the slowest imports of a cold start')
+    parser.add_argument('--module', default='app', help='module to import (e.g. app, asgi)')
+    parser.add_argument('--top', type=int, default=20, help='rows per table')
+    parser.add_argument('--prefix', default='', help='only list modules starting with this')
+    args = parser.parse_args()
+
+    # The first run may compile .pyc files; profile a second, warm-cache run
+    import_times(args.module)
+    times = import_times(args.module)
+    selected = [(name, entry) for name, entry in times.items() if name.startswith(args.prefix)]
+
+    print(f"⏱️  Import profile of '{args.module}'")
+    print("=" * 60)
+    print(f"Total: {times[args.module][1] / 1000:.1f}ms across {len(times)} modules")
+
+    print_table("Slowest by cumulative time:",
+                sorted(selected, key=lambda entry: entry[1][1], reverse=True)[:args.top])
+    print_table("Slowest by self time:",
+                sorted(selected, key=lambda entry: entry[1][0], reverse=True)[:args.top])
+
+if __name__ == "__main__":
+    main()
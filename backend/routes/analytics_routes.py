@@ -0,0 +1,43 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required
+
+from routes.http_utils import roles_required
+from services.workload_analytics import WorkloadAnalytics
+
+# Create blueprint
+analytics_bp = Blueprint('analytics', __name__)
+
+workload_analytics = WorkloadAnalytics()
+
+@analytics_bp.route('/workload', methods=['GET'])
+@jwt_required()
+@roles_required('instructor', 'admin')
+def get_cohort_workload():
+    """Get the per-day deadline heatmap for a cohort (course, optionally year)"""
+    try:
+        course = request.args.get('course')
+        year = request.args.get('year', type=int)
+        days = request.args.get('days', 28, type=int)
+        
+        if not course:
+            return jsonify({'success': False, 'error': 'course is required'}), 400
+        
+        from models.database import parse_timestamp
+        
+        start_param = request.args.get('from')
+        start_ts = parse_timestamp(start_param) if start_param else None
+        if start_param and start_ts is None:
+            return jsonify({'success': False, 'error': 'Invalid from date'}), 400
+        
+        heatmap = workload_analytics.cohort_heatmap(course, year, start_ts, days)
+        
+        return jsonify({
+            'success': True,
+            'data': heatmap
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
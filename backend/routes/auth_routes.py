@@ -1,12 +1,21 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import check_password_hash, generate_password_hash
+from services.password_hasher import get_password_hasher
+from services.rate_limiter import rate_limit
 from datetime import datetime, timezone, timedelta
+import hmac
+import io
+import os
 import re
 
 # Create blueprint
 auth_bp = Blueprint('auth', __name__)
 
+def _hashing_busy():
+    response = jsonify({'success': False, 'error': 'Too many sign-in attempts right now, please retry'})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
 @auth_bp.route('/register', methods=['POST'])
 def register():
     """Register a new student"""
@@ -41,7 +50,7 @@ def register():
             return jsonify({'error': 'User with this email already exists'}), 400
         
         # Hash password
-        password_hash = generate_password_hash(password)
+        password_hash = get_password_hasher().hash(password)
         
         # Create user
         user_id = create_user(
@@ -67,6 +76,8 @@ def register():
             }
         }), 201
         
+    except TimeoutError:
+        return _hashing_busy()
     except Exception as e:
         return jsonify({
             'success': False,
@@ -74,6 +85,7 @@ def register():
         }), 500
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', per_ip='60/minute', per_ip_account='10/minute')
 def login():
     """Login a student"""
     try:
@@ -89,9 +101,18 @@ def login():
         from models.database import get_user_by_email
         user = get_user_by_email(email)
         
-        if not user or not check_password_hash(user['password_hash'], password):
+        if not user:
+            return jsonify({'error': 'Invalid email or password'}), 401
+        
+        valid, upgraded_hash = get_password_hasher().verify_and_upgrade(password, user['password_hash'])
+        if not valid:
             return jsonify({'error': 'Invalid email or password'}), 401
         
+        # Move legacy or outdated-cost hashes to the current scheme
+        if upgraded_hash:
+            from models.database import update_user
+            update_user(user['id'], {'password_hash': upgraded_hash})
+        
         # Create access token
         access_token = create_access_token(identity=user['id'])
         
@@ -109,6 +130,47 @@ def login():
             }
         })
         
+    except TimeoutError:
+        return _hashing_busy()
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@auth_bp.route('/bulk-register', methods=['POST'])
+def bulk_register():
+    """Register a cohort of students from a CSV upload (requires PROVISIONING_API_KEY)"""
+    try:
+        api_key = os.getenv('PROVISIONING_API_KEY')
+        if not api_key:
+            return jsonify({'success': False, 'error': 'Bulk provisioning is not enabled'}), 403
+        if not hmac.compare_digest(request.headers.get('X-Provisioning-Key', '').encode(), api_key.encode()):
+            return jsonify({'success': False, 'error': 'Invalid provisioning key'}), 403
+        
+        # Multipart upload field 'file', or the CSV itself as a text/csv body
+        upload = request.files.get('file')
+        if upload:
+            raw = upload.stream
+        elif request.mimetype == 'text/csv':
+            raw = request.stream
+        else:
+            return jsonify({'success': False, 'error': 'CSV file is required'}), 400
+        
+        from services.user_provisioning import CohortProvisioner, read_students
+        stream = io.TextIOWrapper(raw, encoding='utf-8-sig', newline='')
+        report = CohortProvisioner().provision(read_students(stream))
+        
+        return jsonify({
+            'success': True,
+            'data': report
+        })
+        
+    except (ValueError, UnicodeDecodeError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
     except Exception as e:
         return jsonify({
             'success': False,
@@ -122,8 +184,8 @@ def get_profile():
     try:
         user_id = get_jwt_identity()
         
-        from models.database import get_user_by_id
-        user = get_user_by_id(user_id)
+        from services.user_profiles import get_user_profile
+        user = get_user_profile(user_id)
         
         if not user:
             return jsonify({'error': 'User not found'}), 404
@@ -201,14 +263,15 @@ def change_password():
             return jsonify({'error': 'New password must be at least 6 characters long'}), 400
         
         # Get user and verify current password
-        from models.database import get_user_by_id, update_user
-        user = get_user_by_id(user_id)
+        from models.database import get_password_hash, update_user
+        password_hash = get_password_hash(user_id)
+        hasher = get_password_hasher()
         
-        if not user or not check_password_hash(user['password_hash'], current_password):
+        if not password_hash or not hasher.verify(current_password, password_hash):
             return jsonify({'error': 'Current password is incorrect'}), 401
         
         # Update password
-        new_password_hash = generate_password_hash(new_password)
+        new_password_hash = hasher.hash(new_password)
         success = update_user(user_id, {'password_hash': new_password_hash})
         
         if success:
@@ -219,6 +282,8 @@ def change_password():
         else:
             return jsonify({'error': 'Failed to change password'}), 500
         
+    except TimeoutError:
+        return _hashing_busy()
     except Exception as e:
         return jsonify({
             'success': False,
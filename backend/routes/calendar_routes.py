@@ -0,0 +1,55 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from routes.http_utils import conditional_response
+import time
+
+# Create blueprint
+calendar_bp = Blueprint('calendar', __name__)
+
+DEFAULT_WINDOW_DAYS = 30
+MAX_WINDOW_DAYS = 366
+
+@calendar_bp.route('', methods=['GET'])
+@jwt_required()
+def get_calendar():
+    """Get deadlines and project intervals overlapping a time window
+    
+    ``from`` and ``to`` accept dates, timestamps, ISO 8601 or epoch seconds and
+    default to the next 30 days. Responses carry an ETag, so a client that
+    sends If-None-Match gets a 304 when nothing in its window changed.
+    """
+    try:
+        user_id = get_jwt_identity()
+        
+        from models.database import parse_timestamp, get_calendar_items
+        
+        start_param = request.args.get('from')
+        end_param = request.args.get('to')
+        start_ts = parse_timestamp(start_param) if start_param else int(time.time())
+        end_ts = parse_timestamp(end_param) if end_param else None
+        
+        if start_ts is None or (end_param and end_ts is None):
+            return jsonify({'success': False, 'error': 'Invalid from/to date'}), 400
+        if end_ts is None:
+            end_ts = start_ts + DEFAULT_WINDOW_DAYS * 86400
+        if end_ts < start_ts:
+            return jsonify({'success': False, 'error': "'to' must not be before 'from'"}), 400
+        if end_ts - start_ts > MAX_WINDOW_DAYS * 86400:
+            return jsonify({'success': False, 'error': f'Window is limited to {MAX_WINDOW_DAYS} days'}), 400
+        
+        items = get_calendar_items(user_id, start_ts, end_ts)
+        
+        return conditional_response(jsonify({
+            'success': True,
+            'data': {
+                'from': start_ts,
+                'to': end_ts,
+                'items': items
+            }
+        }))
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
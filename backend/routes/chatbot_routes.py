@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
 from services.ai_chatbot import AIchatbot
+from services.rate_limiter import rate_limit
+from routes.http_utils import conditional, conditional_response
 
 # Create blueprint
 chatbot_bp = Blueprint('chatbot', __name__)
@@ -11,6 +13,7 @@ ai_chatbot = AIchatbot()
 
 @chatbot_bp.route('/message', methods=['POST'])
 @jwt_required()
+@rate_limit('chat', per_user='20/minute', per_ip='60/minute')
 def send_message():
     """Send a message to the AI chatbot"""
     try:
@@ -37,6 +40,7 @@ def send_message():
         }), 500
 
 @chatbot_bp.route('/test', methods=['POST'])
+@rate_limit('chatbot-test', per_ip='5/minute')
 def test_chatbot():
     """Test endpoint for chatbot without authentication (for development)"""
     try:
@@ -68,6 +72,7 @@ def test_chatbot():
 
 @chatbot_bp.route('/history', methods=['GET'])
 @jwt_required()
+@conditional('chat_history')
 def get_chat_history():
     """Get user's chat history"""
     try:
@@ -127,13 +132,14 @@ def get_available_domains():
                 'description': ai_chatbot.domain_contexts[domain]['system_prompt']
             }
         
-        return jsonify({
+        # Static per deployment, so shared caches may keep it briefly
+        return conditional_response(jsonify({
             'success': True,
             'data': {
                 'domains': domain_info,
                 'default': 'general'
             }
-        })
+        }), cache_control='public, max-age=300')
         
     except Exception as e:
         return jsonify({
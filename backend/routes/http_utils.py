@@ -0,0 +1,118 @@
+from typing import Optional
+from functools import wraps
+import gzip
+import hashlib
+import os
+import time
+
+from flask import request, current_app
+
+try:
+    import brotli
+except ImportError:  # gzip only
+    brotli = None
+
+COMPRESS_MIN_BYTES = int(os.getenv('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+BROTLI_QUALITY = 5
+
+COMPRESSIBLE_MIMETYPES = ('application/json', 'text/html', 'text/plain', 'text/csv')
+
+
+def conditional(*resources: str, expires_every: Optional[int] = None):
+    """Serve GETs with a weak ETag built from the user's version counters of ``resources``
+
+    The counters (see VERSIONED_TABLES in models.database) are read before the
+    view runs, so a matching If-None-Match is answered with 304 after one small
+    lookup instead of the view's queries. Views whose output also depends on
+    the clock (e.g. "upcoming" deadlines) pass ``expires_every`` seconds.
+    Must be applied under ``jwt_required``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(*args, **kwargs)
+
+            from flask_jwt_extended import get_jwt_identity
+            from models.database import get_resource_versions
+
+            user_id = get_jwt_identity()
+            versions = get_resource_versions(user_id, resources)
+            parts = [request.endpoint, str(user_id), request.query_string.decode('latin-1'), repr(sorted(kwargs.items()))]
+            parts.extend(f'{resource}={versions[resource]}' for resource in resources)
+            if expires_every:
+                parts.append(str(int(time.time() // expires_every)))
+            etag = hashlib.blake2b('|'.join(parts).encode('utf-8'), digest_size=12).hexdigest()
+
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+
+def roles_required(*roles: str):
+    """Allow a view only to users whose role (users.role) is one of ``roles``; 403 otherwise
+
+    The role is read from the cached user profile, so a change applies within
+    USER_PROFILE_TTL. Must be applied under ``jwt_required``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import jsonify
+            from flask_jwt_extended import get_jwt_identity
+            from services.user_profiles import get_user_profile
+
+            profile = get_user_profile(get_jwt_identity())
+            if not profile or (profile.get('role') or 'student') not in roles:
+                return jsonify({'success': False, 'error': 'Insufficient permissions'}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def conditional_response(response, cache_control: str = 'private, no-cache'):
+    """ETag a rendered response from its body and answer If-None-Match with 304"""
+    response.add_etag(weak=True)
+    response.headers['Cache-Control'] = cache_control
+    return response.make_conditional(request)
+
+
+def compress_response(response):
+    """after_request hook: brotli- or gzip-compress large text and JSON bodies"""
+    if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+        return response
+    response.vary.add('Accept-Encoding')
+
+    if (response.status_code != 200 or response.direct_passthrough or response.is_streamed
+            or 'Content-Encoding' in response.headers):
+        return response
+
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        response.set_data(brotli.compress(data, quality=BROTLI_QUALITY))
+        response.headers['Content-Encoding'] = 'br'
+    elif accepted['gzip']:
+        response.set_data(gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0))
+        response.headers['Content-Encoding'] = 'gzip'
+    else:
+        return response
+
+    # A strong ETag names exact bytes; the encoded body is a different representation
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
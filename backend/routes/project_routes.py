@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
+from routes.http_utils import conditional
 
 # Create blueprint
 project_bp = Blueprint('project', __name__)
 
 @project_bp.route('/list', methods=['GET'])
 @jwt_required()
+@conditional('projects')
 def get_projects():
     """Get user's projects"""
     try:
@@ -57,6 +59,8 @@ def create_project():
             'data': {'project_id': project_id}
         }), 201
         
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
     except Exception as e:
         return jsonify({
             'success': False,
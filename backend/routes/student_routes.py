@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from datetime import datetime, timezone
+from routes.http_utils import conditional
 
 # Create blueprint
 student_bp = Blueprint('student', __name__)
 
 @student_bp.route('/dashboard', methods=['GET'])
 @jwt_required()
+@conditional('chat_history', 'user_interactions', 'deadlines', expires_every=60)
 def get_dashboard():
     """Get student dashboard data"""
     try:
@@ -1,10 +1,16 @@
-import google.generativeai as genai
+import asyncio
 import os
 from datetime import datetime, timezone
 import json
 import re
+import time
 from typing import List, Dict, Any
 from models.database import save_chat_history, get_user_chat_history, save_user_interaction
+from services.metrics import observe_llm_call
+
+# In-flight async Gemini calls per process, and how long one may take
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 1000))
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 60))
 
 class AIchatbot:
     """AI Chatbot for academic assistance using Google Gemini"""
@@ -13,12 +19,18 @@ class AIchatbot:
         # Initialize Google Gemini API
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
         if self.gemini_api_key:
+            # Imported here: the SDK's dependency tree is large and unused without a key
+            import google.generativeai as genai
+            
             genai.configure(api_key=self.gemini_api_key)
             self.model = genai.GenerativeModel('gemini-1.5-flash')
         else:
             print("Warning: No Gemini API key found. Using fallback responses.")
             self.model = None
         
+        # Created on first async call, inside the event loop
+        self._llm_slots = None
+        
         # Domain-specific knowledge bases
         self.domain_contexts = {
             'data_science': {
@@ -58,20 +70,22 @@ class AIchatbot:
     def get_context_from_history(self, user_id: int, limit: int = 5) -> str:
         """Get relevant context from user's chat history"""
         try:
-            history = get_user_chat_history(user_id, limit)
-            if not history:
-                return ""
-            
-            context_parts = []
-            for chat in history:
-                context_parts.append(f"User: {chat['message']}")
-                context_parts.append(f"Assistant: {chat['response']}")
-            
-            return "\n".join(context_parts[-10:])  # Last 5 conversations
+            return self._format_context(get_user_chat_history(user_id, limit))
         except Exception as e:
             print(f"Error getting context: {e}")
             return ""
     
+    def _format_context(self, history: List[Dict[str, Any]]) -> str:
+        if not history:
+            return ""
+        
+        context_parts = []
+        for chat in history:
+            context_parts.append(f"User: {chat['message']}")
+            context_parts.append(f"Assistant: {chat['response']}")
+        
+        return "\n".join(context_parts[-10:])  # Last 5 conversations
+    
     def process_message(self, message: str, user_id: int, domain: str = None) -> Dict[str, Any]:
         """Process user message and generate AI response"""
         try:
@@ -99,32 +113,70 @@ class AIchatbot:
                 duration=response.get('processing_time', 0)
             )
             
-            return {
-                'text': response['text'],
-                'domain': domain,
-                'confidence': response.get('confidence', 0.8),
-                'suggestions': response.get('suggestions', []),
-                'resources': response.get('resources', []),
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+            return self._message_result(response, domain)
             
         except Exception as e:
             print(f"Error processing message: {e}")
-            return {
-                'text': "I apologize, but I'm having trouble processing your request right now. Please try again or rephrase your question.",
-                'domain': domain or 'general',
-                'confidence': 0.0,
-                'error': True,
-                'timestamp': datetime.now(timezone.utc).isoformat()
-            }
+            return self._error_result(domain)
     
-    def _generate_gemini_response(self, message: str, domain: str, context: str) -> Dict[str, Any]:
-        """Generate response using Google Gemini API"""
+    async def process_message_async(self, message: str, user_id: int, domain: str = None) -> Dict[str, Any]:
+        """Same as ``process_message``, without holding a thread while the model answers"""
+        from models import async_database
+        
         try:
-            system_prompt = self.domain_contexts.get(domain, self.domain_contexts['general'])['system_prompt']
+            if not domain or domain == 'auto':
+                domain = self.detect_domain(message)
+            
+            try:
+                context = self._format_context(await async_database.get_user_chat_history(user_id, 5))
+            except Exception as e:
+                print(f"Error getting context: {e}")
+                context = ""
+            
+            if self.model:
+                response = await self._generate_gemini_response_async(message, domain, context)
+            else:
+                response = self._generate_fallback_response(message, domain)
+            
+            await async_database.save_chat_history(user_id, message, response['text'], domain,
+                                                   response.get('confidence', 0.8))
+            await async_database.save_user_interaction(
+                user_id,
+                'chat_message',
+                content_type='ai_response',
+                duration=response.get('processing_time', 0)
+            )
+            
+            return self._message_result(response, domain)
             
-            # Construct the prompt with context
-            full_prompt = f"""
+        except Exception as e:
+            print(f"Error processing message: {e}")
+            return self._error_result(domain)
+    
+    def _message_result(self, response: Dict[str, Any], domain: str) -> Dict[str, Any]:
+        return {
+            'text': response['text'],
+            'domain': domain,
+            'confidence': response.get('confidence', 0.8),
+            'suggestions': response.get('suggestions', []),
+            'resources': response.get('resources', []),
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    
+    def _error_result(self, domain: str) -> Dict[str, Any]:
+        return {
+            'text': "I apologize, but I'm having trouble processing your request right now. Please try again or rephrase your question.",
+            'domain': domain or 'general',
+            'confidence': 0.0,
+            'error': True,
+            'timestamp': datetime.now(timezone.utc).isoformat()
+        }
+    
+    def _build_prompt(self, message: str, domain: str, context: str) -> str:
+        system_prompt = self.domain_contexts.get(domain, self.domain_contexts['general'])['system_prompt']
+        
+        # Construct the prompt with context
+        return f"""
 {system_prompt}
 
 Previous conversation context:
@@ -139,26 +191,55 @@ Please provide a helpful, educational response that:
 4. Is appropriate for academic learning
 
 Response:"""
-            
-            # Generate response using Gemini
-            response = self.model.generate_content(full_prompt)
-            ai_response = response.text
-            
-            # Extract suggestions and resources
-            suggestions = self._extract_suggestions(ai_response)
-            resources = self._extract_resources(domain)
-            
-            return {
-                'text': ai_response,
-                'confidence': 0.9,
-                'suggestions': suggestions,
-                'resources': resources,
-                'processing_time': 1.5
-            }
+    
+    def _gemini_result(self, ai_response: str, domain: str) -> Dict[str, Any]:
+        # Extract suggestions and resources
+        return {
+            'text': ai_response,
+            'confidence': 0.9,
+            'suggestions': self._extract_suggestions(ai_response),
+            'resources': self._extract_resources(domain),
+            'processing_time': 1.5
+        }
+    
+    def _generate_gemini_response(self, message: str, domain: str, context: str) -> Dict[str, Any]:
+        """Generate response using Google Gemini API"""
+        started = time.perf_counter()
+        try:
+            response = self.model.generate_content(self._build_prompt(message, domain, context))
+            result = self._gemini_result(response.text, domain)
             
         except Exception as e:
+            observe_llm_call('chat', time.perf_counter() - started, 'error')
             print(f"Gemini API error: {e}")
             return self._generate_fallback_response(message, domain)
+        
+        observe_llm_call('chat', time.perf_counter() - started, response=response)
+        return result
+    
+    async def _generate_gemini_response_async(self, message: str, domain: str, context: str) -> Dict[str, Any]:
+        """Generate response using Gemini's async client, bounded by LLM_MAX_CONCURRENCY and LLM_TIMEOUT"""
+        started = time.perf_counter()
+        try:
+            if self._llm_slots is None:
+                self._llm_slots = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+            async with self._llm_slots:
+                # Time spent waiting for a slot is not the model's
+                started = time.perf_counter()
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(self._build_prompt(message, domain, context)),
+                    LLM_TIMEOUT
+                )
+            result = self._gemini_result(response.text, domain)
+            
+        except Exception as e:
+            outcome = 'timeout' if isinstance(e, asyncio.TimeoutError) else 'error'
+            observe_llm_call('chat', time.perf_counter() - started, outcome)
+            print(f"Gemini API error: {e!r}")
+            return self._generate_fallback_response(message, domain)
+        
+        observe_llm_call('chat', time.perf_counter() - started, response=response)
+        return result
     
     def _generate_fallback_response(self, message: str, domain: str) -> Dict[str, Any]:
         """Generate fallback response when OpenAI is not available"""
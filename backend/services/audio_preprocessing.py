@@ -0,0 +1,240 @@
+from typing import Dict, Any, Iterator, Optional, Tuple
+from collections import deque
+import os
+import struct
+import tempfile
+import time
+import wave
+import numpy as np
+
+try:
+    import soundfile
+except ImportError:  # FLAC decoding is optional
+    soundfile = None
+
+TARGET_RATE = 16000
+CHUNK_FRAMES = 65536
+FRAME_SECONDS = 0.02
+SILENCE_DB = -40.0
+PADDING_SECONDS = 0.2
+
+
+def _pcm_to_float(data: bytes, sample_width: int, channels: int) -> np.ndarray:
+    """Interleaved PCM bytes to a (frames, channels) float32 array in [-1, 1]"""
+    if sample_width == 1:
+        samples = (np.frombuffer(data, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+    elif sample_width == 2:
+        samples = np.frombuffer(data, dtype='<i2').astype(np.float32) / 32768.0
+    elif sample_width == 3:
+        raw = np.frombuffer(data, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+        values = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+        values = np.where(values >= 1 << 23, values - (1 << 24), values)
+        samples = values.astype(np.float32) / float(1 << 23)
+    elif sample_width == 4:
+        samples = np.frombuffer(data, dtype='<i4').astype(np.float32) / float(1 << 31)
+    else:
+        raise ValueError(f"Unsupported sample width: {sample_width}")
+    return samples.reshape(-1, channels)
+
+
+def _wav_blocks(path: str, chunk_frames: int) -> Tuple[int, Iterator[np.ndarray]]:
+    reader = wave.open(path, 'rb')
+    rate, channels, width = reader.getframerate(), reader.getnchannels(), reader.getsampwidth()
+
+    def blocks():
+        try:
+            while True:
+                data = reader.readframes(chunk_frames)
+                if not data:
+                    break
+                yield _pcm_to_float(data, width, channels)
+        finally:
+            reader.close()
+
+    return rate, blocks()
+
+
+def _soundfile_blocks(path: str, chunk_frames: int) -> Tuple[int, Iterator[np.ndarray]]:
+    rate = soundfile.info(path).samplerate
+    return rate, soundfile.blocks(path, blocksize=chunk_frames, dtype='float32', always_2d=True)
+
+
+def decode_blocks(path: str, audio_format: str, chunk_frames: int = CHUNK_FRAMES) -> Optional[Tuple[int, Iterator[np.ndarray]]]:
+    """(sample rate, iterator of (frames, channels) float32 blocks), or None if undecodable here"""
+    if audio_format == 'wav':
+        try:
+            return _wav_blocks(path, chunk_frames)
+        except (wave.Error, EOFError, ValueError):
+            # e.g. WAVE_FORMAT_EXTENSIBLE or float samples
+            pass
+    if audio_format in ('wav', 'flac') and soundfile is not None:
+        try:
+            return _soundfile_blocks(path, chunk_frames)
+        except RuntimeError:
+            pass
+    return None
+
+
+class StreamingResampler:
+    """Chunked low-pass filter and linear-interpolation resampler
+
+    A windowed-sinc FIR removes content above the target Nyquist frequency before
+    the signal is sampled at the new rate; filter history and the fractional read
+    position carry across chunks, so output is independent of chunk boundaries.
+    """
+
+    def __init__(self, source_rate: int, target_rate: int = TARGET_RATE, taps: int = 63):
+        self.step = source_rate / target_rate
+        self.passthrough = source_rate == target_rate
+
+        cutoff = 0.45 * min(1.0, target_rate / source_rate)
+        n = np.arange(taps) - (taps - 1) / 2
+        kernel = 2 * cutoff * np.sinc(2 * cutoff * n) * np.hamming(taps)
+        self.kernel = (kernel / kernel.sum()).astype(np.float32)
+
+        self._history = np.zeros(taps - 1, dtype=np.float32)
+        self._previous = np.float32(0.0)
+        self._consumed = -1  # source index of self._previous
+        self._next_position = 0.0
+
+    def process(self, samples: np.ndarray) -> np.ndarray:
+        if self.passthrough or not len(samples):
+            return samples
+
+        extended = np.concatenate([self._history, samples])
+        filtered = np.convolve(extended, self.kernel, mode='valid').astype(np.float32)
+        self._history = extended[-(len(self.kernel) - 1):]
+
+        # Source positions covered: self._consumed (previous sample) .. self._consumed + len(filtered)
+        values = np.concatenate([[self._previous], filtered])
+        last = self._consumed + len(filtered)
+        count = int(np.floor((last - self._next_position) / self.step)) + 1 if self._next_position <= last else 0
+        positions = self._next_position + self.step * np.arange(count)
+
+        output = np.interp(positions - self._consumed, np.arange(len(values)), values).astype(np.float32)
+
+        self._next_position += self.step * count
+        self._previous = filtered[-1]
+        self._consumed = last
+        return output
+
+
+class SilenceTrimmer:
+    """Energy-based VAD that drops leading and trailing silence from a PCM stream
+
+    Samples are grouped into fixed frames; a frame is speech when its RMS level is
+    above ``threshold_db`` (dBFS). Output starts ``padding`` seconds before the
+    first speech frame, and the caller truncates it at ``end_offset`` to cut the
+    silent tail, so nothing beyond a small pre-roll buffer is held in memory.
+    """
+
+    def __init__(self, rate: int = TARGET_RATE, frame_seconds: float = FRAME_SECONDS,
+                 threshold_db: float = SILENCE_DB, padding_seconds: float = PADDING_SECONDS):
+        self.frame = int(rate * frame_seconds)
+        self.threshold = 10 ** (threshold_db / 20.0)
+        self.padding_frames = max(1, int(round(padding_seconds / frame_seconds)))
+        self._remainder = np.zeros(0, dtype=np.float32)
+        self._preroll = deque(maxlen=self.padding_frames)
+        self.started = False
+        self.written = 0
+        self._speech_end = 0
+
+    def _voiced(self, frames: np.ndarray) -> np.ndarray:
+        return np.sqrt(np.mean(frames * frames, axis=1)) > self.threshold
+
+    def process(self, samples: np.ndarray, final: bool = False) -> np.ndarray:
+        """Return the samples to write for this chunk"""
+        samples = np.concatenate([self._remainder, samples])
+        usable = len(samples) - len(samples) % self.frame
+        if final and usable < len(samples):
+            samples = np.concatenate([samples, np.zeros(self.frame - len(samples) % self.frame, dtype=np.float32)])
+            usable = len(samples)
+        self._remainder = samples[usable:]
+        frames = samples[:usable].reshape(-1, self.frame)
+        if not len(frames):
+            return frames.reshape(-1)
+
+        voiced = self._voiced(frames)
+        if not self.started:
+            hits = np.flatnonzero(voiced)
+            if not len(hits):
+                self._preroll.extend(frames)
+                return np.zeros(0, dtype=np.float32)
+            start = hits[0]
+            self._preroll.extend(frames[:start])
+            frames = np.concatenate([np.array(self._preroll).reshape(-1, self.frame), frames[start:]])
+            voiced = np.concatenate([np.zeros(len(self._preroll), dtype=bool), voiced[start:]])
+            self.started = True
+
+        hits = np.flatnonzero(voiced)
+        if len(hits):
+            # Trailing padding may run into later chunks
+            self._speech_end = self.written + (hits[-1] + 1 + self.padding_frames) * self.frame
+        self.written += len(frames) * self.frame
+        return frames.reshape(-1)
+
+    @property
+    def end_offset(self) -> int:
+        """Samples written up to the end of the last speech frame plus padding"""
+        return min(self._speech_end, self.written)
+
+
+def _wav_header(data_bytes: int, rate: int = TARGET_RATE) -> bytes:
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_bytes, b'WAVE', b'fmt ', 16, 1, 1, rate, rate * 2, 2, 16, b'data', data_bytes
+    )
+
+
+def preprocess_audio(path: str, audio_format: str, output_dir: Optional[str] = None,
+                     chunk_frames: int = CHUNK_FRAMES, threshold_db: float = SILENCE_DB) -> Dict[str, Any]:
+    """Decode, downmix, resample to 16 kHz mono PCM and trim silence, chunk by chunk
+
+    Returns ``path`` of the processed WAV (None when the audio could not be
+    decoded here and should be sent as-is), byte and duration figures, and
+    whether any speech was found.
+    """
+    started = time.perf_counter()
+    bytes_in = os.path.getsize(path)
+    report = {'path': None, 'bytes_in': bytes_in, 'bytes_out': bytes_in, 'seconds_in': None,
+              'seconds_out': None, 'speech': True}
+
+    decoded = decode_blocks(path, audio_format, chunk_frames)
+    if decoded is None:
+        report['preprocess_time'] = round(time.perf_counter() - started, 3)
+        return report
+    rate, blocks = decoded
+
+    resampler = StreamingResampler(rate)
+    trimmer = SilenceTrimmer(threshold_db=threshold_db)
+    frames_in = 0
+
+    fd, out_path = tempfile.mkstemp(prefix='voice-', suffix='.wav', dir=output_dir or os.path.dirname(path))
+    try:
+        with os.fdopen(fd, 'w+b') as output:
+            output.write(_wav_header(0))
+            for block in blocks:
+                frames_in += len(block)
+                mono = block.mean(axis=1) if block.shape[1] > 1 else block[:, 0]
+                samples = trimmer.process(resampler.process(np.ascontiguousarray(mono, dtype=np.float32)))
+                output.write((np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+            samples = trimmer.process(np.zeros(0, dtype=np.float32), final=True)
+            output.write((np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes())
+
+            data_bytes = trimmer.end_offset * 2
+            output.truncate(44 + data_bytes)
+            output.seek(0)
+            output.write(_wav_header(data_bytes))
+    except Exception:
+        os.remove(out_path)
+        raise
+
+    report.update({
+        'path': out_path,
+        'bytes_out': 44 + int(data_bytes),
+        'seconds_in': round(frames_in / rate, 3),
+        'seconds_out': round(int(data_bytes) / 2 / TARGET_RATE, 3),
+        'speech': bool(data_bytes > 0),
+        'preprocess_time': round(time.perf_counter() - started, 3)
+    })
+    return report
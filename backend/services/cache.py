@@ -0,0 +1,108 @@
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+from collections import OrderedDict
+import threading
+import time
+
+MISSING = object()
+
+# Every named cache in the process, for reporting
+_caches: Dict[str, 'TTLCache'] = {}
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache with per-entry TTL and tag invalidation
+
+    Entries can carry tags (e.g. a user id) so every entry derived from that
+    user's data can be dropped in one call when the data changes. Hit, miss and
+    invalidation counters are kept for monitoring.
+    """
+
+    def __init__(self, name: str, ttl: float = 300.0, max_entries: int = 10000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._tags: Dict[Hashable, set] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        _caches[name] = self
+
+    def _remove(self, key: Hashable):
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def get(self, key: Hashable, default: Any = MISSING) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry is not None:
+                self._remove(key)
+            self.misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, tags: Iterable[Hashable] = ()):
+        tags = tuple(tags)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, time.monotonic() + (self.ttl if ttl is None else ttl), tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any], ttl: Optional[float] = None,
+                   tags: Iterable[Hashable] = ()) -> Any:
+        """Return the cached value, calling ``loader`` and caching its result on a miss"""
+        value = self.get(key)
+        if value is MISSING:
+            value = loader()
+            self.set(key, value, ttl, tags)
+        return value
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+                self.invalidations += 1
+
+    def invalidate_tag(self, tag: Hashable):
+        with self._lock:
+            for key in list(self._tags.get(tag, ())):
+                self._remove(key)
+                self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            'name': self.name,
+            'size': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'invalidations': self.invalidations,
+            'evictions': self.evictions
+        }
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Statistics for every cache created in this process"""
+    return {name: cache.stats() for name, cache in _caches.items()}
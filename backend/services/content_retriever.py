@@ -0,0 +1,111 @@
+from typing import List, Dict, Any, Optional, Sequence
+from collections import Counter
+import math
+import threading
+import numpy as np
+
+from algorithms.nlp_algorithms import TextPreprocessor
+
+
+class ContentRetriever:
+    """Content-based retrieval over catalog items using sparse TF-IDF vectors
+
+    Items are tokenized the same way as ``TFIDFVectorizer`` and appended to an
+    inverted index, so adding content never re-reads existing items. The index
+    is compiled into flat NumPy arrays (column-compressed by term) the first time
+    it is queried after a change; queries then score every item with a single
+    ``bincount`` over the postings of the query terms.
+    """
+
+    def __init__(self):
+        self.preprocessor = TextPreprocessor()
+        self.vocabulary: Dict[str, int] = {}
+        self.items: List[Dict[str, Any]] = []
+        self._postings: List[List[int]] = []
+        self._term_freqs: List[List[float]] = []
+        self._lock = threading.Lock()
+        self._compiled = None
+
+    def _tokens(self, text: str) -> List[str]:
+        return self.preprocessor.remove_stop_words(self.preprocessor.tokenize(text or ''))
+
+    def add_items(self, items: Sequence[Dict[str, Any]], text_fields: Sequence[str] = ('title', 'description')):
+        """Index new catalog items"""
+        with self._lock:
+            for item in items:
+                doc_idx = len(self.items)
+                self.items.append(item)
+
+                text = ' '.join(str(item.get(field) or '') for field in text_fields)
+                for term, count in Counter(self._tokens(text)).items():
+                    term_idx = self.vocabulary.get(term)
+                    if term_idx is None:
+                        term_idx = self.vocabulary[term] = len(self._postings)
+                        self._postings.append([])
+                        self._term_freqs.append([])
+                    self._postings[term_idx].append(doc_idx)
+                    self._term_freqs[term_idx].append(1.0 + math.log(count))
+
+            self._compiled = None
+
+    def _compile(self):
+        """Flatten postings into arrays and precompute IDF and item norms"""
+        with self._lock:
+            if self._compiled is not None:
+                return self._compiled
+
+            n_docs = len(self.items)
+            lengths = np.array([len(p) for p in self._postings], dtype=np.int64)
+            indptr = np.zeros(len(self._postings) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=indptr[1:])
+
+            doc_idx = np.fromiter((d for p in self._postings for d in p), dtype=np.int32, count=int(indptr[-1]))
+            tf = np.fromiter((t for p in self._term_freqs for t in p), dtype=np.float32, count=int(indptr[-1]))
+
+            # Smoothed IDF keeps terms that occur everywhere slightly positive
+            idf = (np.log((1.0 + n_docs) / (1.0 + lengths)) + 1.0).astype(np.float32)
+            weights = tf * np.repeat(idf, lengths)
+            norms = np.sqrt(np.bincount(doc_idx, weights=weights * weights, minlength=n_docs))
+            norms[norms == 0] = 1.0
+
+            self._compiled = (indptr, doc_idx, weights, idf, norms)
+            return self._compiled
+
+    def query(self, texts: Sequence[str], weights: Optional[Sequence[float]] = None,
+              top_k: int = 5, min_score: float = 0.05) -> List[Dict[str, Any]]:
+        """Return the items most similar to a weighted set of query texts"""
+        if not self.items or not texts:
+            return []
+
+        indptr, doc_idx, doc_weights, idf, norms = self._compile()
+        weights = weights or [1.0] * len(texts)
+
+        query_tf = Counter()
+        for text, weight in zip(texts, weights):
+            for term, count in Counter(self._tokens(text)).items():
+                if term in self.vocabulary:
+                    query_tf[self.vocabulary[term]] += weight * (1.0 + math.log(count))
+
+        if not query_tf:
+            return []
+
+        terms = np.fromiter(query_tf.keys(), dtype=np.int64, count=len(query_tf))
+        query_weights = np.fromiter(query_tf.values(), dtype=np.float32, count=len(query_tf)) * idf[terms]
+
+        # Gather the postings of every query term and accumulate dot products at once
+        starts, ends = indptr[terms], indptr[terms + 1]
+        spans = ends - starts
+        positions = np.repeat(ends - spans.cumsum(), spans) + np.arange(spans.sum())
+        contributions = doc_weights[positions] * np.repeat(query_weights, spans)
+        scores = np.bincount(doc_idx[positions], weights=contributions, minlength=len(self.items))
+        scores /= norms * np.linalg.norm(query_weights)
+
+        top_k = min(top_k, len(self.items))
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+        candidates = candidates[np.argsort(-scores[candidates])]
+
+        return [
+            dict(self.items[idx], similarity=round(float(scores[idx]), 4))
+            for idx in candidates
+            if scores[idx] >= min_score
+        ]
@@ -1,84 +1,61 @@
 from typing import List, Dict, Any
-from datetime import datetime, timezone, timedelta
+import time
+
+from services.reminder_scheduler import ReminderScheduler
 
 class DeadlineTracker:
     """Smart deadline tracking and reminder system"""
     
     def __init__(self):
-        self.reminders_sent = {}
+        # Fires reminders by flagging deadlines in the database; started per
+        # process by the server (see app.py and gunicorn.conf.py)
+        self.scheduler = ReminderScheduler()
         
     def add_deadline(self, user_id: int, title: str, due_date: str, 
-                    priority: str = 'medium', category: str = 'assignment') -> int:
-        """Add a new deadline for tracking"""
+                    priority: str = 'medium', category: str = 'assignment',
+                    description: str = None) -> int:
+        """Add a new deadline for tracking; raises ValueError for an unparseable due date"""
         
-        from models.database import get_db_connection
+        from models.database import create_deadline
         
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        deadline = create_deadline(user_id, title, due_date, description, priority, category)
+        # A deadline due soon may need its reminder right away
+        self.scheduler.wake()
         
-        cursor.execute('''
-            INSERT INTO deadlines (user_id, title, due_date, priority, category)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, title, due_date, priority, category))
+        return deadline['id']
+    
+    def get_user_deadlines(self, user_id: int) -> List[Dict[str, Any]]:
+        """Get all deadlines for a user"""
         
-        deadline_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
+        from models.database import get_user_deadlines
         
-        return deadline_id
+        return get_user_deadlines(user_id)
     
     def get_upcoming_deadlines(self, user_id: int, days_ahead: int = 7) -> List[Dict[str, Any]]:
         """Get upcoming deadlines for a user"""
         
-        from models.database import get_db_connection
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        # Calculate the date range
-        end_date = (datetime.now() + timedelta(days=days_ahead)).strftime('%Y-%m-%d %H:%M:%S')
-        
-        cursor.execute('''
-            SELECT id, title, due_date, priority, category, status
-            FROM deadlines 
-            WHERE user_id = ? AND due_date <= ? AND status != 'completed'
-            ORDER BY due_date ASC
-        ''', (user_id, end_date))
+        from models.database import get_deadlines_due_before
         
-        deadlines = cursor.fetchall()
-        conn.close()
-        
-        return [dict(row) for row in deadlines]
+        return get_deadlines_due_before(user_id, int(time.time()) + days_ahead * 86400)
     
     def mark_completed(self, deadline_id: int, user_id: int) -> bool:
-        """Mark a deadline as completed"""
-        
-        from models.database import get_db_connection
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
+        """Mark a deadline as completed; its reminder, if not yet sent, no longer fires"""
         
-        cursor.execute('''
-            UPDATE deadlines 
-            SET status = 'completed', updated_at = CURRENT_TIMESTAMP
-            WHERE id = ? AND user_id = ?
-        ''', (deadline_id, user_id))
+        from models.database import complete_deadline
         
-        success = cursor.rowcount > 0
-        conn.commit()
-        conn.close()
-        
-        return success
+        return complete_deadline(deadline_id, user_id)
     
     def get_deadline_reminders(self, user_id: int) -> List[Dict[str, Any]]:
-        """Get deadlines that need reminders"""
+        """Get deadlines whose reminders have fired and that are still ahead"""
+        
+        from models.database import get_sent_reminders
         
-        upcoming_deadlines = self.get_upcoming_deadlines(user_id, days_ahead=3)
+        now = int(time.time())
+        deadlines = get_sent_reminders(user_id, now)
         
         reminders = []
-        for deadline in upcoming_deadlines:
-            due_date = datetime.strptime(deadline['due_date'], '%Y-%m-%d %H:%M:%S')
-            days_remaining = (due_date - datetime.now()).days
+        for deadline in deadlines:
+            days_remaining = (deadline['due_ts'] - now) // 86400
             
             if days_remaining <= 1 and deadline['priority'] == 'high':
                 urgency = 'urgent'
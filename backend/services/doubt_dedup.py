@@ -0,0 +1,155 @@
+from typing import List, Dict, Tuple, Optional
+from array import array
+import threading
+import zlib
+import numpy as np
+
+from algorithms.nlp_algorithms import TextPreprocessor
+
+
+class MinHashLSH:
+    """Near-duplicate grouping of doubts with MinHash signatures and banded LSH
+
+    Each text is shingled into word bigrams (``TextPreprocessor.get_n_grams``)
+    and summarized by ``num_perm`` multiply-shift MinHash values. Only the low
+    16 bits of each value are kept (b-bit MinHash), so signatures live in one
+    growable uint16 matrix at 2 bytes per permutation. The full values are cut
+    into ``bands`` bands; a text sharing any band bucket with an earlier one
+    whose estimated Jaccard similarity clears ``threshold`` joins its cluster
+    (union-find over array positions). Lookups touch ``bands`` dict entries plus
+    one signature comparison per candidate, independent of the number of doubts.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 8, threshold: float = 0.7,
+                 seed: int = 42, capacity: int = 4096):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows_per_band = num_perm // bands
+        self.threshold = threshold
+        self.preprocessor = TextPreprocessor()
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 2 ** 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._b = rng.integers(0, 2 ** 63, size=num_perm, dtype=np.uint64)
+
+        self._signatures = np.zeros((capacity, num_perm), dtype=np.uint16)
+        self._buckets: List[Dict[int, int]] = [{} for _ in range(bands)]
+        self._doc_ids = array('q')
+        self._parent = array('I')
+        self._sizes = array('I')
+        self._answers: Dict[int, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def _shingles(self, text: str) -> np.ndarray:
+        tokens = self.preprocessor.remove_stop_words(self.preprocessor.tokenize(text or ''))
+        grams = self.preprocessor.get_n_grams(tokens, 2) or [(token,) for token in tokens]
+        hashes = {zlib.crc32(' '.join(gram).encode('utf-8')) for gram in grams}
+        return np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        """Full 32-bit MinHash signature, or None for texts without content words"""
+        shingles = self._shingles(text)
+        if not len(shingles):
+            return None
+        # Multiply-shift hashing: the top 32 bits of a*x + b (mod 2**64)
+        hashed = (self._a[:, None] * shingles[None, :] + self._b[:, None]) >> np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def _band_keys(self, signature: np.ndarray) -> List[int]:
+        bands = signature.reshape(self.bands, self.rows_per_band)
+        return [hash(band.tobytes()) for band in bands]
+
+    def _find(self, position: int) -> int:
+        parent = self._parent
+        while parent[position] != position:
+            parent[position] = parent[parent[position]]
+            position = parent[position]
+        return position
+
+    def _union(self, first: int, second: int) -> int:
+        first, second = self._find(first), self._find(second)
+        if first == second:
+            return first
+        if self._sizes[first] < self._sizes[second]:
+            first, second = second, first
+        self._parent[second] = first
+        self._sizes[first] += self._sizes[second]
+        if second in self._answers:
+            self._answers.setdefault(first, self._answers.pop(second))
+        return first
+
+    def _similarity(self, first: int, short_signature: np.ndarray) -> float:
+        return float(np.mean(self._signatures[first] == short_signature))
+
+    def add(self, doc_id: int, text: str) -> Tuple[Optional[int], Optional[int]]:
+        """Add a doubt; return (position, id of an already resolved near-duplicate)
+
+        Position is None when the text has no content words to compare.
+        """
+        signature = self.signature(text)
+        if signature is None:
+            return None, None
+
+        short_signature = signature.astype(np.uint16)
+        keys = self._band_keys(signature)
+
+        with self._lock:
+            position = len(self._doc_ids)
+            if position >= len(self._signatures):
+                self._signatures = np.concatenate([self._signatures, np.zeros_like(self._signatures)])
+            self._signatures[position] = short_signature
+            self._doc_ids.append(doc_id)
+            self._parent.append(position)
+            self._sizes.append(1)
+
+            checked = set()
+            for band, key in zip(self._buckets, keys):
+                candidate = band.setdefault(key, position)
+                if candidate == position or candidate in checked:
+                    continue
+                checked.add(candidate)
+                if self._similarity(candidate, short_signature) >= self.threshold:
+                    self._union(candidate, position)
+
+            root = self._find(position)
+            answer = self._answers.get(root)
+
+        return position, answer
+
+    def mark_resolved(self, position: Optional[int], doc_id: Optional[int] = None):
+        """Record that the cluster containing ``position`` now has an answer"""
+        if position is None:
+            return
+        with self._lock:
+            self._answers.setdefault(self._find(position), doc_id if doc_id is not None else self._doc_ids[position])
+
+    def cluster_id(self, position: Optional[int]) -> Optional[int]:
+        """Doubt id representing the cluster of ``position``"""
+        if position is None:
+            return None
+        with self._lock:
+            return self._doc_ids[self._find(position)]
+
+    def clusters(self, min_size: int = 2, limit: int = 20) -> List[Dict[str, int]]:
+        """Largest clusters of near-duplicate doubts"""
+        with self._lock:
+            sizes = np.frombuffer(self._sizes, dtype=np.uint32).copy()
+            parents = np.frombuffer(self._parent, dtype=np.uint32).copy()
+
+        roots = np.nonzero((parents == np.arange(len(parents))) & (sizes >= min_size))[0]
+        roots = roots[np.argsort(-sizes[roots], kind='stable')][:limit]
+
+        return [
+            {
+                'doubt_id': self._doc_ids[int(root)],
+                'size': int(sizes[root]),
+                'resolved_by': self._answers.get(int(root))
+            }
+            for root in roots
+        ]
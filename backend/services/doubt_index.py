@@ -0,0 +1,190 @@
+from typing import List, Dict, Tuple
+from array import array
+from collections import Counter
+import math
+import threading
+import numpy as np
+
+from algorithms.nlp_algorithms import TextPreprocessor
+
+
+class BM25Index:
+    """Incremental in-memory inverted index with BM25 scoring
+
+    Postings are kept per term in typed ``array`` buffers (internal document
+    position and term frequency), so a million short doubts take a few bytes
+    per posting. Adding a document only appends to the postings of its own
+    terms. Queries score candidates with NumPy views over those buffers, visiting
+    the rarest terms first and skipping very common terms once rarer ones have
+    produced candidates; when every query term is common, only the newest
+    ``max_postings_per_term`` documents containing the rarest one are scored.
+
+    Each document's score against itself is computed when it is added. IDFs
+    and the average length drift as the index grows, so these are recomputed
+    together (vectorized over the per-document terms, which are kept in the
+    same layout as the postings) whenever the index has grown by a quarter.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75, max_postings_per_term: int = 50000):
+        self.k1 = k1
+        self.b = b
+        self.max_postings_per_term = max_postings_per_term
+        self.preprocessor = TextPreprocessor()
+        self.vocabulary: Dict[str, int] = {}
+        self._postings: List[array] = []
+        self._term_freqs: List[array] = []
+        self._doc_ids = array('q')
+        self._doc_lengths = array('I')
+        self._doc_offsets = array('Q', [0])
+        self._doc_terms = array('I')
+        self._doc_tfs = array('H')
+        self._self_scores = array('f')
+        self._scored_docs = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_ids)
+
+    def tokens(self, text: str) -> List[str]:
+        return self.preprocessor.remove_stop_words(self.preprocessor.tokenize(text or ''))
+
+    def add(self, doc_id: int, text: str):
+        """Index a document under an external id"""
+        counts = Counter(self.tokens(text))
+
+        with self._lock:
+            position = len(self._doc_ids)
+            self._doc_ids.append(doc_id)
+            self._doc_lengths.append(sum(counts.values()))
+            self._total_length += self._doc_lengths[-1]
+
+            for term, count in counts.items():
+                term_idx = self.vocabulary.get(term)
+                if term_idx is None:
+                    term_idx = self.vocabulary[term] = len(self._postings)
+                    self._postings.append(array('I'))
+                    self._term_freqs.append(array('H'))
+                self._postings[term_idx].append(position)
+                self._term_freqs[term_idx].append(min(count, 65535))
+                self._doc_terms.append(term_idx)
+                self._doc_tfs.append(min(count, 65535))
+            self._doc_offsets.append(len(self._doc_terms))
+
+            n_docs = position + 1
+            if n_docs >= 1.25 * self._scored_docs:
+                self._refresh_self_scores()
+            else:
+                self._self_scores.append(self._self_score(position, n_docs, self._total_length / n_docs or 1.0))
+
+    def _idf(self, doc_freq: int, n_docs: int) -> float:
+        return math.log(1.0 + (n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+
+    def _self_score(self, position: int, n_docs: int, avg_length: float) -> float:
+        """BM25 score of an indexed document against its own terms"""
+        start, end = self._doc_offsets[position], self._doc_offsets[position + 1]
+        length_norm = 1.0 - self.b + self.b * self._doc_lengths[position] / avg_length
+        score = 0.0
+        for term_idx, tf in zip(self._doc_terms[start:end], self._doc_tfs[start:end]):
+            idf = self._idf(len(self._postings[term_idx]), n_docs)
+            score += idf * tf * (self.k1 + 1.0) / (tf + self.k1 * length_norm)
+        return score
+
+    def _refresh_self_scores(self):
+        """Recompute every document's self-score with the current IDFs and average length"""
+        n_docs = len(self._doc_ids)
+        doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+        terms = np.frombuffer(self._doc_terms, dtype=np.uint32)
+        tf = np.frombuffer(self._doc_tfs, dtype=np.uint16).astype(np.float64)
+        doc_freqs = np.array([len(postings) for postings in self._postings], dtype=np.float64)
+        idf = np.log1p((n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+        terms_per_doc = np.diff(np.frombuffer(self._doc_offsets, dtype=np.uint64)).astype(np.int64)
+        owners = np.repeat(np.arange(n_docs), terms_per_doc)
+        length_norm = 1.0 - self.b + self.b * doc_lengths / (self._total_length / n_docs or 1.0)
+        contributions = idf[terms] * tf * (self.k1 + 1.0) / (tf + self.k1 * length_norm[owners])
+        scores = np.bincount(owners, weights=contributions, minlength=n_docs).astype(np.float32)
+        # Release buffer views before the arrays are appended to again
+        del doc_lengths, terms
+
+        self._self_scores = array('f', scores.tobytes())
+        self._scored_docs = n_docs
+
+    def search(self, text: str, top_k: int = 3, candidates: int = 20) -> List[Tuple[int, float, float]]:
+        """Return (doc_id, bm25_score, similarity) for the most similar documents
+
+        ``similarity`` divides the score by the larger of the query's and the
+        document's score against themselves (for the query: its total IDF, as
+        for a document of average length containing each term once), so it is
+        symmetric and at most 1: a long document containing every query term
+        scores well below a document that says the same as the query. Query
+        terms the index has never seen count against it with the maximum IDF.
+        The ``candidates`` best by BM25 score are ranked by similarity.
+        """
+        query_terms = set(self.tokens(text))
+        if not query_terms:
+            return []
+
+        with self._lock:
+            n_docs = len(self._doc_ids)
+            if not n_docs:
+                return []
+
+            avg_length = self._total_length / n_docs
+            max_idf = self._idf(0, n_docs)
+            query_norm = 0.0
+            terms = []
+            for term in query_terms:
+                term_idx = self.vocabulary.get(term)
+                if term_idx is None:
+                    query_norm += max_idf
+                    continue
+                idf = self._idf(len(self._postings[term_idx]), n_docs)
+                query_norm += idf
+                terms.append((idf, term_idx))
+
+            terms.sort(reverse=True)
+            doc_lengths = np.frombuffer(self._doc_lengths, dtype=np.uint32)
+            positions, contributions = [], []
+            window = None
+            for idf, term_idx in terms:
+                postings = self._postings[term_idx]
+                docs = np.frombuffer(postings, dtype=np.uint32)
+                start = 0
+                if len(postings) > self.max_postings_per_term:
+                    if not positions:
+                        # Only common terms: the newest documents containing the rarest one
+                        start = len(postings) - self.max_postings_per_term
+                        window = postings[start]
+                    elif window is not None:
+                        # ...scored with the other common terms over the same documents
+                        start = int(np.searchsorted(docs, window))
+                    if len(postings) - start > self.max_postings_per_term:
+                        del docs
+                        continue
+                docs = docs[start:]
+                tf = np.frombuffer(self._term_freqs[term_idx], dtype=np.uint16)[start:].astype(np.float32)
+                length_norm = 1.0 - self.b + self.b * doc_lengths[docs] / avg_length
+                positions.append(docs.copy())
+                contributions.append(idf * tf * (self.k1 + 1.0) / (tf + self.k1 * length_norm))
+                del docs
+
+            # Release buffer views before other threads may append again
+            del doc_lengths
+            if not positions:
+                return []
+
+            matched, inverse = np.unique(np.concatenate(positions), return_inverse=True)
+            scores = np.bincount(inverse, weights=np.concatenate(contributions))
+            n_best = min(max(top_k, candidates), len(scores))
+            best = np.argpartition(-scores, n_best - 1)[:n_best]
+            results = []
+            for i in best:
+                position = int(matched[i])
+                score = float(scores[i])
+                norm = max(query_norm, self._self_scores[position])
+                # min() only absorbs float32 rounding of the contributions
+                results.append((self._doc_ids[position], score, min(score / norm, 1.0)))
+
+        results.sort(key=lambda result: result[2], reverse=True)
+        return results[:top_k]
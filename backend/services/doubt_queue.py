@@ -0,0 +1,152 @@
+from typing import Dict, Any, Optional
+import os
+import threading
+import time
+
+from models.database import claim_pending_doubts, requeue_stale_doubts, count_pending_doubts, get_doubt
+
+PRIORITIES = ('high', 'medium', 'low')
+
+
+class DoubtQueue:
+    """Durable doubt queue backed by the ``doubts`` table
+
+    ``enqueue`` only inserts a pending row, so requests return immediately with
+    the doubt id. Worker threads claim pending doubts in priority order in small
+    batches and hand each batch to ``DoubtResolver.resolve_batch``, which answers
+    identical questions once. Rows left in 'processing' by a crashed worker are
+    requeued after ``stale_after`` seconds, by the first worker to start and then
+    whenever a worker is idle. Workers are started at server boot (``start``) or
+    on first use, and again in a forked child process, so the queue is safe to
+    create before forking and doubts left by a previous run are picked up
+    without waiting for a new one.
+    """
+
+    def __init__(self, resolver, workers: Optional[int] = None, batch_size: int = 8,
+                 poll_interval: float = 1.0, stale_after: int = 300):
+        self.resolver = resolver
+        self.workers = workers or int(os.getenv('DOUBT_QUEUE_WORKERS', 4))
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.stale_after = stale_after
+        self._work_available = threading.Condition()
+        self._resolved = threading.Condition()
+        self._threads = []
+        self._last_requeue = 0.0
+        self._pid = None
+        self._stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def _ensure_workers(self):
+        if self._pid == os.getpid():
+            return
+
+        with self._work_available:
+            if self._pid == os.getpid():
+                return
+            self._requeue_stale()
+            self._stopping = False
+            self._threads = [
+                threading.Thread(target=self._work, name=f'doubt-worker-{i}', daemon=True)
+                for i in range(self.workers)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def start(self):
+        """Start the worker threads in this process (again, after a fork)"""
+        self._ensure_workers()
+
+    def enqueue(self, user_id: int, doubt: str, context: str = '', priority: str = 'medium') -> int:
+        """Record a doubt for background resolution and return its id"""
+        from models.database import create_doubt
+
+        self._ensure_workers()
+        doubt_id = create_doubt(user_id, doubt, context, priority=priority if priority in PRIORITIES else 'medium')
+
+        with self._work_available:
+            self._work_available.notify()
+
+        return doubt_id
+
+    def get_status(self, doubt_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Current state of a user's doubt, or None if it is not theirs"""
+        doubt = get_doubt(doubt_id)
+        if not doubt or str(doubt['user_id']) != str(user_id):
+            return None
+
+        return {
+            'doubt_id': doubt['id'],
+            'doubt': doubt['doubt_text'],
+            'status': doubt['status'],
+            'priority': doubt['priority'],
+            'resolution': doubt['resolution'],
+            'created_at': doubt['created_at'],
+            'resolved_at': doubt['resolved_at']
+        }
+
+    def wait_for_resolution(self, doubt_id: int, user_id: int, timeout: float = 25.0) -> Optional[Dict[str, Any]]:
+        """Long-poll: block until the doubt is resolved or ``timeout`` passes"""
+        self._ensure_workers()
+        deadline = time.monotonic() + timeout
+
+        while True:
+            status = self.get_status(doubt_id, user_id)
+            remaining = deadline - time.monotonic()
+            if status is None or status['status'] == 'resolved' or remaining <= 0:
+                return status
+
+            # Woken early when any doubt in this process resolves; the poll
+            # interval covers doubts resolved by other worker processes
+            with self._resolved:
+                self._resolved.wait(min(remaining, self.poll_interval))
+
+    def _requeue_stale(self):
+        self._last_requeue = time.monotonic()
+        try:
+            requeue_stale_doubts(self.stale_after)
+        except Exception as e:
+            print(f"Error requeueing stale doubts: {e}")
+
+    def _work(self):
+        while not self._stopping:
+            try:
+                doubts = claim_pending_doubts(self.batch_size)
+            except Exception as e:
+                print(f"Error claiming doubts: {e}")
+                doubts = []
+
+            if not doubts:
+                if time.monotonic() - self._last_requeue > self.stale_after:
+                    self._requeue_stale()
+                with self._work_available:
+                    self._work_available.wait(self.poll_interval)
+                continue
+
+            try:
+                self.resolver.resolve_batch(doubts)
+                with self._resolved:
+                    self.processed += len(doubts)
+                    self._resolved.notify_all()
+            except Exception as e:
+                with self._resolved:
+                    self.failed += len(doubts)
+                print(f"Error resolving doubts: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'workers': len([thread for thread in self._threads if thread.is_alive()]),
+            'pending': count_pending_doubts(),
+            'processed': self.processed,
+            'failed': self.failed
+        }
+
+    def shutdown(self, timeout: float = 10.0):
+        """Stop workers after their current batch"""
+        self._stopping = True
+        with self._work_available:
+            self._work_available.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
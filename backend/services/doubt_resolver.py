@@ -1,21 +1,233 @@
-from typing import Dict, Any
+from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone
+import threading
+import time
+
+from models.database import (create_doubt, save_doubt_resolution, get_doubt, iter_resolved_doubts,
+                             get_max_doubt_id, get_doubt_clusters)
+from services.metrics import observe_llm_call
+
+def _context_key(context: Optional[str]) -> str:
+    return ' '.join((context or '').lower().split())
 
 class DoubtResolver:
-    """AI-powered doubt resolution system"""
-    
-    def __init__(self):
-        self.resolution_history = {}
-        
+    """AI-powered doubt resolution system
+
+    Every doubt and its resolution is stored in the ``doubts`` table. Incoming
+    doubts are first grouped with near-duplicates by MinHash LSH and get their
+    cluster's answer if it has one; otherwise a BM25 index of resolved doubts is
+    searched for a close match, and only then is the LLM (or keyword rules
+    without one) asked. A past answer is only reused for a doubt asked in the
+    same context (compared case- and whitespace-insensitively), and only if the
+    LLM wrote it: keyword-rule answers are canned text, so they are never
+    indexed or handed out as a match.
+    """
+
+    def __init__(self, model=None, reuse_threshold: float = 0.8):
+        self.model = model
+        self.reuse_threshold = reuse_threshold
+        self._index = None
+        self._dedup = None
+        self._index_loader = None
+        self._index_lock = threading.Lock()
+
+    def _create_indexes(self):
+        # Both import NumPy, so they are only built once doubts are handled
+        with self._index_lock:
+            if self._dedup is None:
+                from services.doubt_index import BM25Index
+                from services.doubt_dedup import MinHashLSH
+
+                self._index = BM25Index()
+                self._dedup = MinHashLSH()
+
+    @property
+    def index(self):
+        """BM25 index of resolved doubts"""
+        if self._dedup is None:
+            self._create_indexes()
+        return self._index
+
+    @property
+    def dedup(self):
+        """MinHash LSH clustering of all doubts"""
+        if self._dedup is None:
+            self._create_indexes()
+        return self._dedup
+
+    def _ensure_index_loading(self):
+        """Start indexing past resolutions in the background on first use"""
+        if self._index_loader is not None:
+            return
+
+        with self._index_lock:
+            if self._index_loader is None:
+                # Doubts newer than this are indexed live as they get resolved
+                max_id = get_max_doubt_id()
+                self._index_loader = threading.Thread(
+                    target=self._load_index, args=(max_id,), name='doubt-index-loader', daemon=True
+                )
+                self._index_loader.start()
+
+    def _load_index(self, max_id: int):
+        try:
+            for doubt_id, doubt_text in iter_resolved_doubts(max_id=max_id, source='llm'):
+                self.index.add(doubt_id, doubt_text)
+                position, _ = self.dedup.add(doubt_id, doubt_text)
+                self.dedup.mark_resolved(position)
+        except Exception as e:
+            print(f"Error loading doubt index: {e}")
+
+    def _reusable_answer(self, doubt_id: int, context: str = "") -> Optional[Dict[str, Any]]:
+        """LLM resolution of a past doubt, the doubt it was generated for and its confidence, if asked in the same context"""
+        past = get_doubt(doubt_id)
+        if (not past or not past['resolution'] or past['resolution_source'] != 'llm'
+                or _context_key(past['context']) != _context_key(context)):
+            return None
+        return {'doubt_id': past['answered_by'] or past['id'], 'resolution': past['resolution'],
+                'confidence': past['confidence']}
+
+    def find_similar_resolution(self, doubt: str, duplicate_of: Optional[int] = None,
+                                context: str = "") -> Optional[Dict[str, Any]]:
+        """Return a past resolution for a near-identical doubt in the same context, if any
+
+        ``duplicate_of`` is the resolved doubt the LSH clustering already
+        matched, which is used without searching the index. The returned
+        ``doubt_id`` is the doubt the answer was originally generated for.
+        """
+        self._ensure_index_loading()
+
+        if duplicate_of is not None:
+            match = self._reusable_answer(duplicate_of, context)
+            if match:
+                return dict(match, similarity=1.0, source='duplicate_doubt')
+
+        for doubt_id, score, similarity in self.index.search(doubt, top_k=3):
+            if similarity < self.reuse_threshold:
+                break
+            match = self._reusable_answer(doubt_id, context)
+            if match:
+                return dict(match, similarity=similarity, source='similar_doubt')
+
+        return None
+
     def resolve_doubt(self, doubt: str, context: str = "", user_id: int = None) -> Dict[str, Any]:
         """Resolve student doubts with AI assistance"""
-        
+
+        doubt_id = create_doubt(user_id, doubt, context) if user_id is not None else None
+        position, duplicate_of = self.dedup.add(doubt_id, doubt) if doubt_id is not None else (None, None)
+
+        match = self.find_similar_resolution(doubt, duplicate_of, context)
+        if match:
+            resolution = match['resolution']
+            source = match['source']
+            confidence = match['confidence']
+            generated_by = 'llm'
+        else:
+            resolution, source, confidence = self._generate_resolution(doubt, context)
+            generated_by = source
+
+        if doubt_id is not None:
+            answered_by = match['doubt_id'] if match else doubt_id
+            save_doubt_resolution(doubt_id, resolution, answered_by, generated_by, confidence)
+            if generated_by == 'llm':
+                self.dedup.mark_resolved(position, answered_by)
+                if not match:
+                    self.index.add(doubt_id, doubt)
+
+        return {
+            'doubt_id': doubt_id,
+            'doubt': doubt,
+            'resolution': resolution,
+            'context': context,
+            'confidence': confidence,
+            'source': source,
+            'matched_doubt_id': match['doubt_id'] if match else None,
+            'suggested_resources': [
+                'Documentation and tutorials',
+                'Practice exercises',
+                'Community forums'
+            ],
+            'resolved_at': datetime.now(timezone.utc).isoformat()
+        }
+
+    def resolve_batch(self, doubts: List[Dict[str, Any]]) -> Dict[int, str]:
+        """Resolve already-recorded doubts, generating one answer per near-duplicate cluster and context
+
+        Returns the resolution stored for each doubt id.
+        """
+        groups = {}
+        for doubt in doubts:
+            position, duplicate_of = self.dedup.add(doubt['id'], doubt['doubt_text'])
+            key = self.dedup.cluster_id(position) if position is not None else ('doubt', doubt['id'])
+            key = (key, _context_key(doubt.get('context')))
+            group = groups.setdefault(key, {'doubts': [], 'positions': [], 'duplicate_of': None})
+            group['doubts'].append(doubt)
+            group['positions'].append(position)
+            group['duplicate_of'] = group['duplicate_of'] or duplicate_of
+
+        resolutions = {}
+        for group in groups.values():
+            first = group['doubts'][0]
+            match = self.find_similar_resolution(first['doubt_text'], group['duplicate_of'],
+                                                 first.get('context') or '')
+            if match:
+                resolution, answered_by = match['resolution'], match['doubt_id']
+                source, confidence = 'llm', match['confidence']
+            else:
+                resolution, source, confidence = self._generate_resolution(first['doubt_text'],
+                                                                           first.get('context') or '')
+                answered_by = first['id']
+                if source == 'llm':
+                    self.index.add(first['id'], first['doubt_text'])
+
+            for doubt, position in zip(group['doubts'], group['positions']):
+                save_doubt_resolution(doubt['id'], resolution, answered_by, source, confidence)
+                if source == 'llm':
+                    self.dedup.mark_resolved(position, answered_by)
+                resolutions[doubt['id']] = resolution
+
+        return resolutions
+
+    def get_duplicate_clusters(self, min_size: int = 2, limit: int = 20) -> List[Dict[str, Any]]:
+        """Largest groups of near-duplicate doubts, for instructors
+
+        Read from the database (doubts answered from the same doubt), so every
+        worker process reports the same clusters.
+        """
+        return get_doubt_clusters(min_size, limit)
+
+    def _generate_resolution(self, doubt: str, context: str = ""):
+        """Return (resolution, source, confidence) from the LLM, or keyword rules"""
+
+        if self.model:
+            started = time.perf_counter()
+            try:
+                prompt = f"""You are a helpful academic tutor. A student has the following doubt.
+
+Doubt: {doubt}
+Context: {context if context else "No additional context"}
+
+Explain the answer clearly and concisely, with an example where it helps.
+
+Resolution:"""
+                response = self.model.generate_content(prompt)
+                resolution = response.text
+                observe_llm_call('doubt', time.perf_counter() - started, response=response)
+                return resolution, 'llm', 0.9
+            except Exception as e:
+                observe_llm_call('doubt', time.perf_counter() - started, 'error')
+                print(f"Gemini API error: {e}")
+
+        return self._keyword_resolution(doubt, context), 'rules', 0.7
+
+    def _keyword_resolution(self, doubt: str, context: str = "") -> str:
         # Basic doubt resolution (to be enhanced with advanced NLP)
         resolution = f"Thank you for your question: '{doubt}'. "
-        
+
         # Simple keyword-based resolution
         doubt_lower = doubt.lower()
-        
+
         if 'error' in doubt_lower or 'bug' in doubt_lower:
             resolution += "For debugging issues, try checking console logs, reviewing your code syntax, and using debugging tools."
         elif 'algorithm' in doubt_lower:
@@ -26,19 +238,8 @@ class DoubtResolver:
             resolution += "Database queries require understanding of relationships between tables. Start with simple SELECT statements."
         else:
             resolution += "I recommend breaking down your question into smaller parts and checking our learning resources for more detailed explanations."
-        
+
         if context:
             resolution += f" Given the context: '{context[:100]}...', you might also want to review related concepts."
-        
-        return {
-            'doubt': doubt,
-            'resolution': resolution,
-            'context': context,
-            'confidence': 0.7,
-            'suggested_resources': [
-                'Documentation and tutorials',
-                'Practice exercises',
-                'Community forums'
-            ],
-            'resolved_at': datetime.now(timezone.utc).isoformat()
-        }
+
+        return resolution
@@ -0,0 +1,416 @@
+from typing import Any, Callable, Dict, Optional, Tuple
+import bisect
+import glob
+import json
+import math
+import os
+import threading
+import time
+
+from models.database import register_query_observer
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # metrics kept by _Metric below
+    prometheus_client = None
+
+# Set for multi-worker servers (gunicorn.conf.py does); every worker writes its
+# metrics under it and /metrics reports the sum of all of them
+MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+# Without prometheus_client, how often each worker writes its metrics for the others
+FLUSH_INTERVAL = float(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+# How often a worker turns its cache, queue and rate limit statistics into metrics
+SAMPLE_INTERVAL = float(os.getenv('METRICS_SAMPLE_INTERVAL', 15))
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+LLM_BUCKETS = (0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 15.0, 30.0, 60.0)
+
+
+_lock = threading.Lock()
+_metrics = []
+_pid = os.getpid()
+
+
+class _Metric:
+    """Labelled counter, gauge or histogram for when prometheus_client is not installed
+
+    Values live in this process. With PROMETHEUS_MULTIPROC_DIR set, each worker
+    writes them to a JSON file every METRICS_FLUSH_INTERVAL seconds (see
+    start_flusher) and render() adds up the files of all workers, much like
+    prometheus_client's multiprocess mode, which updates its files on every
+    observation instead.
+    """
+
+    def __init__(self, kind: str, name: str, documentation: str, labelnames=(),
+                 buckets=(), multiprocess_mode: str = 'livesum'):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.multiprocess_mode = multiprocess_mode
+        # label values -> value; histograms keep [count per bucket..., count above, sum]
+        self.values: Dict[Tuple[str, ...], Any] = {}
+        _metrics.append(self)
+
+    def labels(self, *values) -> '_Child':
+        return _Child(self, tuple(str(value) for value in values))
+
+    def inc(self, amount: float = 1.0):
+        self.labels().inc(amount)
+
+    def set(self, value: float):
+        self.labels().set(value)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+
+class _Child:
+    __slots__ = ('metric', 'key')
+
+    def __init__(self, metric: _Metric, key: Tuple[str, ...]):
+        self.metric = metric
+        self.key = key
+
+    def inc(self, amount: float = 1.0):
+        with _lock:
+            values = _local_values(self.metric)
+            values[self.key] = values.get(self.key, 0.0) + amount
+
+    def set(self, value: float):
+        with _lock:
+            _local_values(self.metric)[self.key] = float(value)
+
+    def observe(self, value: float):
+        with _lock:
+            values = _local_values(self.metric)
+            counts = values.get(self.key)
+            if counts is None:
+                counts = values[self.key] = [0] * (len(self.metric.buckets) + 1) + [0.0]
+            counts[bisect.bisect_left(self.metric.buckets, value)] += 1
+            counts[-1] += value
+
+
+def _local_values(metric: _Metric) -> Dict[Tuple[str, ...], Any]:
+    """This process's values of a metric; a forked worker starts from zero (call with _lock held)"""
+    global _pid
+
+    if _pid != os.getpid():
+        for each in _metrics:
+            each.values = {}
+        _pid = os.getpid()
+    return metric.values
+
+
+def _counter(name: str, documentation: str, labelnames=()):
+    if prometheus_client is not None:
+        return prometheus_client.Counter(name, documentation, labelnames)
+    return _Metric('counter', name, documentation, labelnames)
+
+
+def _gauge(name: str, documentation: str, labelnames=(), multiprocess_mode: str = 'livesum'):
+    if prometheus_client is not None:
+        return prometheus_client.Gauge(name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+    return _Metric('gauge', name, documentation, labelnames, multiprocess_mode=multiprocess_mode)
+
+
+def _histogram(name: str, documentation: str, labelnames=(), buckets=()):
+    if prometheus_client is not None:
+        return prometheus_client.Histogram(name, documentation, labelnames, buckets=buckets)
+    return _Metric('histogram', name, documentation, labelnames, buckets=buckets)
+
+
+HTTP_REQUESTS = _counter('http_requests_total', 'HTTP requests by route and status',
+                         ('endpoint', 'method', 'status'))
+HTTP_LATENCY = _histogram('http_request_duration_seconds', 'Time to build the response, by route',
+                          ('endpoint', 'method'), REQUEST_BUCKETS)
+
+DB_LATENCY = _histogram('db_query_duration_seconds', 'Duration of models.database query functions',
+                        ('function',), QUERY_BUCKETS)
+DB_ERRORS = _counter('db_query_errors_total', 'models.database query functions that raised', ('function',))
+
+LLM_LATENCY = _histogram('llm_request_duration_seconds', 'Duration of Gemini calls', ('operation',), LLM_BUCKETS)
+LLM_REQUESTS = _counter('llm_requests_total', 'Gemini calls by outcome (ok, error, timeout)',
+                        ('operation', 'outcome'))
+LLM_TOKENS = _counter('llm_tokens_total', 'Tokens reported by Gemini (prompt, completion)', ('operation', 'kind'))
+
+CACHE_REQUESTS = _counter('cache_requests_total', 'Cache lookups by result (hit, miss)', ('cache', 'result'))
+CACHE_REMOVALS = _counter('cache_removals_total', 'Cache entries dropped by reason (eviction, invalidation)',
+                          ('cache', 'reason'))
+CACHE_ENTRIES = _gauge('cache_entries', 'Entries held by each cache', ('cache',))
+
+# The pending doubts are counted in the shared database, so workers report the same number
+DOUBTS_PENDING = _gauge('doubt_queue_pending', 'Doubts waiting to be resolved', multiprocess_mode='livemax')
+DOUBT_WORKERS = _gauge('doubt_queue_workers', 'Live doubt queue worker threads')
+DOUBTS_PROCESSED = _counter('doubt_queue_processed_total', 'Doubts taken off the queue by outcome (ok, failed)',
+                            ('outcome',))
+
+VOICE_JOBS = _gauge('voice_jobs', 'Voice jobs in progress by stage (pending, transcribing, answering)', ('stage',))
+VOICE_JOB_EVENTS = _counter('voice_job_events_total', 'Voice jobs submitted, completed, failed and rejected',
+                            ('event',))
+
+RATE_LIMIT_CHECKS = _counter('rate_limit_checks_total', 'Rate limit decisions by limit and result (allowed, limited)',
+                             ('limit', 'result'))
+
+
+def observe_request(endpoint: Optional[str], method: str, status: int, seconds: float):
+    endpoint = endpoint or 'unmatched'
+    HTTP_REQUESTS.labels(endpoint, method, str(status)).inc()
+    HTTP_LATENCY.labels(endpoint, method).observe(seconds)
+
+
+def observe_query(function: str, seconds: float, error: Optional[Exception] = None):
+    DB_LATENCY.labels(function).observe(seconds)
+    if error is not None:
+        DB_ERRORS.labels(function).inc()
+
+
+def observe_llm_call(operation: str, seconds: float, outcome: str = 'ok', response=None):
+    """Record a Gemini call; token counts come from the response's usage metadata"""
+    LLM_LATENCY.labels(operation).observe(seconds)
+    LLM_REQUESTS.labels(operation, outcome).inc()
+
+    usage = getattr(response, 'usage_metadata', None)
+    if usage is not None:
+        LLM_TOKENS.labels(operation, 'prompt').inc(getattr(usage, 'prompt_token_count', 0) or 0)
+        LLM_TOKENS.labels(operation, 'completion').inc(getattr(usage, 'candidates_token_count', 0) or 0)
+
+
+register_query_observer(observe_query)
+
+
+_sampled: Dict[Tuple[int, Tuple[str, ...]], float] = {}
+_stats_source: Optional[Callable[[], Dict[str, Any]]] = None
+_last_sample = 0.0
+_sample_lock = threading.Lock()
+
+
+def _advance(counter, labels: Tuple[str, ...], total: float):
+    """Add the growth of a cumulative statistic since it was last sampled"""
+    key = (id(counter), labels)
+    last = _sampled.get(key, 0)
+    if total > last:
+        counter.labels(*labels).inc(total - last)
+    _sampled[key] = total
+
+
+def sample_stats(stats: Dict[str, Any]):
+    """Turn the statistics of the health check (caches, queues, rate limits) into metrics"""
+    for name, cache in stats.get('caches', {}).items():
+        CACHE_ENTRIES.labels(name).set(cache['size'])
+        _advance(CACHE_REQUESTS, (name, 'hit'), cache['hits'])
+        _advance(CACHE_REQUESTS, (name, 'miss'), cache['misses'])
+        _advance(CACHE_REMOVALS, (name, 'eviction'), cache['evictions'])
+        _advance(CACHE_REMOVALS, (name, 'invalidation'), cache['invalidations'])
+
+    queues = stats.get('queues', {})
+    doubts = queues.get('doubts')
+    if doubts:
+        DOUBTS_PENDING.set(doubts['pending'])
+        DOUBT_WORKERS.set(doubts['workers'])
+        _advance(DOUBTS_PROCESSED, ('ok',), doubts['processed'])
+        _advance(DOUBTS_PROCESSED, ('failed',), doubts['failed'])
+
+    voice = queues.get('voice')
+    if voice:
+        for stage in ('pending', 'transcribing', 'answering'):
+            VOICE_JOBS.labels(stage).set(voice[stage])
+        for event in ('submitted', 'completed', 'failed', 'rejected'):
+            _advance(VOICE_JOB_EVENTS, (event,), voice[event])
+
+    rate_limits = stats.get('rate_limits', {})
+    for result in ('allowed', 'limited'):
+        for limit, count in rate_limits.get(result, {}).items():
+            _advance(RATE_LIMIT_CHECKS, (limit, result), count)
+
+
+def sample(force: bool = False):
+    """Sample the registered statistics if SAMPLE_INTERVAL has passed"""
+    global _last_sample
+
+    if _stats_source is None or (not force and time.monotonic() - _last_sample < SAMPLE_INTERVAL):
+        return
+    # One thread samples; the others carry on with their requests
+    if not _sample_lock.acquire(blocking=force):
+        return
+    try:
+        _last_sample = time.monotonic()
+        sample_stats(_stats_source())
+    except Exception as e:
+        print(f"Error sampling metrics: {e}")
+    finally:
+        _sample_lock.release()
+
+
+def _snapshot() -> Dict[str, list]:
+    """Copy of this process's values: metric name -> [(label values, value)]"""
+    with _lock:
+        _local_values(_metrics[0])
+        return {
+            metric.name: [(key, list(value) if isinstance(value, list) else value)
+                          for key, value in metric.values.items()]
+            for metric in _metrics
+        }
+
+
+def _snapshot_path(pid: int) -> str:
+    return os.path.join(MULTIPROC_DIR, f'metrics_{pid}.json')
+
+
+def flush():
+    """Write this worker's metrics to PROMETHEUS_MULTIPROC_DIR (prometheus_client writes its own)"""
+    if prometheus_client is not None or not MULTIPROC_DIR:
+        return
+
+    path = _snapshot_path(os.getpid())
+    try:
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(f'{path}.tmp', path)
+    except OSError as e:
+        print(f"Error writing metrics: {e}")
+
+
+def start_flusher():
+    """Flush this worker's metrics every METRICS_FLUSH_INTERVAL in a daemon thread
+
+    Needed only without prometheus_client; call it in each worker after fork
+    (gunicorn.conf.py does), so idle workers still report their last requests.
+    """
+    if prometheus_client is not None or not MULTIPROC_DIR:
+        return
+
+    def run():
+        while True:
+            time.sleep(FLUSH_INTERVAL)
+            flush()
+
+    threading.Thread(target=run, name='metrics-flusher', daemon=True).start()
+
+
+def mark_process_dead(pid: int):
+    """Drop a dead worker's gauges; its counters and histograms keep counting in the totals"""
+    if prometheus_client is not None:
+        if MULTIPROC_DIR:
+            multiprocess.mark_process_dead(pid)
+        return
+    if not MULTIPROC_DIR:
+        return
+
+    gauges = {metric.name for metric in _metrics if metric.kind == 'gauge'}
+    path = _snapshot_path(pid)
+    try:
+        with open(path) as f:
+            snapshot = json.load(f)
+        with open(f'{path}.tmp', 'w') as f:
+            json.dump({name: values for name, values in snapshot.items() if name not in gauges}, f)
+        os.replace(f'{path}.tmp', path)
+    except (OSError, ValueError):
+        pass
+
+
+def _merged_values() -> Dict[str, Dict[Tuple[str, ...], Any]]:
+    """Values of every _Metric in this process, added to those other workers flushed"""
+    snapshots = [_snapshot()]
+
+    if MULTIPROC_DIR:
+        own_path = _snapshot_path(os.getpid())
+        for path in glob.glob(os.path.join(MULTIPROC_DIR, 'metrics_*.json')):
+            if path == own_path:
+                continue
+            try:
+                with open(path) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            snapshots.append({name: [(tuple(key), value) for key, value in values]
+                              for name, values in snapshot.items()})
+
+    merged = {metric.name: {} for metric in _metrics}
+    for metric in _metrics:
+        values = merged[metric.name]
+        for snapshot in snapshots:
+            for key, value in snapshot.get(metric.name, ()):
+                current = values.get(key)
+                if current is None:
+                    values[key] = value
+                elif metric.kind == 'histogram':
+                    values[key] = [a + b for a, b in zip(current, value)]
+                elif metric.multiprocess_mode == 'livemax' and metric.kind == 'gauge':
+                    values[key] = max(current, value)
+                else:
+                    values[key] = current + value
+    return merged
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value))
+
+
+def _format_labels(pairs) -> str:
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', r'\\').replace('\n', r'\n').replace('"', r'\"') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _render_fallback() -> str:
+    lines = []
+    merged = _merged_values()
+    for metric in _metrics:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for key, value in sorted(merged[metric.name].items()):
+            labels = list(zip(metric.labelnames, key))
+            if metric.kind != 'histogram':
+                lines.append(f'{metric.name}{_format_labels(labels)} {_format_value(value)}')
+                continue
+
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value):
+                cumulative += count
+                le = _format_labels(labels + [('le', _format_value(bound))])
+                lines.append(f'{metric.name}_bucket{le} {_format_value(cumulative)}')
+            lines.append(f'{metric.name}_sum{_format_labels(labels)} {_format_value(value[-1])}')
+            lines.append(f'{metric.name}_count{_format_labels(labels)} {_format_value(cumulative)}')
+    return '\n'.join(lines) + '\n'
+
+
+def render() -> Tuple[bytes, str]:
+    """Metrics of all workers in the Prometheus text format, and its content type"""
+    if prometheus_client is None:
+        return _render_fallback().encode('utf-8'), CONTENT_TYPE
+
+    if MULTIPROC_DIR:
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return prometheus_client.generate_latest(registry), prometheus_client.CONTENT_TYPE_LATEST
+
+
+def instrument_app(app, stats_source: Callable[[], Dict[str, Any]]):
+    """Time every request of a Flask app and sample ``stats_source()`` every SAMPLE_INTERVAL"""
+    from flask import g, request
+
+    global _stats_source
+    _stats_source = stats_source
+
+    @app.before_request
+    def start_request_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            observe_request(request.endpoint, request.method, response.status_code, time.perf_counter() - started)
+        sample()
+        return response
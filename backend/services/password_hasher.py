@@ -0,0 +1,176 @@
+from typing import List, Optional, Tuple, Union
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+import multiprocessing
+import os
+import threading
+import bcrypt
+
+DEFAULT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+
+# bcrypt only uses the first 72 bytes of a password
+BCRYPT_MAX_BYTES = 72
+
+BCRYPT_PREFIXES = ('$2a$', '$2b$', '$2y$')
+
+
+def _as_text(stored_hash: Union[str, bytes]) -> str:
+    # Hashes written by the old bcrypt create_user were stored as bytes
+    return stored_hash.decode('utf-8') if isinstance(stored_hash, bytes) else stored_hash
+
+
+def _password_bytes(password: str) -> bytes:
+    return password.encode('utf-8')[:BCRYPT_MAX_BYTES]
+
+
+def bcrypt_rounds(stored_hash: Union[str, bytes]) -> Optional[int]:
+    """Cost factor of a bcrypt hash, or None for other schemes"""
+    stored_hash = _as_text(stored_hash or '')
+    if not stored_hash.startswith(BCRYPT_PREFIXES):
+        return None
+    try:
+        return int(stored_hash[4:6])
+    except ValueError:
+        return None
+
+
+def hash_password(password: str, rounds: int = DEFAULT_ROUNDS) -> str:
+    return bcrypt.hashpw(_password_bytes(password), bcrypt.gensalt(rounds)).decode('utf-8')
+
+
+def hash_passwords(passwords: List[str], rounds: int = DEFAULT_ROUNDS) -> List[str]:
+    return [hash_password(password, rounds) for password in passwords]
+
+
+def check_password(password: str, stored_hash: Union[str, bytes]) -> bool:
+    """Check a password against a bcrypt hash or a legacy werkzeug hash"""
+    stored_hash = _as_text(stored_hash or '')
+    if not stored_hash:
+        return False
+
+    if bcrypt_rounds(stored_hash) is not None:
+        try:
+            return bcrypt.checkpw(_password_bytes(password), stored_hash.encode('utf-8'))
+        except ValueError:
+            return False
+
+    # Legacy pbkdf2/scrypt hashes from werkzeug's generate_password_hash
+    from werkzeug.security import check_password_hash
+    return check_password_hash(stored_hash, password)
+
+
+def check_and_upgrade(password: str, stored_hash: Union[str, bytes], rounds: int = DEFAULT_ROUNDS) -> Tuple[bool, Optional[str]]:
+    """(password matches, replacement hash if the stored one is legacy or uses another cost)"""
+    if not check_password(password, stored_hash):
+        return False, None
+    if bcrypt_rounds(stored_hash) == rounds:
+        return True, None
+    return True, hash_password(password, rounds)
+
+
+class PasswordHasher:
+    """Single password hashing scheme for the app: bcrypt with a configurable cost
+
+    Hashing and checking run in a dedicated process pool so a burst of logins
+    keeps hashing off the request threads and spreads it over ``workers`` cores.
+    At most ``max_pending`` operations are queued; callers beyond that wait up to
+    ``queue_timeout`` seconds for a slot and then get ``TimeoutError``. With
+    ``workers=0`` everything runs inline, e.g. for scripts and development.
+
+    Hashes from werkzeug's ``generate_password_hash`` (and bcrypt hashes with a
+    different cost) still verify; ``verify_and_upgrade`` returns a new hash for
+    them so callers can store it after a successful login.
+    """
+
+    def __init__(self, rounds: int = DEFAULT_ROUNDS, workers: Optional[int] = None,
+                 max_pending: Optional[int] = None, queue_timeout: float = 10.0):
+        if workers is None:
+            workers = int(os.getenv('PASSWORD_HASH_WORKERS', min(os.cpu_count() or 1, 4)))
+        self.rounds = rounds
+        self.workers = workers
+        self.max_pending = max_pending or max(workers, 1) * 8
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._pool = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._pool = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = os.getpid()
+        return self._pool
+
+    def _run(self, func, *args):
+        if not self.workers:
+            return func(*args)
+
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise TimeoutError('Password hashing is busy')
+        try:
+            return self._get_pool().submit(func, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password: str) -> str:
+        return self._run(hash_password, password, self.rounds)
+
+    def hash_many(self, passwords: List[str], rounds: Optional[int] = None, chunk_size: int = 128) -> List[str]:
+        """Hash a batch of passwords across the pool, in order
+
+        Chunks are submitted one per worker at a time, so logins arriving during
+        a large batch queue behind at most one chunk instead of the whole batch.
+        """
+        rounds = rounds or self.rounds
+        if not self.workers:
+            return hash_passwords(passwords, rounds)
+
+        pool = self._get_pool()
+        chunks = [passwords[i:i + chunk_size] for i in range(0, len(passwords), chunk_size)]
+        results: List[Optional[List[str]]] = [None] * len(chunks)
+        pending = {}
+        next_chunk = 0
+
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < self.workers:
+                pending[pool.submit(hash_passwords, chunks[next_chunk], rounds)] = next_chunk
+                next_chunk += 1
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+
+        return [hashed for chunk in results for hashed in chunk]
+
+    def verify(self, password: str, stored_hash: Union[str, bytes]) -> bool:
+        return self._run(check_password, password, stored_hash)
+
+    def verify_and_upgrade(self, password: str, stored_hash: Union[str, bytes]) -> Tuple[bool, Optional[str]]:
+        """Check a password; also return a current-cost hash when the stored one is outdated"""
+        return self._run(check_and_upgrade, password, stored_hash, self.rounds)
+
+    def needs_rehash(self, stored_hash: Union[str, bytes]) -> bool:
+        return bcrypt_rounds(stored_hash) != self.rounds
+
+    def shutdown(self, wait: bool = True):
+        if self._pool is not None and self._pid == os.getpid():
+            self._pool.shutdown(wait=wait)
+        self._pool, self._pid = None, None
+
+
+_password_hasher = None
+_init_lock = threading.Lock()
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Process-wide hasher, created on first use"""
+    global _password_hasher
+
+    if _password_hasher is None:
+        with _init_lock:
+            if _password_hasher is None:
+                _password_hasher = PasswordHasher()
+
+    return _password_hasher
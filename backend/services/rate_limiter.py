@@ -0,0 +1,293 @@
+from typing import Dict, Any, List, Optional, Tuple
+from functools import wraps
+import math
+import os
+import sqlite3
+import threading
+import time
+
+RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'local')
+RATE_LIMIT_DB = os.getenv('RATE_LIMIT_DB', 'rate_limits.db')
+TRUSTED_PROXIES = int(os.getenv('RATE_LIMIT_TRUSTED_PROXIES', 0))
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def parse_limit(limit: str) -> Tuple[float, float]:
+    """'30/minute' or '5/10second' -> (capacity, refill tokens per second)"""
+    count, _, period = limit.partition('/')
+    multiplier = ''.join(ch for ch in period if ch.isdigit())
+    unit = period[len(multiplier):].strip().rstrip('s') or 'second'
+    if unit not in PERIODS:
+        raise ValueError(f"Invalid rate limit: {limit}")
+    seconds = PERIODS[unit] * (int(multiplier) if multiplier else 1)
+    return float(count), float(count) / seconds
+
+
+class LocalBuckets:
+    """In-process token buckets behind striped locks
+
+    Keys hash onto a fixed set of locks, so concurrent requests for different
+    clients rarely contend and no global lock is taken. Each bucket keeps the
+    capacity and rate of its limit; buckets that have refilled completely carry
+    no information and are pruned when the table grows.
+    """
+
+    def __init__(self, stripes: int = 64, max_keys: int = 100000, prune_interval: float = 5.0):
+        self._locks = [threading.Lock() for _ in range(stripes)]
+        self._buckets: Dict[str, list] = {}
+        self.max_keys = max_keys
+        self.prune_interval = prune_interval
+        self._last_prune = 0.0
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        """Take one token; return (allowed, tokens left or seconds until one is available)"""
+        with self._locks[hash(key) % len(self._locks)]:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [capacity, now, capacity, rate]
+            tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= 1.0:
+                bucket[0] = tokens - 1.0
+                allowed, detail = True, bucket[0]
+            else:
+                bucket[0] = tokens
+                allowed, detail = False, (1.0 - tokens) / rate
+
+        # A full table of active buckets frees nothing, so scan at most every
+        # prune_interval seconds rather than on every request
+        if len(self._buckets) > self.max_keys and now - self._last_prune >= self.prune_interval:
+            self._last_prune = now
+            self._prune(now)
+        return allowed, detail
+
+    def _prune(self, now: float):
+        for key, bucket in list(self._buckets.items()):
+            tokens, updated_at, capacity, rate = bucket
+            if tokens + (now - updated_at) * rate >= capacity:
+                self._buckets.pop(key, None)
+
+
+class SQLiteBuckets:
+    """Token buckets shared by every worker process through a small SQLite file
+
+    Each take is one atomic UPSERT that refills and spends in SQL, so workers
+    never read-modify-write the same bucket concurrently. The file is separate
+    from the application database and runs without fsync; losing it only resets
+    the limits.
+    """
+
+    def __init__(self, path: str = RATE_LIMIT_DB):
+        self.path = path
+        self._local = threading.local()
+        conn = self._connection()
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rate_limits (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        ''')
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn, self._local.pid = conn, os.getpid()
+        return conn
+
+    def take(self, key: str, capacity: float, rate: float, now: float) -> Tuple[bool, float]:
+        conn = self._connection()
+        row = conn.execute('''
+            INSERT INTO rate_limits (key, tokens, updated_at) VALUES (?1, ?2 - 1, ?4)
+            ON CONFLICT (key) DO UPDATE SET
+                tokens = MIN(?2, tokens + (?4 - updated_at) * ?3) - 1,
+                updated_at = ?4
+            WHERE MIN(?2, tokens + (?4 - updated_at) * ?3) >= 1
+            RETURNING tokens
+        ''', (key, capacity, rate, now)).fetchone()
+        if row is not None:
+            return True, row[0]
+
+        row = conn.execute('SELECT tokens, updated_at FROM rate_limits WHERE key = ?', (key,)).fetchone()
+        tokens = min(capacity, row[0] + (now - row[1]) * rate) if row else 0.0
+        return False, max(1.0 - tokens, 0.0) / rate
+
+    def prune(self, older_than_seconds: float = 86400):
+        self._connection().execute('DELETE FROM rate_limits WHERE updated_at < ?',
+                                   (time.time() - older_than_seconds,))
+
+
+class RateLimiter:
+    """Per-client token buckets for named route groups
+
+    Every request is charged to the local buckets first, which reject clients
+    that are far over their limit without any I/O. With ``storage='sqlite'`` an
+    allowed request is then charged to the shared buckets as well, so the limit
+    holds across all worker processes rather than per worker.
+    """
+
+    def __init__(self, storage: str = RATE_LIMIT_STORAGE):
+        self.local = LocalBuckets()
+        self.shared = SQLiteBuckets() if storage == 'sqlite' else None
+        self.allowed: Dict[str, int] = {}
+        self.limited: Dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+
+    def hit(self, name: str, key: str, limit: str) -> Tuple[bool, float]:
+        """Charge one request; return (allowed, seconds to wait when refused)"""
+        capacity, rate = parse_limit(limit)
+        bucket_key = f'{name}:{key}'
+        now = time.time()
+
+        allowed, detail = self.local.take(bucket_key, capacity, rate, now)
+        if allowed and self.shared is not None:
+            try:
+                allowed, detail = self.shared.take(bucket_key, capacity, rate, now)
+            except sqlite3.Error as e:
+                # Fail open on the shared tier; the local buckets still apply
+                print(f"Rate limit storage error: {e}")
+
+        with self._stats_lock:
+            counter = self.allowed if allowed else self.limited
+            counter[name] = counter.get(name, 0) + 1
+
+        return allowed, 0.0 if allowed else detail
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                'storage': 'sqlite' if self.shared else 'local',
+                'allowed': dict(self.allowed),
+                'limited': dict(self.limited)
+            }
+
+
+_rate_limiter = None
+_init_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """Process-wide rate limiter, created on first use"""
+    global _rate_limiter
+
+    if _rate_limiter is None:
+        with _init_lock:
+            if _rate_limiter is None:
+                _rate_limiter = RateLimiter()
+
+    return _rate_limiter
+
+
+_proxy_warning_logged = False
+
+
+def client_address(forwarded_for: Optional[str], remote_addr: Optional[str]) -> str:
+    """Client address, taken from X-Forwarded-For behind RATE_LIMIT_TRUSTED_PROXIES proxies"""
+    global _proxy_warning_logged
+
+    if TRUSTED_PROXIES and forwarded_for:
+        route = [address.strip() for address in forwarded_for.split(',')]
+        return route[max(len(route) - TRUSTED_PROXIES, 0)]
+    if forwarded_for and not _proxy_warning_logged:
+        # Every client would share the proxy's per-IP buckets
+        _proxy_warning_logged = True
+        print("Warning: X-Forwarded-For received but RATE_LIMIT_TRUSTED_PROXIES is 0; "
+              "per-IP rate limits apply to the proxy's address")
+    return remote_addr or 'unknown'
+
+
+def client_ip(request) -> str:
+    """Client address of a Flask request"""
+    return client_address(request.headers.get('X-Forwarded-For'), request.remote_addr)
+
+
+def _identity() -> Optional[str]:
+    from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity
+
+    try:
+        verify_jwt_in_request(optional=True)
+        identity = get_jwt_identity()
+    except Exception:
+        # Invalid tokens are rejected by jwt_required; count them per IP only
+        return None
+    return str(identity) if identity is not None else None
+
+
+def resolve_limits(name: str, per_ip: Optional[str] = None, per_user: Optional[str] = None,
+                   per_ip_account: Optional[str] = None) -> List[Tuple[str, str]]:
+    """(scope, limit) pairs for a route group, after ``RATE_LIMIT_<NAME>_IP``/``_USER``/``_IP_ACCOUNT`` overrides"""
+    env_name = name.upper().replace('-', '_')
+    per_ip = os.getenv(f'RATE_LIMIT_{env_name}_IP', per_ip)
+    per_user = os.getenv(f'RATE_LIMIT_{env_name}_USER', per_user)
+    per_ip_account = os.getenv(f'RATE_LIMIT_{env_name}_IP_ACCOUNT', per_ip_account)
+    # Narrowest scope first: a request refused for its account or user is not
+    # charged to the IP bucket that everyone behind the same address shares
+    checks = [(scope, limit) for scope, limit in (('ip_account', per_ip_account), ('user', per_user), ('ip', per_ip))
+              if limit and limit != 'off']
+    for _, limit in checks:
+        parse_limit(limit)
+    return checks
+
+
+def check_limits(name: str, checks: List[Tuple[str, str]], ip: str, identity: Optional[str],
+                 account: Optional[str] = None) -> Optional[int]:
+    """Charge a request to each of its buckets; return whole seconds to wait if one refuses it"""
+    limiter = get_rate_limiter()
+    for scope, limit in checks:
+        if scope == 'ip':
+            key = ip
+        elif scope == 'user':
+            key = identity
+        else:
+            key = f'{ip}|{account}' if account else None
+        if key is None:
+            continue
+        allowed, retry_after = limiter.hit(f'{name}:{scope}', key, limit)
+        if not allowed:
+            return max(1, math.ceil(retry_after))
+    return None
+
+
+def _account(request) -> Optional[str]:
+    body = request.get_json(silent=True)
+    email = body.get('email') if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(name: str, per_ip: Optional[str] = None, per_user: Optional[str] = None,
+               per_ip_account: Optional[str] = None):
+    """Throttle a route with token buckets per client IP, per JWT identity and/or per IP and account
+
+    Limits look like '10/minute' (burst of 10, refilled evenly over a minute).
+    ``per_ip_account`` keys on the IP together with the ``email`` of the JSON
+    body, so one client retrying an account is held back without refusing
+    everyone else behind the same address (campus NAT). Environment variables
+    ``RATE_LIMIT_<NAME>_IP``, ``_USER`` and ``_IP_ACCOUNT`` override them, and
+    'off' disables one. Routes sharing a ``name`` share their buckets. Refused
+    requests get 429 with ``Retry-After``.
+    """
+    checks = resolve_limits(name, per_ip, per_user, per_ip_account)
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from flask import request, jsonify
+
+            scopes = {scope for scope, _ in checks}
+            identity = _identity() if 'user' in scopes else None
+            account = _account(request) if 'ip_account' in scopes else None
+            seconds = check_limits(name, checks, client_ip(request), identity, account)
+            if seconds is not None:
+                response = jsonify({'error': 'Too many requests, please slow down', 'retry_after': seconds})
+                response.headers['Retry-After'] = str(seconds)
+                return response, 429
+            return view(*args, **kwargs)
+
+        # Lets other servers of the same route (asgi.py) apply the same limits
+        wrapper.rate_limits = (name, checks)
+        return wrapper
+    return decorator
@@ -0,0 +1,89 @@
+from typing import List, Dict, Any, Tuple, Optional
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import os
+import time
+
+from models.database import (get_active_user_ids, get_domain_activity, get_viewed_recommendations,
+                             bulk_upsert_recommendations)
+from services.recommendation_engine import rank_catalog
+
+
+def _compute_shard(args: Tuple[List[int], int]) -> Tuple[List[int], List[tuple]]:
+    """Rank recommendations for one shard of users (runs in a worker process)"""
+    
+    user_ids, top_n = args
+    activity = get_domain_activity(user_ids)
+    viewed = get_viewed_recommendations(user_ids)
+    
+    rows = []
+    for user_id in user_ids:
+        for item in rank_catalog(activity.get(user_id, {}), viewed.get(user_id), top_n):
+            rows.append((
+                user_id, item['title'], item['domain'], item['type'],
+                item['url'], item['description'], item['confidence']
+            ))
+    
+    return user_ids, rows
+
+
+class RecommendationBatchJob:
+    """Offline job that precomputes top-N recommendations for every active user
+    
+    Users are split into shards that are ranked in a process pool; the parent
+    process is the only writer and upserts each shard in a single transaction.
+    Items marked viewed since the last run are down-ranked in the next one.
+    
+    Run from the backend directory with ``python -m services.recommendation_batch``.
+    """
+    
+    def __init__(self, top_n: int = 5, chunk_size: int = 500, workers: Optional[int] = None):
+        self.top_n = top_n
+        self.chunk_size = chunk_size
+        self.workers = workers or os.cpu_count() or 1
+    
+    def _shards(self, user_ids: List[int]):
+        for start in range(0, len(user_ids), self.chunk_size):
+            yield user_ids[start:start + self.chunk_size], self.top_n
+    
+    def run(self) -> Dict[str, Any]:
+        """Recompute and store recommendations for all active users"""
+        
+        started = time.perf_counter()
+        user_ids = get_active_user_ids()
+        written = 0
+        
+        if self.workers > 1 and len(user_ids) > self.chunk_size:
+            with ProcessPoolExecutor(max_workers=self.workers) as executor:
+                for shard_ids, rows in executor.map(_compute_shard, self._shards(user_ids)):
+                    written += bulk_upsert_recommendations(shard_ids, rows)
+        else:
+            for shard in self._shards(user_ids):
+                shard_ids, rows = _compute_shard(shard)
+                written += bulk_upsert_recommendations(shard_ids, rows)
+        
+        return {
+            'users': len(user_ids),
+            'recommendations_written': written,
+            'duration_seconds': round(time.perf_counter() - started, 3),
+            'completed_at': datetime.now(timezone.utc).isoformat()
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute learning recommendations for all active users')
+    parser.add_argument('--top-n', type=int, default=5, help='recommendations stored per user')
+    parser.add_argument('--chunk-size', type=int, default=500, help='users per shard')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    args = parser.parse_args()
+    
+    job = RecommendationBatchJob(top_n=args.top_n, chunk_size=args.chunk_size, workers=args.workers)
+    result = job.run()
+    
+    print(f"✅ Stored {result['recommendations_written']} recommendations for "
+          f"{result['users']} users in {result['duration_seconds']}s")
+
+
+if __name__ == '__main__':
+    main()
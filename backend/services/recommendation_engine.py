@@ -1,88 +1,280 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 from datetime import datetime, timezone
+import threading
+
+# Learning content catalog, grouped by domain
+DOMAIN_RECOMMENDATIONS = {
+    'data_science': [
+        {
+            'title': 'Introduction to Pandas',
+            'type': 'tutorial',
+            'difficulty': 'beginner',
+            'url': '#',
+            'description': 'Learn data manipulation with Pandas library'
+        },
+        {
+            'title': 'Machine Learning Basics',
+            'type': 'course',
+            'difficulty': 'intermediate',
+            'url': '#',
+            'description': 'Fundamental concepts of machine learning'
+        }
+    ],
+    'app_development': [
+        {
+            'title': 'React Fundamentals',
+            'type': 'tutorial',
+            'difficulty': 'beginner',
+            'url': '#',
+            'description': 'Build your first React application'
+        },
+        {
+            'title': 'Mobile App Development',
+            'type': 'course',
+            'difficulty': 'intermediate',
+            'url': '#',
+            'description': 'Create mobile apps with React Native'
+        }
+    ],
+    'cyber_security': [
+        {
+            'title': 'Network Security Basics',
+            'type': 'tutorial',
+            'difficulty': 'beginner',
+            'url': '#',
+            'description': 'Understanding network security principles'
+        },
+        {
+            'title': 'Ethical Hacking Course',
+            'type': 'course',
+            'difficulty': 'advanced',
+            'url': '#',
+            'description': 'Learn ethical hacking techniques'
+        }
+    ],
+    'general': [
+        {
+            'title': 'Programming Fundamentals',
+            'type': 'tutorial',
+            'difficulty': 'beginner',
+            'url': '#',
+            'description': 'Basic programming concepts and logic'
+        },
+        {
+            'title': 'Problem Solving Skills',
+            'type': 'course',
+            'difficulty': 'beginner',
+            'url': '#',
+            'description': 'Develop analytical thinking skills'
+        }
+    ]
+}
+
+DIFFICULTY_LEVELS = {'beginner': 0.0, 'intermediate': 0.5, 'advanced': 1.0}
+
+# Score multiplier for items the user has already opened
+VIEWED_PENALTY = 0.3
+
+
+def rank_catalog(domain_activity: Dict[str, int], viewed: Optional[Set[Tuple[str, str]]] = None,
+                 top_n: int = 5) -> List[Dict[str, Any]]:
+    """Rank every catalog item for a user from their per-domain chat activity
+    
+    Domain affinity is Laplace-smoothed so users without history still get a
+    spread across domains; items are nudged towards the difficulty matching how
+    active the user is, and already viewed items sink.
+    """
+    viewed = viewed or set()
+    total = sum(domain_activity.values())
+    experience = min(total / 20.0, 1.0)
+    
+    scored = []
+    for domain, items in DOMAIN_RECOMMENDATIONS.items():
+        affinity = (domain_activity.get(domain, 0) + 1) / (total + len(DOMAIN_RECOMMENDATIONS))
+        
+        for item in items:
+            level = DIFFICULTY_LEVELS.get(item['difficulty'], 0.0)
+            score = affinity * (1.0 - 0.5 * abs(level - experience))
+            if (domain, item['title']) in viewed:
+                score *= VIEWED_PENALTY
+            scored.append((score, domain, item))
+    
+    scored.sort(key=lambda entry: entry[0], reverse=True)
+    scored = scored[:top_n]
+    best = scored[0][0] if scored else 1.0
+    
+    return [
+        dict(item, domain=domain, confidence=round(score / best, 4))
+        for score, domain, item in scored
+    ]
+
+
+def _find_catalog_item(domain: str, title: str) -> Dict[str, Any]:
+    for item in DOMAIN_RECOMMENDATIONS.get(domain, []):
+        if item['title'] == title:
+            return item
+    return {}
+
+
+_content_retriever = None
+_init_lock = threading.Lock()
+
+
+def get_content_retriever():
+    """Shared content index over the catalog, built on first use"""
+    global _content_retriever
+    
+    if _content_retriever is None:
+        with _init_lock:
+            if _content_retriever is None:
+                from services.content_retriever import ContentRetriever
+                
+                retriever = ContentRetriever()
+                retriever.add_items([
+                    dict(item, domain=domain)
+                    for domain, items in DOMAIN_RECOMMENDATIONS.items()
+                    for item in items
+                ])
+                _content_retriever = retriever
+    
+    return _content_retriever
+
+
+_recommendation_cache = None
+
+# Per-user version counters (see models.database.get_resource_versions) in the cache keys:
+# a write by any process moves the user to new keys, so every gunicorn worker
+# and the batch job see it without in-process invalidation
+CATALOG_INPUTS = ('user_feedback', 'recommendations')
+CONTENT_INPUTS = ('chat_history',)
+
+
+def get_recommendation_cache():
+    """Per-user recommendation cache keyed by the versions of the user's inputs
+    
+    The catalog and precomputed recommendations change with ratings, content
+    interactions and batch runs (CATALOG_INPUTS), not with chat messages, so a
+    chat hits the cache for them. Only the small content-based part, which
+    reads the recent chat history, is keyed by the chat_history version.
+    """
+    global _recommendation_cache
+    
+    if _recommendation_cache is None:
+        with _init_lock:
+            if _recommendation_cache is None:
+                from services.cache import TTLCache
+                
+                _recommendation_cache = TTLCache('recommendations', ttl=300)
+    
+    return _recommendation_cache
+
 
 class RecommendationEngine:
     """Learning recommendation engine for personalized content suggestions"""
     
     def __init__(self):
-        self.user_preferences = {}
+        from services.user_preferences import get_preference_store
+        
+        self.user_preferences = get_preference_store()
+        self.cache = get_recommendation_cache()
+    
+    def _input_versions(self, user_id: int) -> Dict[str, int]:
+        from models.database import get_resource_versions
         
-    def get_recommendations(self, user_id: int, domain: str = 'general') -> List[Dict[str, Any]]:
+        return get_resource_versions(user_id, CATALOG_INPUTS + CONTENT_INPUTS)
+        
+    def get_recommendations(self, user_id: int, domain: str = 'general') -> Dict[str, Any]:
         """Get personalized learning recommendations for a user"""
         
-        # Basic recommendation logic (to be enhanced with ML)
-        domain_recommendations = {
-            'data_science': [
-                {
-                    'title': 'Introduction to Pandas',
-                    'type': 'tutorial',
-                    'difficulty': 'beginner',
-                    'url': '#',
-                    'description': 'Learn data manipulation with Pandas library'
-                },
-                {
-                    'title': 'Machine Learning Basics',
-                    'type': 'course',
-                    'difficulty': 'intermediate',
-                    'url': '#',
-                    'description': 'Fundamental concepts of machine learning'
-                }
-            ],
-            'app_development': [
-                {
-                    'title': 'React Fundamentals',
-                    'type': 'tutorial',
-                    'difficulty': 'beginner',
-                    'url': '#',
-                    'description': 'Build your first React application'
-                },
-                {
-                    'title': 'Mobile App Development',
-                    'type': 'course',
-                    'difficulty': 'intermediate',
-                    'url': '#',
-                    'description': 'Create mobile apps with React Native'
-                }
-            ],
-            'cyber_security': [
-                {
-                    'title': 'Network Security Basics',
-                    'type': 'tutorial',
-                    'difficulty': 'beginner',
-                    'url': '#',
-                    'description': 'Understanding network security principles'
-                },
-                {
-                    'title': 'Ethical Hacking Course',
-                    'type': 'course',
-                    'difficulty': 'advanced',
-                    'url': '#',
-                    'description': 'Learn ethical hacking techniques'
-                }
-            ],
-            'general': [
-                {
-                    'title': 'Programming Fundamentals',
-                    'type': 'tutorial',
-                    'difficulty': 'beginner',
-                    'url': '#',
-                    'description': 'Basic programming concepts and logic'
-                },
-                {
-                    'title': 'Problem Solving Skills',
-                    'type': 'course',
-                    'difficulty': 'beginner',
-                    'url': '#',
-                    'description': 'Develop analytical thinking skills'
-                }
-            ]
-        }
+        versions = self._input_versions(user_id)
+        catalog = self.cache.get_or_set(
+            ('domain', str(user_id), domain) + tuple(versions[name] for name in CATALOG_INPUTS),
+            lambda: self._build_recommendations(user_id, domain)
+        )
+        related = self.cache.get_or_set(
+            ('content', str(user_id)) + tuple(versions[name] for name in CONTENT_INPUTS),
+            lambda: self.get_content_recommendations(user_id)
+        )
         
-        recommendations = domain_recommendations.get(domain, domain_recommendations['general'])
+        recommendations = catalog['recommendations']
+        # Items matching what the student has been asking about come first
+        if related:
+            related_titles = {item['title'] for item in related}
+            recommendations = related + [item for item in recommendations if item['title'] not in related_titles]
+        
+        return dict(catalog, recommendations=recommendations)
+    
+    def _build_recommendations(self, user_id: int, domain: str) -> Dict[str, Any]:
+        # Without an explicit domain, fall back to the one the user engages with most
+        if domain in (None, 'general', 'auto'):
+            domain = self.user_preferences.preferred_domain(user_id, default='general')
         
         return {
-            'recommendations': recommendations,
+            'recommendations': DOMAIN_RECOMMENDATIONS.get(domain, DOMAIN_RECOMMENDATIONS['general']),
             'domain': domain,
             'user_id': user_id,
             'generated_at': datetime.now(timezone.utc).isoformat()
         }
+    
+    def get_content_recommendations(self, user_id: int, limit: int = 3,
+                                    history_size: int = 5) -> List[Dict[str, Any]]:
+        """Recommend catalog items similar to the user's recent chat messages"""
+        
+        from models.database import get_user_chat_history
+        
+        history = get_user_chat_history(user_id, history_size)
+        if not history:
+            return []
+        
+        # Newest messages weigh the most
+        messages = [chat['message'] for chat in history]
+        weights = [0.7 ** age for age in range(len(messages))]
+        
+        return get_content_retriever().query(messages, weights, top_k=limit)
+    
+    def get_personalized_recommendations(self, user_id: int, domain: str = 'all',
+                                         limit: int = 10) -> List[Dict[str, Any]]:
+        """Serve batch-precomputed recommendations, ranking on the fly for new users"""
+        
+        versions = self._input_versions(user_id)
+        return self.cache.get_or_set(
+            ('personalized', str(user_id), domain, limit) + tuple(versions[name] for name in CATALOG_INPUTS),
+            lambda: self._build_personalized_recommendations(user_id, domain, limit)
+        )
+    
+    def _build_personalized_recommendations(self, user_id: int, domain: str,
+                                            limit: int) -> List[Dict[str, Any]]:
+        from models.database import (get_precomputed_recommendations, get_domain_activity,
+                                     get_viewed_recommendations)
+        
+        domain_filter = None if domain in (None, 'all') else domain
+        rows = get_precomputed_recommendations(user_id, domain_filter, limit)
+        
+        if rows:
+            return [
+                {
+                    'id': row['id'],
+                    'title': row['topic'],
+                    'type': row['recommendation_type'],
+                    'difficulty': _find_catalog_item(row['domain'], row['topic']).get('difficulty'),
+                    'url': row['content_url'],
+                    'description': row['description'],
+                    'domain': row['domain'],
+                    'confidence': row['confidence_score'],
+                    'is_viewed': bool(row['is_viewed']),
+                    'source': 'precomputed'
+                }
+                for row in rows
+            ]
+        
+        # Not covered by the last batch run yet
+        activity = self.user_preferences.get_domain_weights(user_id)
+        if not activity:
+            activity = get_domain_activity([user_id]).get(user_id, {})
+        viewed = get_viewed_recommendations([user_id]).get(user_id, set())
+        ranked = rank_catalog(activity, viewed, top_n=sum(len(items) for items in DOMAIN_RECOMMENDATIONS.values()))
+        
+        if domain_filter:
+            ranked = [item for item in ranked if item['domain'] == domain_filter]
+        
+        return [dict(item, source='live') for item in ranked[:limit]]
@@ -0,0 +1,129 @@
+from typing import Dict, Any, Callable, Optional
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # no leader lock (single process)
+    fcntl = None
+
+# How long before the due date a reminder fires, by priority, in seconds
+REMINDER_LEAD_TIMES = {
+    'high': 3 * 86400,
+    'medium': 2 * 86400,
+    'low': 86400
+}
+
+# Deadlines added by other processes are picked up within this many seconds
+REMINDER_POLL_INTERVAL = float(os.getenv('REMINDER_POLL_INTERVAL', 60))
+
+# Held by the one process (of all gunicorn workers) that fires reminders
+REMINDER_LOCK_FILE = os.getenv('REMINDER_LOCK_FILE', 'reminder_scheduler.lock')
+
+
+class ReminderScheduler:
+    """Single scheduler for every user's deadline reminders
+
+    Reminder state lives in the ``deadlines`` table: a reminder is due
+    ``REMINDER_LEAD_TIMES[priority]`` before ``due_ts`` and is claimed by
+    setting ``reminder_sent`` in one UPDATE (claim_due_reminders), so it fires
+    once however many processes run a scheduler. Of the processes started, only
+    the one holding REMINDER_LOCK_FILE claims reminders; the others wait to take
+    over if it exits. The thread sleeps until the next reminder is due, at most
+    REMINDER_POLL_INTERVAL, and is woken early by deadlines added in its process.
+    """
+
+    def __init__(self, on_reminder: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 lock_path: str = REMINDER_LOCK_FILE, poll_interval: float = REMINDER_POLL_INTERVAL):
+        self.on_reminder = on_reminder
+        self.lock_path = lock_path
+        self.poll_interval = poll_interval
+        self._condition = threading.Condition()
+        self._thread = None
+        self._pid = None
+        self._lock_file = None
+        self._stopping = False
+        self.fired = 0
+
+    @property
+    def is_leader(self) -> bool:
+        return self._lock_file is not None
+
+    def start(self):
+        """Start the scheduler thread in this process (again, after a fork)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._condition:
+            if self._pid == os.getpid():
+                return
+            self._lock_file = None
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _try_lead(self) -> bool:
+        """Take the leader lock if no other process holds it; released when this process exits"""
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            self._lock_file = True
+            return True
+
+        lock_file = open(self.lock_path, 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def wake(self):
+        """Check for due reminders now (after a deadline was added in this process)"""
+        with self._condition:
+            self._condition.notify()
+
+    def _run(self):
+        while not self._stopping:
+            timeout = self.poll_interval
+            try:
+                if self._try_lead():
+                    timeout = self._fire_due()
+            except Exception as e:
+                print(f"Error in reminder scheduler: {e}")
+
+            with self._condition:
+                if not self._stopping:
+                    self._condition.wait(timeout)
+
+    def _fire_due(self) -> float:
+        """Claim and deliver the due reminders; return seconds until the next check"""
+        from models.database import claim_due_reminders, get_next_reminder_ts
+
+        now = int(time.time())
+        for deadline in claim_due_reminders(now, REMINDER_LEAD_TIMES):
+            self.fired += 1
+            if self.on_reminder:
+                try:
+                    self.on_reminder(deadline)
+                except Exception as e:
+                    print(f"Error delivering reminder: {e}")
+
+        next_at = get_next_reminder_ts(now, now + self.poll_interval, REMINDER_LEAD_TIMES)
+        return self.poll_interval if next_at is None else max(next_at - time.time(), 1.0)
+
+    def stats(self) -> Dict[str, Any]:
+        return {'leader': self.is_leader, 'fired': self.fired}
+
+    def stop(self, timeout: float = 5.0):
+        self._stopping = True
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+        if self._lock_file not in (None, True):
+            self._lock_file.close()
+        self._lock_file = None
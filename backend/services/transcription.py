@@ -0,0 +1,71 @@
+from typing import Dict, Any, Callable, Optional
+from abc import ABC, abstractmethod
+import os
+import time
+
+DEFAULT_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'local')
+
+
+class TranscriptionBackend(ABC):
+    """Speech-to-text engine used by the voice pipeline
+
+    Backends take a path to a validated audio file and return at least
+    ``transcription``, ``confidence`` and ``language``. They run inside
+    transcription worker processes, so they are constructed lazily per process
+    and must not rely on state from the web worker.
+    """
+
+    name = 'base'
+
+    @abstractmethod
+    def transcribe(self, audio_file_path: str) -> Dict[str, Any]:
+        """Transcribe an audio file"""
+
+
+class LocalTranscriptionBackend(TranscriptionBackend):
+    """Stand-in backend for development and tests; no external service needed"""
+
+    name = 'local'
+
+    def transcribe(self, audio_file_path: str) -> Dict[str, Any]:
+        # Placeholder implementation - would integrate with Google Speech-to-Text API
+        # or other speech recognition services
+        return {
+            'transcription': 'This is a mock transcription of the audio file.',
+            'confidence': 0.85,
+            'language': 'en-US'
+        }
+
+
+_backend_factories: Dict[str, Callable[[], TranscriptionBackend]] = {
+    'local': LocalTranscriptionBackend
+}
+_backends: Dict[str, TranscriptionBackend] = {}
+
+
+def register_backend(name: str, factory: Callable[[], TranscriptionBackend]):
+    """Make a backend selectable by name (e.g. through TRANSCRIPTION_BACKEND)
+
+    Register at import time of a module the worker processes also import, since
+    they start from a fresh interpreter.
+    """
+    _backend_factories[name] = factory
+
+
+def get_transcription_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    """Backend instance for this process, created on first use"""
+    name = name or DEFAULT_BACKEND
+    if name not in _backends:
+        if name not in _backend_factories:
+            raise ValueError(f"Unknown transcription backend: {name}")
+        _backends[name] = _backend_factories[name]()
+    return _backends[name]
+
+
+def transcribe_file(audio_file_path: str, backend_name: Optional[str] = None) -> Dict[str, Any]:
+    """Transcribe one file and time it; safe to run in a worker process"""
+    started = time.perf_counter()
+    result = get_transcription_backend(backend_name).transcribe(audio_file_path)
+    result['processing_time'] = round(time.perf_counter() - started, 3)
+    result['backend'] = backend_name or DEFAULT_BACKEND
+    return result
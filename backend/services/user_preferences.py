@@ -0,0 +1,184 @@
+from typing import Dict, Optional
+import atexit
+import json
+import math
+import threading
+import time
+
+from models.database import register_write_listener, load_user_preferences, save_user_preferences
+from services.recommendation_engine import DOMAIN_RECOMMENDATIONS
+
+
+class UserPreferenceStore:
+    """Per-user domain/topic weights with exponential time decay
+
+    All vectors live in one float32 matrix (one row per user, one column per
+    domain and per catalog topic) next to an array of last-update times. Each
+    event decays its row to "now" and adds to one or two cells, and reads decay a
+    single row, so both are O(1) in the user's history length. Dirty rows are
+    written back in batches every ``flush_every`` events or ``flush_interval``
+    seconds, and on interpreter exit.
+    """
+
+    def __init__(self, half_life_days: float = 14.0, flush_interval: float = 60.0,
+                 flush_every: int = 200, capacity: int = 1024):
+        self.domains = list(DOMAIN_RECOMMENDATIONS.keys())
+        self.topics = {
+            item['title']: domain
+            for domain, items in DOMAIN_RECOMMENDATIONS.items()
+            for item in items
+        }
+        self.columns = self.domains + list(self.topics)
+        self._column_index = {name: idx for idx, name in enumerate(self.columns)}
+
+        self.decay_rate = math.log(2) / (half_life_days * 86400)
+        self.flush_interval = flush_interval
+        self.flush_every = flush_every
+
+        # Allocated with the first load, so NumPy is only imported once it is needed
+        self._capacity = capacity
+        self._weights = None
+        self._updated_at = None
+        self._rows: Dict[int, int] = {}
+        self._dirty = set()
+        self._last_flush = time.time()
+        self._lock = threading.RLock()
+        self._loaded = False
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._lock:
+            if self._loaded:
+                return
+            import numpy as np
+
+            self._weights = np.zeros((self._capacity, len(self.columns)), dtype=np.float32)
+            self._updated_at = np.zeros(self._capacity, dtype=np.float64)
+            for row in load_user_preferences():
+                idx = self._row(row['user_id'])
+                for name, weight in json.loads(row['weights']).items():
+                    if name in self._column_index:
+                        self._weights[idx, self._column_index[name]] = weight
+                self._updated_at[idx] = row['updated_at']
+            self._loaded = True
+
+    def _row(self, user_id: int) -> int:
+        idx = self._rows.get(user_id)
+        if idx is None:
+            idx = self._rows[user_id] = len(self._rows)
+            if idx >= len(self._updated_at):
+                import numpy as np
+
+                self._weights = np.concatenate([self._weights, np.zeros_like(self._weights)])
+                self._updated_at = np.concatenate([self._updated_at, np.zeros_like(self._updated_at)])
+        return idx
+
+    def _decay_factor(self, idx: int, now: float) -> float:
+        last = self._updated_at[idx]
+        return math.exp(-self.decay_rate * (now - last)) if last else 1.0
+
+    def record(self, user_id: int, domain: Optional[str] = None, topic: Optional[str] = None,
+               weight: float = 1.0, timestamp: Optional[float] = None):
+        """Add an event's weight to a user's domain and/or topic"""
+        if domain not in self._column_index and topic not in self._column_index:
+            return
+
+        self._ensure_loaded()
+        user_id = int(user_id)
+        now = timestamp or time.time()
+
+        with self._lock:
+            idx = self._row(user_id)
+            self._weights[idx] *= self._decay_factor(idx, now)
+            self._updated_at[idx] = now
+
+            if topic in self._column_index:
+                self._weights[idx, self._column_index[topic]] += weight
+                domain = domain or self.topics[topic]
+            if domain in self._column_index:
+                self._weights[idx, self._column_index[domain]] += weight
+
+            self._dirty.add(user_id)
+            due = len(self._dirty) >= self.flush_every or now - self._last_flush >= self.flush_interval
+
+        if due:
+            self.flush()
+
+    def get_weights(self, user_id: int) -> Dict[str, float]:
+        """Current (decayed) weights for a user, empty if nothing was recorded"""
+        self._ensure_loaded()
+
+        with self._lock:
+            idx = self._rows.get(int(user_id))
+            if idx is None:
+                return {}
+            row = self._weights[idx] * self._decay_factor(idx, time.time())
+
+        return {name: float(row[col]) for name, col in self._column_index.items() if row[col]}
+
+    def get_domain_weights(self, user_id: int) -> Dict[str, float]:
+        weights = self.get_weights(user_id)
+        return {domain: max(weights[domain], 0.0) for domain in self.domains if domain in weights}
+
+    def preferred_domain(self, user_id: int, default: Optional[str] = None) -> Optional[str]:
+        """Domain with the highest positive weight"""
+        weights = self.get_domain_weights(user_id)
+        if not weights:
+            return default
+        domain, weight = max(weights.items(), key=lambda entry: entry[1])
+        return domain if weight > 0 else default
+
+    def flush(self):
+        """Persist dirty vectors; on failure they stay dirty for the next flush"""
+        with self._lock:
+            rows = []
+            flushed = self._dirty
+            for user_id in flushed:
+                idx = self._rows[user_id]
+                weights = {name: float(self._weights[idx, col])
+                           for name, col in self._column_index.items() if self._weights[idx, col]}
+                rows.append((user_id, json.dumps(weights), float(self._updated_at[idx])))
+            self._dirty = set()
+            self._last_flush = time.time()
+
+        try:
+            save_user_preferences(rows)
+        except Exception as e:
+            print(f"Error saving user preferences: {e}")
+            with self._lock:
+                self._dirty |= flushed
+
+    def on_chat_history(self, user_id, domain=None, **details):
+        self.record(user_id, domain=domain)
+
+    def on_user_interaction(self, user_id, content_id=None, rating=None, **details):
+        # Ratings of 1-5 map to -1..+1; unrated interactions count as mild interest
+        weight = (rating - 3) / 2.0 if rating is not None else 0.5
+        self.record(user_id, topic=content_id, weight=weight)
+
+
+_preference_store = None
+_preference_store_lock = threading.Lock()
+
+
+def get_preference_store() -> UserPreferenceStore:
+    """Process-wide preference store, subscribed to interaction writes on creation"""
+    global _preference_store
+
+    if _preference_store is None:
+        with _preference_store_lock:
+            if _preference_store is None:
+                store = UserPreferenceStore()
+                register_write_listener('chat_history', store.on_chat_history)
+                register_write_listener('user_interactions', store.on_user_interaction)
+                atexit.register(store.flush)
+                _preference_store = store
+
+    return _preference_store
+
+
+def flush_preference_store():
+    """Persist pending weights, if this process has a preference store"""
+    if _preference_store is not None:
+        _preference_store.flush()
@@ -0,0 +1,127 @@
+from typing import Dict, Any, Optional
+import json
+import os
+import threading
+
+from services.cache import TTLCache, MISSING
+
+try:
+    import redis
+except ImportError:  # the shared tier is optional
+    redis = None
+
+PROFILE_TTL = float(os.getenv('USER_PROFILE_TTL', 60))
+MISSING_PROFILE_TTL = float(os.getenv('USER_PROFILE_MISSING_TTL', 10))
+
+# With a shared tier, other workers only learn about updates through it, so
+# their local copies must expire quickly
+SHARED_LOCAL_TTL = 5.0
+
+
+class SharedProfileTier:
+    """Cross-worker profile tier in Redis (``USER_CACHE_REDIS_URL`` or ``REDIS_URL``)
+
+    Failures are logged and treated as misses, so an unavailable Redis only
+    costs the database lookup it would have saved.
+    """
+
+    prefix = 'user-profile:'
+
+    def __init__(self, url: str):
+        self.client = redis.Redis.from_url(url, socket_timeout=0.2, socket_connect_timeout=0.2)
+
+    def get(self, key: str) -> Any:
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception as e:
+            print(f"Shared profile cache error: {e}")
+            return MISSING
+        return MISSING if value is None else json.loads(value)
+
+    def set(self, key: str, value: Any, ttl: float):
+        try:
+            self.client.set(self.prefix + key, json.dumps(value, default=str), ex=max(1, int(ttl)))
+        except Exception as e:
+            print(f"Shared profile cache error: {e}")
+
+    def delete(self, key: str):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as e:
+            print(f"Shared profile cache error: {e}")
+
+
+class UserProfileCache:
+    """User profiles keyed by JWT identity, cached in process and optionally in Redis
+
+    Unknown or inactive users are cached as None for a shorter TTL, so repeated
+    requests with a stale token do not reach SQLite either. ``update_user`` and
+    ``create_user`` invalidate the user's entry through the database write hook.
+    Returned profiles are shared between requests and must be treated as read-only.
+    """
+
+    def __init__(self, ttl: float = PROFILE_TTL, missing_ttl: float = MISSING_PROFILE_TTL,
+                 shared_url: Optional[str] = None):
+        shared_url = shared_url or os.getenv('USER_CACHE_REDIS_URL') or os.getenv('REDIS_URL')
+        self.shared = SharedProfileTier(shared_url) if shared_url and redis is not None else None
+
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        local_ttl = min(ttl, SHARED_LOCAL_TTL) if self.shared else ttl
+        self.local = TTLCache('user_profiles', ttl=local_ttl, max_entries=50000)
+
+    def get(self, user_id) -> Optional[Dict[str, Any]]:
+        key = str(user_id)
+
+        profile = self.local.get(key)
+        if profile is not MISSING:
+            return profile
+
+        if self.shared:
+            profile = self.shared.get(key)
+            if profile is not MISSING:
+                self._set_local(key, profile)
+                return profile
+
+        from models.database import get_user_by_id
+
+        profile = get_user_by_id(user_id)
+        self._set_local(key, profile)
+        if self.shared:
+            self.shared.set(key, profile, self.ttl if profile is not None else self.missing_ttl)
+        return profile
+
+    def _set_local(self, key: str, profile: Optional[Dict[str, Any]]):
+        ttl = None if profile is not None else min(self.missing_ttl, self.local.ttl)
+        self.local.set(key, profile, ttl)
+
+    def invalidate(self, user_id, **details):
+        key = str(user_id)
+        self.local.invalidate(key)
+        if self.shared:
+            self.shared.delete(key)
+
+
+_profile_cache = None
+_init_lock = threading.Lock()
+
+
+def get_user_profile_cache() -> UserProfileCache:
+    """Process-wide profile cache, registered for user write invalidation on first use"""
+    global _profile_cache
+
+    if _profile_cache is None:
+        with _init_lock:
+            if _profile_cache is None:
+                from models.database import register_write_listener
+
+                cache = UserProfileCache()
+                register_write_listener('users', cache.invalidate)
+                _profile_cache = cache
+
+    return _profile_cache
+
+
+def get_user_profile(user_id) -> Optional[Dict[str, Any]]:
+    """Profile of an active user by id (JWT identity), or None"""
+    return get_user_profile_cache().get(user_id)
@@ -0,0 +1,198 @@
+from typing import Dict, Any, Iterable, Iterator, List, Optional, TextIO, Tuple
+import argparse
+import csv
+import json
+import os
+import re
+import time
+
+from models.database import USER_ROLES
+from services.password_hasher import DEFAULT_ROUNDS, PasswordHasher, get_password_hasher
+
+EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+MIN_PASSWORD_LENGTH = 6
+
+# Initial passwords get the normal bcrypt cost. A lower cost (e.g. 4) imports a
+# cohort in seconds instead of minutes, but is an explicit opt-in: the hash is
+# only raised to BCRYPT_ROUNDS at the student's first login (verify_and_upgrade),
+# so an account that is never used keeps a hash that is cheap to crack if the
+# database leaks.
+PROVISIONING_ROUNDS = int(os.getenv('PROVISIONING_BCRYPT_ROUNDS', DEFAULT_ROUNDS))
+
+# Rows checked, hashed and inserted per transaction
+BATCH_SIZE = 5000
+
+REQUIRED_COLUMNS = ('email', 'password', 'student_id')
+
+
+def read_students(stream: TextIO) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (line number, row) from a student CSV with a header row
+
+    Columns: email, password, student_id, full_name (or first_name and
+    last_name), and optionally course, semester (or year) and role (student,
+    instructor or admin; student when empty).
+    """
+    reader = csv.DictReader(stream)
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames or []]
+
+    missing = [column for column in REQUIRED_COLUMNS if column not in reader.fieldnames]
+    if 'full_name' not in reader.fieldnames and 'first_name' not in reader.fieldnames:
+        missing.append('full_name')
+    if missing:
+        raise ValueError(f"CSV is missing columns: {', '.join(missing)}")
+
+    for row in reader:
+        yield reader.line_num, row
+
+
+def parse_student(row: Dict[str, str]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """Validate a CSV row like /api/auth/register does; return (user, None) or (None, error)"""
+    values = {key: (value or '').strip() for key, value in row.items() if key}
+    full_name = values.get('full_name') or ' '.join(
+        filter(None, (values.get('first_name'), values.get('last_name')))
+    )
+    user = {
+        'email': values.get('email', ''),
+        'password': row.get('password') or '',
+        'full_name': full_name,
+        'student_id': values.get('student_id', ''),
+        'course': values.get('course', '')
+    }
+
+    for field in ('email', 'password', 'full_name', 'student_id'):
+        if not user[field]:
+            return None, f'{field} is required'
+    if not EMAIL_PATTERN.match(user['email']):
+        return None, 'Invalid email format'
+    if len(user['password']) < MIN_PASSWORD_LENGTH:
+        return None, f'Password must be at least {MIN_PASSWORD_LENGTH} characters long'
+
+    try:
+        user['semester'] = int(values.get('semester') or values.get('year') or 1)
+    except ValueError:
+        return None, 'Invalid semester'
+
+    user['role'] = (values.get('role') or 'student').lower()
+    if user['role'] not in USER_ROLES:
+        return None, 'Invalid role'
+
+    return user, None
+
+
+class CohortProvisioner:
+    """Registers a whole cohort of students from CSV rows
+
+    Rows are validated and de-duplicated within the file as they stream in,
+    then handled ``batch_size`` at a time: one query finds emails and student
+    ids that are already registered, the remaining passwords are hashed across
+    the hasher's process pool, and the users are inserted in one transaction.
+    The report lists every rejected row with its line number and reason.
+    """
+
+    def __init__(self, hasher: Optional[PasswordHasher] = None,
+                 rounds: int = PROVISIONING_ROUNDS, batch_size: int = BATCH_SIZE):
+        self.hasher = hasher or get_password_hasher()
+        self.rounds = rounds
+        self.batch_size = batch_size
+
+    def provision(self, rows: Iterable[Tuple[int, Dict[str, str]]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        report = {'total': 0, 'created': 0, 'failed': 0, 'errors': []}
+        seen_emails, seen_student_ids = set(), set()
+        batch = []
+
+        for line, row in rows:
+            report['total'] += 1
+            user, error = parse_student(row)
+            if user:
+                if user['email'] in seen_emails:
+                    error = 'Duplicate email in file'
+                elif user['student_id'] in seen_student_ids:
+                    error = 'Duplicate student_id in file'
+
+            if error:
+                self._reject(report, line, row.get('email'), error)
+                continue
+
+            seen_emails.add(user['email'])
+            seen_student_ids.add(user['student_id'])
+            batch.append((line, user))
+            if len(batch) >= self.batch_size:
+                self._create_batch(batch, report)
+                batch = []
+
+        if batch:
+            self._create_batch(batch, report)
+
+        report['errors'].sort(key=lambda error: error['line'])
+        report['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        return report
+
+    def _create_batch(self, batch: List[Tuple[int, Dict[str, Any]]], report: Dict[str, Any]):
+        from models.database import find_existing_users, create_users_bulk
+
+        existing_emails, existing_student_ids = find_existing_users(
+            [user['email'] for _, user in batch], [user['student_id'] for _, user in batch]
+        )
+
+        new_users = []
+        for line, user in batch:
+            if user['email'] in existing_emails:
+                self._reject(report, line, user['email'], 'User with this email already exists')
+            elif user['student_id'] in existing_student_ids:
+                self._reject(report, line, user['email'], 'User with this student_id already exists')
+            else:
+                new_users.append((line, user))
+
+        hashes = self.hasher.hash_many([user['password'] for _, user in new_users], self.rounds)
+        records = []
+        for (_, user), password_hash in zip(new_users, hashes):
+            record = dict(user, password_hash=password_hash)
+            del record['password']
+            records.append(record)
+
+        for (line, user), user_id in zip(new_users, create_users_bulk(records)):
+            if user_id is None:
+                # Registered by someone else since the existence check
+                self._reject(report, line, user['email'], 'User already exists')
+            else:
+                report['created'] += 1
+
+    def _reject(self, report: Dict[str, Any], line: int, email: Optional[str], error: str):
+        report['failed'] += 1
+        report['errors'].append({'line': line, 'email': email, 'error': error})
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Register a cohort of students from a CSV file')
+    parser.add_argument('csv_file', help='CSV with email, password, full_name, student_id, course, semester, role')
+    parser.add_argument('--rounds', type=int, default=PROVISIONING_ROUNDS,
+                        help='bcrypt cost for the initial passwords (default BCRYPT_ROUNDS)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hashing processes')
+    parser.add_argument('--report', default=None, help='write the full JSON report to this file')
+    args = parser.parse_args()
+
+    if args.rounds < DEFAULT_ROUNDS:
+        print(f"Warning: hashing at cost {args.rounds} (BCRYPT_ROUNDS is {DEFAULT_ROUNDS}); "
+              "accounts keep the weaker hash until their first login")
+
+    hasher = PasswordHasher(workers=args.workers)
+    try:
+        with open(args.csv_file, newline='', encoding='utf-8-sig') as stream:
+            report = CohortProvisioner(hasher, rounds=args.rounds).provision(read_students(stream))
+    finally:
+        hasher.shutdown()
+
+    if args.report:
+        with open(args.report, 'w') as output:
+            json.dump(report, output, indent=2)
+
+    print(f"Created {report['created']} of {report['total']} students in {report['elapsed_seconds']}s")
+    for error in report['errors'][:20]:
+        print(f"  line {error['line']}: {error['email'] or '-'}: {error['error']}")
+    if report['failed'] > 20:
+        print(f"  ... {report['failed'] - 20} more rejected rows")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,228 @@
+from typing import Dict, Any, Optional
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import json
+import multiprocessing
+import os
+import threading
+import time
+
+from models.database import create_voice_job, update_voice_job, get_voice_job, fail_stale_voice_jobs
+
+_worker_service = None
+
+
+def _transcribe_job(job_id: int, audio_file_path: str, backend_name: Optional[str]) -> Dict[str, Any]:
+    """Transcription step of a voice job (runs in a worker process)"""
+    global _worker_service
+    from services.voice_service import VoiceService
+
+    if _worker_service is None:
+        _worker_service = VoiceService(backend_name=backend_name)
+
+    update_voice_job(job_id, status='transcribing')
+    return _worker_service.transcribe_audio(audio_file_path)
+
+
+class VoiceJobQueue:
+    """Background pipeline for voice queries: transcription, then the chatbot
+
+    ``submit`` records a queued job and returns its id straight away. Audio is
+    transcribed in a small process pool (CPU-heavy backends never hold the GIL of
+    the web worker), and the transcript is answered by the chatbot on a separate
+    bounded thread pool, so voice traffic can occupy at most ``workers`` processes
+    and ``chat_workers`` threads. At most ``max_pending`` jobs may be in flight
+    per web worker; beyond that ``submit`` refuses new jobs. Job state lives in
+    the ``voice_jobs`` table so any web worker can report it.
+    """
+
+    def __init__(self, voice_service, chatbot=None, workers: Optional[int] = None,
+                 chat_workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 poll_interval: float = 1.0):
+        self.voice_service = voice_service
+        self.chatbot = chatbot
+        self.workers = workers or int(os.getenv('VOICE_TRANSCRIBE_WORKERS', 2))
+        self.chat_workers = chat_workers or int(os.getenv('VOICE_CHAT_WORKERS', 2))
+        self.max_pending = max_pending or int(os.getenv('VOICE_MAX_PENDING', 16))
+        self.poll_interval = poll_interval
+        self._transcribe_pool = None
+        self._chat_pool = None
+        self._finished = threading.Condition()
+        self._active: Dict[int, str] = {}
+        self._pid = None
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self._transcribed = 0
+        self._transcription_seconds = 0.0
+
+    def _ensure_pools(self):
+        """Create the worker pools on first use (again, after a fork)"""
+        if self._pid == os.getpid():
+            return
+
+        with self._finished:
+            if self._pid == os.getpid():
+                return
+            try:
+                fail_stale_voice_jobs()
+            except Exception as e:
+                print(f"Error failing stale voice jobs: {e}")
+            # Spawned workers do not inherit the web worker's threads and locks
+            self._transcribe_pool = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')
+            )
+            self._chat_pool = ThreadPoolExecutor(max_workers=self.chat_workers, thread_name_prefix='voice-chat')
+            self._active = {}
+            self._pid = os.getpid()
+
+    def submit(self, user_id: int, audio_file_path: str, filename: str = None,
+               domain: str = None) -> Optional[int]:
+        """Queue a validated recording; return the job id, or None when the queue is full
+
+        The queue takes ownership of ``audio_file_path`` and deletes it after
+        transcription. On None the caller still owns the file.
+        """
+        self._ensure_pools()
+
+        with self._finished:
+            if len(self._active) >= self.max_pending:
+                self.rejected += 1
+                return None
+            job_id = create_voice_job(user_id, filename, domain)
+            self._active[job_id] = 'transcribing'
+            self.submitted += 1
+
+        job = {'id': job_id, 'user_id': user_id, 'filename': filename, 'domain': domain,
+               'audio_file_path': audio_file_path}
+        try:
+            future = self._transcribe_pool.submit(
+                _transcribe_job, job_id, audio_file_path, self.voice_service.backend_name
+            )
+        except Exception as e:
+            # A broken pool is rebuilt on the next submit
+            print(f"Error submitting voice job: {e}")
+            self._pid = None
+            self._discard_audio(audio_file_path)
+            self._finish(job, status='failed', error='Transcription unavailable')
+            return job_id
+
+        future.add_done_callback(lambda done: self._on_transcribed(job, done))
+        return job_id
+
+    def _discard_audio(self, path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _on_transcribed(self, job: Dict[str, Any], future):
+        self._discard_audio(job['audio_file_path'])
+
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error transcribing voice job {job['id']}: {e}")
+            result = {'success': False, 'error': 'Transcription failed'}
+
+        if not result.get('success'):
+            self._finish(job, status='failed', error=result.get('error', 'Transcription failed'))
+            return
+
+        with self._finished:
+            self._transcribed += 1
+            self._transcription_seconds += result.get('processing_time', 0.0)
+            self._active[job['id']] = 'answering'
+
+        try:
+            update_voice_job(job['id'], status='answering', transcription=result['transcription'],
+                             confidence=result['confidence'])
+            self._chat_pool.submit(self._answer, job, result)
+        except Exception as e:
+            print(f"Error scheduling voice job {job['id']}: {e}")
+            self._finish(job, status='failed', error='Could not answer the query')
+
+    def _answer(self, job: Dict[str, Any], result: Dict[str, Any]):
+        try:
+            chat_response = None
+            if self.chatbot:
+                chat_response = self.chatbot.process_message(result['transcription'], job['user_id'], job['domain'])
+            self.voice_service.save_voice_query(job['user_id'], job['filename'], result)
+            self._finish(job, status='completed', response=json.dumps(chat_response) if chat_response else None)
+        except Exception as e:
+            print(f"Error answering voice job {job['id']}: {e}")
+            self._finish(job, status='failed', error='Could not answer the query')
+
+    def _finish(self, job: Dict[str, Any], **fields):
+        try:
+            update_voice_job(job['id'], **fields)
+        except Exception as e:
+            print(f"Error updating voice job {job['id']}: {e}")
+
+        with self._finished:
+            self._active.pop(job['id'], None)
+            if fields['status'] == 'completed':
+                self.completed += 1
+            else:
+                self.failed += 1
+            self._finished.notify_all()
+
+    def get_status(self, job_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """Current state of a user's voice job, or None if it is not theirs"""
+        job = get_voice_job(job_id)
+        if not job or str(job['user_id']) != str(user_id):
+            return None
+
+        return {
+            'job_id': job['id'],
+            'status': job['status'],
+            'transcription': job['transcription'],
+            'confidence': job['confidence'],
+            'chat_response': json.loads(job['response']) if job['response'] else None,
+            'error': job['error'],
+            'created_at': job['created_at'],
+            'completed_at': job['completed_at']
+        }
+
+    def wait_for_completion(self, job_id: int, user_id: int, timeout: float = 25.0) -> Optional[Dict[str, Any]]:
+        """Long-poll: block until the job completes or fails, or ``timeout`` passes"""
+        deadline = time.monotonic() + timeout
+
+        while True:
+            status = self.get_status(job_id, user_id)
+            remaining = deadline - time.monotonic()
+            if status is None or status['status'] in ('completed', 'failed') or remaining <= 0:
+                return status
+
+            # Woken early when any job in this process finishes; the poll
+            # interval covers jobs submitted through other worker processes
+            with self._finished:
+                self._finished.wait(min(remaining, self.poll_interval))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._finished:
+            stages = Counter(self._active.values())
+            return {
+                'transcribe_workers': self.workers,
+                'chat_workers': self.chat_workers,
+                'max_pending': self.max_pending,
+                'pending': len(self._active),
+                'transcribing': stages['transcribing'],
+                'answering': stages['answering'],
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'rejected': self.rejected,
+                'avg_transcription_seconds': (
+                    round(self._transcription_seconds / self._transcribed, 3) if self._transcribed else 0.0
+                )
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop accepting work; with ``wait``, let in-flight jobs finish first"""
+        if self._pid != os.getpid():
+            return
+        self._transcribe_pool.shutdown(wait=wait)
+        self._chat_pool.shutdown(wait=wait)
+        self._pid = None
@@ -1,18 +1,126 @@
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from datetime import datetime, timezone
+import hashlib
+import io
 import os
+import tempfile
+import time
+
+MAX_AUDIO_BYTES = 10 * 1024 * 1024  # 10MB
+
+# Headroom for multipart boundaries and other form fields on top of the audio
+MAX_UPLOAD_OVERHEAD = 64 * 1024
+
+UPLOAD_DIR = os.getenv('VOICE_UPLOAD_DIR') or tempfile.gettempdir()
+
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', 50 * 1024 * 1024))
+
+
+def audio_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Content hash of a file, read in fixed-size chunks"""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, 'rb') as audio:
+        for chunk in iter(lambda: audio.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def sniff_audio_format(header: bytes) -> Optional[str]:
+    """Identify an audio container from its first bytes (at least 12)"""
+    if header[:4] == b'RIFF' and header[8:12] == b'WAVE':
+        return 'wav'
+    if header[:4] == b'fLaC':
+        return 'flac'
+    # ID3 tag, or a bare MPEG audio frame sync
+    if header[:3] == b'ID3' or (len(header) > 1 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return None
+
+
+class _UploadSpool(io.FileIO):
+    """Temp file for one uploaded part that refuses to grow past ``max_size``"""
+    
+    def __init__(self, path: str, max_size: int):
+        super().__init__(path, 'w+b')
+        self.max_size = max_size
+        self.size = 0
+    
+    def write(self, data) -> int:
+        self.size += len(data)
+        if self.size > self.max_size:
+            from werkzeug.exceptions import RequestEntityTooLarge
+            raise RequestEntityTooLarge()
+        return super().write(data)
+
 
 class VoiceService:
     """Voice-to-text and text-to-voice service"""
     
-    def __init__(self):
+    def __init__(self, max_audio_bytes: int = MAX_AUDIO_BYTES, backend_name: Optional[str] = None,
+                 preprocess: Optional[bool] = None, cache_max_bytes: int = TRANSCRIPTION_CACHE_MAX_BYTES):
         self.supported_formats = ['wav', 'mp3', 'flac']
+        self.max_audio_bytes = max_audio_bytes
+        self.backend_name = backend_name
+        self.preprocess = os.getenv('VOICE_PREPROCESS', '1') != '0' if preprocess is None else preprocess
+        self.cache_max_bytes = cache_max_bytes
+    
+    def receive_upload(self, environ: Dict[str, Any], field: str = 'audio') -> Tuple[Optional[str], Optional[str]]:
+        """Stream a multipart upload to disk; return (temp file path, client filename)
+        
+        File parts are written chunk by chunk to temp files as the body is read, so
+        worker memory stays flat regardless of upload size. Oversized bodies or
+        files raise ``RequestEntityTooLarge`` as soon as the limit is crossed. The
+        caller owns (and must delete) the returned file; the path is None when the
+        form has no ``field`` part.
+        """
+        from werkzeug.formparser import parse_form_data
+        
+        spools = []
+        
+        def stream_factory(total_content_length, content_type, filename, content_length=None):
+            fd, path = tempfile.mkstemp(prefix='voice-', suffix='.upload', dir=UPLOAD_DIR)
+            os.close(fd)
+            spool = _UploadSpool(path, self.max_audio_bytes)
+            spools.append(spool)
+            return spool
+        
+        try:
+            _, _, files = parse_form_data(
+                environ,
+                stream_factory=stream_factory,
+                max_content_length=self.max_audio_bytes + MAX_UPLOAD_OVERHEAD,
+                silent=False
+            )
+        except Exception:
+            self._discard(spool.name for spool in spools)
+            raise
+        
+        upload = files.get(field)
+        keep = upload.stream.name if upload is not None else None
+        for spool in spools:
+            spool.close()
+        self._discard(spool.name for spool in spools if spool.name != keep)
+        
+        return keep, upload.filename if upload is not None else None
+    
+    def _discard(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
         
     def transcribe_audio(self, audio_file_path: str) -> Dict[str, Any]:
-        """Transcribe audio file to text"""
+        """Transcribe audio file to text with the configured backend
+        
+        WAV (and FLAC, when soundfile is installed) is first reduced to 16 kHz mono
+        with leading and trailing silence trimmed; other formats go to the backend
+        as uploaded. ``processing_time`` covers both steps.
         
-        # Placeholder implementation - would integrate with Google Speech-to-Text API
-        # or other speech recognition services
+        Results are cached by content hash of both the upload and the preprocessed
+        audio, so a resubmitted recording costs one hash pass, and the same speech
+        in a different container or with different silence costs preprocessing.
+        """
         
         if not os.path.exists(audio_file_path):
             return {
@@ -22,16 +130,175 @@ class VoiceService:
                 'confidence': 0.0
             }
         
-        # Mock transcription for demonstration
-        return {
-            'success': True,
-            'transcription': 'This is a mock transcription of the audio file.',
-            'confidence': 0.85,
-            'audio_file': audio_file_path,
-            'processing_time': 1.2,
-            'language': 'en-US',
-            'timestamp': datetime.now(timezone.utc).isoformat()
-        }
+        from services.transcription import transcribe_file, DEFAULT_BACKEND
+        
+        started = time.perf_counter()
+        backend = self.backend_name or DEFAULT_BACKEND
+        content_hashes = [audio_digest(audio_file_path)]
+        cached = self._cached_transcription(content_hashes, backend, audio_file_path, started)
+        if cached:
+            return cached
+        
+        preprocessing = self._preprocess(audio_file_path)
+        if preprocessing and not preprocessing['speech']:
+            self._remove_preprocessed(preprocessing)
+            return {
+                'success': False,
+                'error': 'No speech detected',
+                'transcription': '',
+                'confidence': 0.0
+            }
+        
+        if preprocessing and preprocessing['path']:
+            content_hashes.append(audio_digest(preprocessing['path']))
+            cached = self._cached_transcription(content_hashes, backend, audio_file_path, started)
+            if cached:
+                self._remove_preprocessed(preprocessing)
+                return cached
+        
+        try:
+            result = transcribe_file((preprocessing or {}).get('path') or audio_file_path, self.backend_name)
+        except Exception as e:
+            print(f"Transcription error: {e}")
+            return {
+                'success': False,
+                'error': 'Transcription failed',
+                'transcription': '',
+                'confidence': 0.0
+            }
+        finally:
+            self._remove_preprocessed(preprocessing)
+        
+        if preprocessing:
+            result['preprocessing'] = self._preprocessing_report(preprocessing, result['processing_time'])
+            result['processing_time'] = round(result['processing_time'] + preprocessing['preprocess_time'], 3)
+        
+        self._cache_transcription(content_hashes, backend, result)
+        
+        return dict(
+            result,
+            success=True,
+            audio_file=audio_file_path,
+            timestamp=datetime.now(timezone.utc).isoformat()
+        )
+    
+    def _cached_transcription(self, content_hashes: List[str], backend: str, audio_file_path: str,
+                              started: float) -> Optional[Dict[str, Any]]:
+        """Cached result for the last hash, also stored under the earlier ones on a hit"""
+        if self.cache_max_bytes <= 0:
+            return None
+        
+        from models.database import get_cached_transcription
+        
+        try:
+            cached = get_cached_transcription(content_hashes[-1], backend)
+        except Exception as e:
+            print(f"Transcription cache error: {e}")
+            return None
+        if not cached:
+            return None
+        
+        if len(content_hashes) > 1:
+            self._cache_transcription(content_hashes[:-1], backend, cached)
+        
+        return dict(
+            cached,
+            success=True,
+            cached=True,
+            backend=backend,
+            audio_file=audio_file_path,
+            processing_time=round(time.perf_counter() - started, 3),
+            timestamp=datetime.now(timezone.utc).isoformat()
+        )
+    
+    def _cache_transcription(self, content_hashes: List[str], backend: str, result: Dict[str, Any]):
+        if self.cache_max_bytes <= 0:
+            return
+        
+        from models.database import save_cached_transcription
+        
+        try:
+            save_cached_transcription(content_hashes, backend, result['transcription'], result.get('confidence'),
+                                      result.get('language'), self.cache_max_bytes)
+        except Exception as e:
+            print(f"Transcription cache error: {e}")
+    
+    def _preprocess(self, audio_file_path: str) -> Optional[Dict[str, Any]]:
+        if not self.preprocess:
+            return None
+        
+        from services.audio_preprocessing import preprocess_audio
+        
+        with open(audio_file_path, 'rb') as audio:
+            audio_format = sniff_audio_format(audio.read(12))
+        
+        try:
+            return preprocess_audio(audio_file_path, audio_format)
+        except Exception as e:
+            # Undecodable despite a valid header; send the original instead
+            print(f"Audio preprocessing error: {e}")
+            return None
+    
+    def _remove_preprocessed(self, preprocessing: Optional[Dict[str, Any]]):
+        if preprocessing and preprocessing['path']:
+            try:
+                os.remove(preprocessing['path'])
+            except OSError:
+                pass
+    
+    def _preprocessing_report(self, preprocessing: Dict[str, Any], transcription_time: float) -> Dict[str, Any]:
+        report = {key: preprocessing[key] for key in
+                  ('bytes_in', 'bytes_out', 'seconds_in', 'seconds_out', 'preprocess_time')}
+        
+        # Backend time is taken as proportional to audio length, so the trimmed
+        # audio would have cost the same per second as what was sent
+        time_saved = None
+        if preprocessing['seconds_out']:
+            per_second = transcription_time / preprocessing['seconds_out']
+            removed = preprocessing['seconds_in'] - preprocessing['seconds_out']
+            time_saved = round(per_second * removed - preprocessing['preprocess_time'], 3)
+        report['time_saved'] = time_saved
+        
+        return report
+    
+    def convert_speech_to_text(self, audio_file_path: str, user_id: int, filename: str = None) -> str:
+        """Validate, transcribe and record an uploaded recording; return its text
+        
+        Raises ValueError when the file is not a supported recording or cannot be
+        transcribed.
+        """
+        validation = self.validate_audio_file(audio_file_path)
+        if not validation['valid']:
+            raise ValueError(validation['error'])
+        
+        transcription_result = self.transcribe_audio(audio_file_path)
+        if not transcription_result['success']:
+            raise ValueError(transcription_result['error'])
+        
+        self.save_voice_query(user_id, filename or audio_file_path, transcription_result)
+        
+        return transcription_result['transcription']
+    
+    def save_voice_query(self, user_id: int, audio_file_path: str, transcription_result: Dict[str, Any]):
+        """Record a transcription in the user's voice history"""
+        from models.database import get_db_connection
+        
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        
+        preprocessing = transcription_result.get('preprocessing') or {}
+        
+        cursor.execute('''
+            INSERT INTO voice_queries 
+            (user_id, audio_file_path, transcribed_text, confidence_score, processing_time,
+             bytes_in, bytes_out, time_saved)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (user_id, audio_file_path, transcription_result['transcription'], 
+              transcription_result['confidence'], transcription_result['processing_time'],
+              preprocessing.get('bytes_in'), preprocessing.get('bytes_out'), preprocessing.get('time_saved')))
+        
+        conn.commit()
+        conn.close()
     
     def process_voice_query(self, audio_file_path: str, user_id: int) -> Dict[str, Any]:
         """Process voice query end-to-end"""
@@ -51,20 +318,7 @@ class VoiceService:
         chat_response = chatbot.process_message(transcribed_text, user_id)
         
         # Step 3: Save voice query to database
-        from models.database import get_db_connection
-        
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            INSERT INTO voice_queries 
-            (user_id, audio_file_path, transcribed_text, confidence_score, processing_time)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (user_id, audio_file_path, transcribed_text, 
-              transcription_result['confidence'], transcription_result['processing_time']))
-        
-        conn.commit()
-        conn.close()
+        self.save_voice_query(user_id, audio_file_path, transcription_result)
         
         return {
             'success': True,
@@ -82,7 +336,8 @@ class VoiceService:
         cursor = conn.cursor()
         
         cursor.execute('''
-            SELECT transcribed_text, confidence_score, processing_time, created_at
+            SELECT transcribed_text, confidence_score, processing_time, bytes_in, bytes_out,
+                   time_saved, created_at
             FROM voice_queries 
             WHERE user_id = ?
             ORDER BY created_at DESC
@@ -95,22 +350,23 @@ class VoiceService:
         return [dict(row) for row in history]
     
     def validate_audio_file(self, file_path: str) -> Dict[str, Any]:
-        """Validate audio file format and size"""
+        """Validate audio file format (from its header bytes, not its name) and size"""
         
         if not os.path.exists(file_path):
             return {'valid': False, 'error': 'File does not exist'}
         
-        file_extension = file_path.split('.')[-1].lower()
-        if file_extension not in self.supported_formats:
+        with open(file_path, 'rb') as audio:
+            audio_format = sniff_audio_format(audio.read(12))
+        
+        if audio_format not in self.supported_formats:
             return {
                 'valid': False, 
                 'error': f'Unsupported format. Supported formats: {", ".join(self.supported_formats)}'
             }
         
         file_size = os.path.getsize(file_path)
-        max_size = 10 * 1024 * 1024  # 10MB
         
-        if file_size > max_size:
-            return {'valid': False, 'error': 'File size too large (max 10MB)'}
+        if file_size > self.max_audio_bytes:
+            return {'valid': False, 'error': f'File size too large (max {self.max_audio_bytes // (1024 * 1024)}MB)'}
         
-        return {'valid': True, 'size': file_size, 'format': file_extension}
+        return {'valid': True, 'size': file_size, 'format': audio_format}
@@ -19,6 +19,7 @@ export const API_ENDPOINTS = {
     RECOMMENDATIONS: `${API_BASE_URL}/api/student/recommendations`
   },
   DEADLINES: `${API_BASE_URL}/api/deadlines`,
+  CALENDAR: `${API_BASE_URL}/api/calendar`,
   DOUBT_RESOLVER: `${API_BASE_URL}/api/doubt-resolver`,
   RECOMMENDATIONS: `${API_BASE_URL}/api/recommendations`,
   VOICE_TO_TEXT: `${API_BASE_URL}/api/voice-to-text`